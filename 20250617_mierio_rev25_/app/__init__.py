@@ -1,12 +1,28 @@
-from flask import Flask
+from flask import Flask, jsonify
 from config import Config
 from .plot_state import PlotState
 from .model_manager import ModelManager
+from .session_store import create_session_interface
+from .resource_manager import ResourceManager, WorkloadBusyError, default_thread_budgets
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     config_class.init_app(app)
+    session_interface = create_session_interface(app.config)
+    if session_interface is not None:
+        app.session_interface = session_interface
+    app.resource_manager = ResourceManager(
+        {**default_thread_budgets(), **(app.config.get('THREAD_BUDGETS') or {})},
+        app.config['WORKLOAD_CONCURRENCY'],
+        acquire_timeout=app.config['WORKLOAD_ACQUIRE_TIMEOUT_SECONDS']
+    )
+    app.resource_manager.configure_native_threads()
+
+    @app.errorhandler(WorkloadBusyError)
+    def workload_busy(e):
+        return jsonify({'error': str(e)}), 503
+
     app.plot_state = PlotState()
     app.model_manager = ModelManager(app.config['MODELS_FOLDER'])
     from .main import main_bp
@@ -15,4 +31,6 @@ def create_app(config_class=Config):
     app.register_blueprint(data_bp)
     from .model_routes import model_bp
     app.register_blueprint(model_bp, url_prefix='/model')
+    from .admin_routes import admin_bp
+    app.register_blueprint(admin_bp, url_prefix='/admin')
     return app
@@ -0,0 +1,120 @@
+import numpy as np
+from . import surrogate_model
+from .cache_utils import LRUCache
+
+_residual_cache = LRUCache(maxsize=16, name='accuracy_residuals')
+_map_cache = LRUCache(maxsize=64, name='accuracy_residual_maps')
+
+
+def _nan_to_none(values):
+    return [None if v is None or not np.isfinite(v) else float(v) for v in values]
+
+
+def _bin_edges(values, bins):
+    low, high = float(np.nanmin(values)), float(np.nanmax(values))
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+
+class ResidualSet:
+    """
+    全測定点に対するサロゲートモデルの予測残差（予測値 - 実測値）と、その集計値。
+    """
+    def __init__(self, features, feature_names, actual, predicted, target_names):
+        self.features = features
+        self.feature_names = list(feature_names)
+        self.target_names = list(target_names)
+        self.actual = actual
+        self.predicted = predicted
+        self.residuals = predicted - actual
+        self.stats = self._summarize()
+
+    def _summarize(self):
+        stats = {}
+        for j, name in enumerate(self.target_names):
+            valid = np.isfinite(self.residuals[:, j])
+            residual = self.residuals[valid, j]
+            actual = self.actual[valid, j]
+            if residual.size == 0:
+                stats[name] = {'count': 0, 'rmse': None, 'mae': None, 'max_error': None, 'r2': None}
+                continue
+
+            ss_res = float(np.sum(residual ** 2))
+            ss_tot = float(np.sum((actual - actual.mean()) ** 2))
+            stats[name] = {
+                'count': int(residual.size),
+                'rmse': float(np.sqrt(ss_res / residual.size)),
+                'mae': float(np.mean(np.abs(residual))),
+                'max_error': float(np.max(np.abs(residual))),
+                'r2': 1.0 - ss_res / ss_tot if ss_tot > 0 else None,
+            }
+        return stats
+
+    def residual_map(self, x_col, y_col, bins=20):
+        """
+        x/y平面をビンに分割し、ビンごとの平均残差と点数を返す。
+        """
+        if x_col not in self.feature_names or y_col not in self.feature_names:
+            raise KeyError(f"Axis '{x_col if x_col not in self.feature_names else y_col}' not found in the features the model was trained on.")
+
+        x = self.features[:, self.feature_names.index(x_col)]
+        y = self.features[:, self.feature_names.index(y_col)]
+        x_edges = _bin_edges(x, bins)
+        y_edges = _bin_edges(y, bins)
+
+        maps = {}
+        for j, name in enumerate(self.target_names):
+            valid = np.isfinite(self.residuals[:, j])
+            counts, _, _ = np.histogram2d(y[valid], x[valid], bins=[y_edges, x_edges])
+            sums, _, _ = np.histogram2d(y[valid], x[valid], bins=[y_edges, x_edges], weights=self.residuals[valid, j])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(counts > 0, sums / counts, np.nan)
+            maps[name] = {
+                'mean_residual': [_nan_to_none(row) for row in mean],
+                'count': counts.astype(int).tolist(),
+            }
+
+        return {
+            'x_col': x_col,
+            'y_col': y_col,
+            'x_edges': x_edges.tolist(),
+            'y_edges': y_edges.tolist(),
+            'targets': maps,
+        }
+
+
+def peek_residual_set(model_identity, dataset_identity):
+    """
+    キャッシュ済みの ResidualSet を返す（なければ None）。データの読み込み前に確認するために使う。
+    """
+    return _residual_cache.get((model_identity, dataset_identity))
+
+
+def get_residual_set(model_identity, dataset_identity, model, scaler, df, target_names):
+    """
+    (モデル, データセット) ごとにキャッシュされた ResidualSet を返す。
+    キャッシュにない場合は全測定点を1回のバッチ推論で予測する。
+    """
+    def build():
+        feature_names = list(scaler.feature_names_in_)
+        df_valid = df.dropna(subset=feature_names)
+        if df_valid.empty:
+            raise ValueError('No rows with complete feature values to evaluate.')
+
+        features = df_valid[feature_names].to_numpy(dtype=np.float64)
+        predictions = surrogate_model.predict_batch(model, scaler, features).astype(np.float64)
+
+        evaluated = [name for name in target_names if name in df_valid.columns]
+        if not evaluated:
+            raise KeyError('None of the model targets are present in the measured data.')
+        columns = [target_names.index(name) for name in evaluated]
+        actual = df_valid[evaluated].to_numpy(dtype=np.float64)
+        return ResidualSet(features, feature_names, actual, predictions[:, columns], evaluated)
+
+    return _residual_cache.get_or_create((model_identity, dataset_identity), build)
+
+
+def get_residual_map(model_identity, dataset_identity, residual_set, x_col, y_col, bins=20):
+    key = (model_identity, dataset_identity, x_col, y_col, int(bins))
+    return _map_cache.get_or_create(key, lambda: residual_set.residual_map(x_col, y_col, int(bins)))
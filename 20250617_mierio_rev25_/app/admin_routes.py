@@ -0,0 +1,76 @@
+from flask import Blueprint, request, jsonify, current_app, abort
+from . import memory_report
+
+admin_bp = Blueprint('admin_bp', __name__)
+
+_LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+# tracemalloc が記録するスタックの深さと、レポートに含める件数の上限
+_MAX_TRACE_FRAMES = 100
+_MAX_TOP = 1000
+
+
+@admin_bp.before_request
+def restrict_admin_access():
+    """
+    管理用エンドポイントは ADMIN_ENDPOINTS_ENABLED が有効な場合だけ公開し（無効なら 404）、
+    ADMIN_ALLOW_REMOTE が無効な間はローカルホスト以外からのリクエストを 403 で拒否する。
+    """
+    if not current_app.config['ADMIN_ENDPOINTS_ENABLED']:
+        abort(404)
+    if not current_app.config['ADMIN_ALLOW_REMOTE'] and request.remote_addr not in _LOCAL_ADDRESSES:
+        abort(403)
+
+
+def _bounded_int(value, name, maximum):
+    """
+    1〜maximum の整数に変換する。変換できない値や範囲外の値は ValueError。
+    """
+    try:
+        number = int(value)
+    except (ValueError, TypeError):
+        raise ValueError(f"'{name}' must be an integer (got {value!r}).")
+    if not 1 <= number <= maximum:
+        raise ValueError(f"'{name}' must be between 1 and {maximum} (got {number}).")
+    return number
+
+
+@admin_bp.route('/resources', methods=['GET'])
+def resources():
+    return jsonify(current_app.resource_manager.report()), 200
+
+
+@admin_bp.route('/memory', methods=['GET'])
+def memory():
+    try:
+        top = _bounded_int(request.args.get('top', 10), 'top', _MAX_TOP)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(memory_report.memory_report(current_app, top=top)), 200
+
+
+@admin_bp.route('/memory/trace/start', methods=['POST'])
+def start_memory_trace():
+    data = request.get_json(silent=True) or {}
+    try:
+        frames = _bounded_int(data.get('frames', 1), 'frames', _MAX_TRACE_FRAMES)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(memory_report.start_tracing(frames)), 200
+
+
+@admin_bp.route('/memory/trace/snapshot', methods=['POST'])
+def memory_trace_snapshot():
+    data = request.get_json(silent=True) or {}
+    try:
+        top = _bounded_int(data.get('top', 20), 'top', _MAX_TOP)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return jsonify(memory_report.snapshot_diff(top)), 200
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+
+
+@admin_bp.route('/memory/trace/stop', methods=['POST'])
+def stop_memory_trace():
+    return jsonify(memory_report.stop_tracing()), 200
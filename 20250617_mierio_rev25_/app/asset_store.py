@@ -0,0 +1,148 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from werkzeug.utils import secure_filename
+from . import ingest
+from .cache_utils import LRUCache, file_identity
+from .waveform_features import WAVEFORM_FOLDER_NAME
+
+ASSETS_DIRNAME = 'assets'
+FEATURE_FILENAME = 'Feature.csv'
+TARGET_FILENAME = 'Target.csv'
+
+_STAGING_DIRNAME = 'staging'
+_BLOCK_SIZE = 1 << 20
+
+# ファイルの識別子（パス・更新時刻・サイズ）ごとの内容のSHA-256
+_digest_cache = LRUCache(maxsize=64, name='file_digests')
+
+
+def asset_folder(upload_folder, asset_id):
+    return os.path.join(upload_folder, ASSETS_DIRNAME, asset_id)
+
+
+def asset_paths(upload_folder, asset_id):
+    """
+    アセットの Feature.csv と Target.csv のパスを返す。
+    """
+    folder = asset_folder(upload_folder, asset_id)
+    return os.path.join(folder, FEATURE_FILENAME), os.path.join(folder, TARGET_FILENAME)
+
+
+def asset_exists(upload_folder, asset_id):
+    return all(os.path.isfile(path) for path in asset_paths(upload_folder, asset_id))
+
+
+def file_digest(path, block_size=_BLOCK_SIZE):
+    """
+    ファイルの内容のSHA-256を返す。ファイルが変わらない限り計算結果を再利用する。
+    """
+    def compute():
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    return _digest_cache.get_or_create(file_identity(path), compute)
+
+
+def _waveform_filenames(waveform_files):
+    """
+    波形ファイルの保存名（secure_filename 適用後）を返す。別々のファイル名が同じ保存名になる場合や、
+    保存名が空になる場合は、どちらかのファイルが失われるため ValueError を送出する。
+    """
+    filenames = {}
+    for waveform_file in waveform_files:
+        filename = secure_filename(waveform_file.filename)
+        if not filename:
+            raise ValueError(f"Invalid waveform file name: '{waveform_file.filename}'")
+        if filename in filenames:
+            raise ValueError(
+                f"Waveform files '{filenames[filename]}' and '{waveform_file.filename}' "
+                f"both map to '{filename}'. Please rename one of them."
+            )
+        filenames[filename] = waveform_file.filename
+    return list(filenames)
+
+
+def _save_hashed(file_storage, filepath, block_size=_BLOCK_SIZE):
+    hasher = hashlib.sha256()
+    with open(filepath, 'wb') as f:
+        while True:
+            block = file_storage.stream.read(block_size)
+            if not block:
+                break
+            f.write(block)
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _asset_id(digests):
+    """
+    アセット内の各ファイルの (相対パス, SHA-256) から、アセット全体の識別子を求める。
+    """
+    hasher = hashlib.sha256()
+    for name in sorted(digests):
+        hasher.update(f"{name}\0{digests[name]}\n".encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def store_asset(upload_folder, feature_file, target_file, waveform_files=()):
+    """
+    Feature.csv・Target.csv・波形ファイルを、内容のハッシュで決まる assets/<asset_id>/ に保存する。
+    各ファイルのSHA-256は書き出しながら計算する。同じ内容のアセットが既にあれば
+    書き出したファイルは捨てて既存のフォルダを使う。既存のファイルはパス・更新時刻が変わらないため、
+    パース済みのDataFrame・結合インデックス・モデル設定のCSVパスとの対応がそのまま再利用される。
+    波形ファイル名が保存名で衝突する場合は、何も書き出さずに ValueError を送出する。
+    """
+    waveform_filenames = _waveform_filenames(waveform_files)
+    staging_root = os.path.join(upload_folder, _STAGING_DIRNAME)
+    os.makedirs(staging_root, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=staging_root)
+
+    try:
+        digests = {}
+        hasher = hashlib.sha256()
+        feature_columns = ingest.save_upload_stream(feature_file, os.path.join(staging, FEATURE_FILENAME), hasher=hasher)
+        digests[FEATURE_FILENAME] = hasher.hexdigest()
+
+        hasher = hashlib.sha256()
+        target_columns = ingest.save_upload_stream(target_file, os.path.join(staging, TARGET_FILENAME), hasher=hasher)
+        digests[TARGET_FILENAME] = hasher.hexdigest()
+
+        if waveform_files:
+            waveform_folder = os.path.join(staging, WAVEFORM_FOLDER_NAME)
+            os.makedirs(waveform_folder, exist_ok=True)
+            for waveform_file, filename in zip(waveform_files, waveform_filenames):
+                digests[f"{WAVEFORM_FOLDER_NAME}/{filename}"] = _save_hashed(
+                    waveform_file, os.path.join(waveform_folder, filename)
+                )
+
+        asset_id = _asset_id(digests)
+        folder = asset_folder(upload_folder, asset_id)
+        reused = os.path.isdir(folder)
+        if not reused:
+            os.makedirs(os.path.dirname(folder), exist_ok=True)
+            try:
+                os.rename(staging, folder)
+            except OSError:
+                # 同じ内容のアップロードが同時に行われ、先に保存された場合
+                if not os.path.isdir(folder):
+                    raise
+                reused = True
+    finally:
+        if os.path.isdir(staging):
+            shutil.rmtree(staging, ignore_errors=True)
+
+    feature_filepath, target_filepath = asset_paths(upload_folder, asset_id)
+    return {
+        'asset_id': asset_id,
+        'feature_filepath': feature_filepath,
+        'target_filepath': target_filepath,
+        'feature_columns': feature_columns,
+        'target_columns': target_columns,
+        'has_waveforms': bool(waveform_files),
+        'reused': reused,
+    }
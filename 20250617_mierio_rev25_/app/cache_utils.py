@@ -0,0 +1,145 @@
+import hashlib
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+_registry = weakref.WeakSet()
+
+# ディスクキャッシュのフォルダごとの最後の整理時刻（整理は _PRUNE_INTERVAL_SECONDS に1回まで）
+_PRUNE_INTERVAL_SECONDS = 60
+_last_pruned = {}
+_prune_lock = threading.Lock()
+
+
+def file_identity(*paths):
+    """
+    ファイルの組を識別するハッシュ。パス・更新時刻・サイズから計算するため、
+    いずれかのファイルが変われば別の値になる。
+    """
+    parts = []
+    for path in paths:
+        stat = os.stat(path)
+        parts.append(f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}")
+    return hashlib.sha1('||'.join(parts).encode('utf-8')).hexdigest()
+
+
+def touch(path):
+    """
+    ディスクキャッシュのファイルを使ったことを更新時刻で記録する（prune_cache_folder は古い順に削除する）。
+    """
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def prune_cache_folder(folder, max_bytes=None, max_age_seconds=None, min_interval=_PRUNE_INTERVAL_SECONDS):
+    """
+    ディスクキャッシュのフォルダから、更新時刻が max_age_seconds より古いファイルを削除し、
+    合計が max_bytes を超える場合は古い順に削除する。同じフォルダの整理は min_interval 秒に1回だけ行う。
+    書き込み中の一時ファイル（名前に .tmp. を含む）は期限切れの場合だけ削除し、
+    使用中で削除できないファイルはそのまま残す。削除したファイル数を返す。
+    """
+    now = time.time()
+    with _prune_lock:
+        if now - _last_pruned.get(folder, 0.0) < min_interval:
+            return 0
+        _last_pruned[folder] = now
+
+    try:
+        entries = [(entry.path, entry.stat()) for entry in os.scandir(folder) if entry.is_file()]
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    kept = []
+    for path, stat in sorted(entries, key=lambda item: item[1].st_mtime):
+        expired = max_age_seconds is not None and now - stat.st_mtime >= max_age_seconds
+        if expired:
+            try:
+                os.remove(path)
+                removed += 1
+                continue
+            except OSError:
+                pass
+        if '.tmp.' not in os.path.basename(path):
+            kept.append((path, stat.st_size))
+
+    if max_bytes is not None:
+        total = sum(size for _, size in kept)
+        for path, size in kept:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+    return removed
+
+
+class LRUCache:
+    """
+    スレッドセーフな最大件数付きのLRUキャッシュ。
+    生成したキャッシュは registered_caches() で一覧でき、メモリ使用量の確認に使われる。
+    """
+    def __init__(self, maxsize=32, name=None):
+        self.maxsize = maxsize
+        self.name = name
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        _registry.add(self)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_create(self, key, factory):
+        """
+        キャッシュにあればその値を、なければ factory() の結果を登録して返す。
+        factory はロックの外で実行される。
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def items(self):
+        with self._lock:
+            return list(self._data.items())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+def registered_caches():
+    """
+    プロセス内で生成された LRUCache を名前順に返す。
+    """
+    return sorted(list(_registry), key=lambda cache: cache.name or '')
+
+
+_MISSING = object()
@@ -2,25 +2,72 @@ import pandas as pd
 import numpy as np
 import os
 from flask import current_app
+from .ingest import read_csv_frame, read_csv_header
+from .join_index import indexed_join
+from .cache_utils import file_identity, prune_cache_folder
+from .waveform_features import WAVEFORM_FEATURE_COLUMNS, get_waveform_folder, get_waveform_features, align_main_ids
 
-def load_and_merge_csvs(feature_filepath, target_filepath):
+def load_and_merge_csvs(feature_filepath, target_filepath, columns=None):
     if not os.path.exists(feature_filepath):
         raise FileNotFoundError(f"Feature CSV file not found: {feature_filepath}")
     if not os.path.exists(target_filepath):
         raise FileNotFoundError(f"Target CSV file not found: {target_filepath}")
 
-    df_feature = pd.read_csv(feature_filepath)
-    df_target = pd.read_csv(target_filepath)
+    # columns を指定すると、main_id 以外はその列だけを実体化する
+    if 'main_id' in read_csv_header(feature_filepath) and 'main_id' in read_csv_header(target_filepath):
+        df_merged = indexed_join(feature_filepath, target_filepath, current_app.config['INDEX_FOLDER'], columns=columns)
+        prune_disk_cache('INDEX_FOLDER')
+        return _join_waveform_features(df_merged, feature_filepath, columns)
 
-    if 'main_id' in df_feature.columns and 'main_id' in df_target.columns:
-        df_merged = pd.merge(df_feature, df_target, on='main_id', how='inner')
-    else:
-        if len(df_feature) != len(df_target):
-            raise ValueError('Feature and Target CSV files have different number of rows and no common "main_id".')
-        df_merged = pd.concat([df_feature, df_target], axis=1)
+    df_feature = read_csv_frame(feature_filepath)
+    df_target = read_csv_frame(target_filepath)
+
+    if len(df_feature) != len(df_target):
+        raise ValueError('Feature and Target CSV files have different number of rows and no common "main_id".')
+    df_merged = pd.concat([df_feature, df_target], axis=1)
+
+    if columns is not None:
+        df_merged = df_merged[[c for c in df_merged.columns if c in set(columns)]]
     
     return df_merged
 
+def prune_disk_cache(folder_key):
+    """
+    設定 folder_key のキャッシュフォルダを CACHE_FOLDER_MAX_BYTES / CACHE_MAX_AGE_SECONDS に従って整理する。
+    """
+    prune_cache_folder(
+        current_app.config[folder_key],
+        max_bytes=current_app.config['CACHE_FOLDER_MAX_BYTES'],
+        max_age_seconds=current_app.config['CACHE_MAX_AGE_SECONDS']
+    )
+
+def _join_waveform_features(df_merged, feature_filepath, columns=None):
+    """
+    Waveform フォルダがあれば、波形から抽出した特徴量を追加のターゲット列として main_id で結合する。
+    columns を指定した場合は、波形特徴量の列が含まれるときだけ抽出・結合する。
+    """
+    if columns is not None and not any(col in WAVEFORM_FEATURE_COLUMNS for col in columns):
+        return df_merged
+
+    folder = get_waveform_folder(feature_filepath)
+    if folder is None:
+        return df_merged
+
+    df_waveform = get_waveform_features(
+        folder,
+        current_app.config['WAVEFORM_FEATURES_FOLDER'],
+        workers=current_app.resource_manager.threads_for('evaluation'),
+    )
+    prune_disk_cache('WAVEFORM_FEATURES_FOLDER')
+    if df_waveform is None:
+        return df_merged
+
+    wanted = WAVEFORM_FEATURE_COLUMNS if columns is None else [c for c in WAVEFORM_FEATURE_COLUMNS if c in columns]
+    # ファイル名の main_id を結合先の型に揃える（型が異なると一致する行があっても結合されない）
+    main_ids, valid = align_main_ids(df_waveform['main_id'], df_merged['main_id'].dtype)
+    df_waveform = df_waveform.loc[valid, wanted].assign(main_id=main_ids)
+    return pd.merge(df_merged, df_waveform[['main_id'] + wanted], on='main_id', how='left')
+
 def filter_dataframe(df, feature_params):
     df_filtered = df.copy()
     for param_info in feature_params:
@@ -70,3 +117,9 @@ def get_variable_ranges(df, variables):
         ranges[var] = {'min': min_val, 'max': max_val}
         
     return ranges
+
+def get_dataset_identity(feature_filepath, target_filepath):
+    """
+    Feature / Target ファイルの組を識別するハッシュ。
+    """
+    return file_identity(feature_filepath, target_filepath)
@@ -0,0 +1,35 @@
+import hashlib
+import json
+from flask import Response, current_app, request
+
+
+def compute_etag(*parts):
+    """
+    レスポンスを決める入力（データセット・モデルの識別子、軸、定数、解像度など）から
+    強いETagを計算する。
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def not_modified_response(etag):
+    """
+    If-None-Match が etag と一致すれば 304 レスポンスを、一致しなければ None を返す。
+    """
+    if etag is not None and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return None
+
+
+def attach_etag(rv, etag):
+    """
+    ビューの戻り値をレスポンスに変換し、成功時のみETagを付与する。
+    """
+    response = current_app.make_response(rv)
+    if etag is not None and response.status_code == 200:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,163 @@
+import csv
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from .cache_utils import LRUCache
+
+_BLOCK_SIZE = 1 << 20
+_DEFAULT_CHUNK_ROWS = 100000
+_MAX_CACHED_FRAMES = 8
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='csv-ingest')
+_frames = LRUCache(maxsize=_MAX_CACHED_FRAMES, name='csv_frames')
+
+
+def _file_signature(filepath):
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_header_line(raw_line):
+    text = raw_line.decode('utf-8-sig').rstrip('\r\n')
+    return [h.strip() for h in next(csv.reader([text]))]
+
+
+def save_upload_stream(file_storage, filepath, block_size=_BLOCK_SIZE, hasher=None):
+    """
+    アップロードされたファイルをブロック単位でディスクに書き出し、
+    先頭のバイト列からヘッダー行だけを読み取って返す（本体のパースは行わない）。
+    hasher（hashlib のオブジェクト）を渡すと、書き出したバイト列でハッシュを更新する。
+    """
+    header_bytes = b''
+    header = None
+    # 同じファイル名への同時アップロードで一時ファイルが衝突しないよう、一意な名前にする
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filepath)), suffix='.part')
+
+    with os.fdopen(fd, 'wb') as f:
+        while True:
+            block = file_storage.stream.read(block_size)
+            if not block:
+                break
+            f.write(block)
+            if hasher is not None:
+                hasher.update(block)
+            if header is None:
+                header_bytes += block
+                newline = header_bytes.find(b'\n')
+                if newline >= 0:
+                    header = _parse_header_line(header_bytes[:newline])
+                    header_bytes = b''
+
+    if header is None:
+        if not header_bytes.strip():
+            os.remove(tmp_path)
+            raise ValueError('The uploaded CSV file is empty.')
+        header = _parse_header_line(header_bytes)
+
+    os.replace(tmp_path, filepath)
+    return header
+
+
+def _downcast_lossless(series):
+    """
+    値が変わらない場合に限り、数値列を float32 / int32 に縮小する。
+    """
+    if pd.api.types.is_integer_dtype(series.dtype) and series.dtype.itemsize > 4:
+        if series.empty or (series.min() >= np.iinfo(np.int32).min and series.max() <= np.iinfo(np.int32).max):
+            return series.astype(np.int32)
+    elif pd.api.types.is_float_dtype(series.dtype) and series.dtype.itemsize > 4:
+        downcast = series.astype(np.float32)
+        if np.array_equal(downcast.to_numpy(dtype=np.float64), series.to_numpy(), equal_nan=True):
+            return downcast
+    return series
+
+
+def read_csv_header(filepath):
+    """
+    CSVのヘッダー（前後の空白を除いた列名）だけを読み取る。
+    """
+    with open(filepath, 'rb') as f:
+        return _parse_header_line(f.readline())
+
+
+def parse_csv_chunked(filepath, chunk_rows=_DEFAULT_CHUNK_ROWS, usecols=None):
+    """
+    CSVを chunk_rows 行ずつ読み込み、各チャンクの数値列を無損失で縮小してから結合する。
+    チャンク間で型が異なる場合は pd.concat が共通の型に揃えるため、値は失われない。
+    usecols を指定した場合はその列（空白を除いた列名で指定）だけを読み込む。
+    """
+    if usecols is not None:
+        wanted = set(usecols)
+        usecols = lambda c: c.strip() in wanted
+
+    chunks = []
+    for chunk in pd.read_csv(filepath, chunksize=chunk_rows, usecols=usecols):
+        chunk.columns = chunk.columns.str.strip()
+        for col in chunk.columns:
+            chunk[col] = _downcast_lossless(chunk[col])
+        chunks.append(chunk)
+
+    if not chunks:
+        df = pd.read_csv(filepath, usecols=usecols)
+        df.columns = df.columns.str.strip()
+        return df
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def _remember(filepath, signature, future):
+    _frames.set(filepath, (signature, future))
+
+
+def schedule_parse(filepath, chunk_rows=_DEFAULT_CHUNK_ROWS):
+    """
+    保存済みのCSVをバックグラウンドでパースし、結果をキャッシュに登録する。
+    同じ内容のファイルのパースが既に完了しているか実行中であれば、その Future を返す。
+    """
+    filepath = os.path.abspath(filepath)
+    signature = _file_signature(filepath)
+    entry = _frames.get(filepath)
+    if entry is not None and entry[0] == signature:
+        if not entry[1].done() or entry[1].exception() is None:
+            return entry[1]
+    future = _executor.submit(parse_csv_chunked, filepath, chunk_rows)
+    _remember(filepath, signature, future)
+    return future
+
+
+def peek_csv_frame(filepath):
+    """
+    パースが完了していてファイルが更新されていない場合に限り、キャッシュ済みのDataFrameを返す。
+    それ以外は待たずに None を返す。
+    """
+    filepath = os.path.abspath(filepath)
+    entry = _frames.get(filepath)
+    if entry is None or not entry[1].done() or entry[1].exception() is not None:
+        return None
+    if entry[0] != _file_signature(filepath):
+        return None
+    return entry[1].result()
+
+
+def read_csv_frame(filepath, chunk_rows=_DEFAULT_CHUNK_ROWS):
+    """
+    パース済みのDataFrameを返す。バックグラウンドでパース中であれば完了を待つ。
+    ファイルが更新されていればパースし直す。返されたDataFrameは共有されるため変更しないこと。
+    """
+    filepath = os.path.abspath(filepath)
+    signature = _file_signature(filepath)
+
+    entry = _frames.get(filepath)
+    future = entry[1] if entry is not None and entry[0] == signature else None
+
+    if future is None:
+        future = _executor.submit(parse_csv_chunked, filepath, chunk_rows)
+        _remember(filepath, signature, future)
+
+    try:
+        return future.result()
+    except Exception:
+        if _frames.get(filepath, (None, None))[1] is future:
+            _frames.pop(filepath)
+        raise
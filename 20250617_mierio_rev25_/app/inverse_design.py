@@ -0,0 +1,167 @@
+import numpy as np
+import tensorflow as tf
+
+
+def _parse_target_bounds(targets, target_names):
+    """
+    目標値の指定を (ターゲット列番号, 下限, 上限) の配列に変換する。
+    値は数値（一致させたい値）または {'min':, 'max':} / [min, max] の範囲で指定する。
+    """
+    indices, lower, upper = [], [], []
+    for name, spec in targets.items():
+        if name not in target_names:
+            raise KeyError(f"Target '{name}' is not an output of the model.")
+
+        if isinstance(spec, dict):
+            low = spec.get('min')
+            high = spec.get('max')
+        elif isinstance(spec, (list, tuple)) and len(spec) == 2:
+            low, high = spec
+        else:
+            low = high = spec
+
+        low = -np.inf if low is None or str(low).strip() == '' else float(low)
+        high = np.inf if high is None or str(high).strip() == '' else float(high)
+        if low > high:
+            raise ValueError(f"Invalid range for target '{name}': min is greater than max.")
+
+        indices.append(target_names.index(name))
+        lower.append(low)
+        upper.append(high)
+
+    if not indices:
+        raise ValueError("No target values were specified.")
+
+    return np.array(indices), np.array(lower, dtype=np.float32), np.array(upper, dtype=np.float32)
+
+
+def search_inverse_design(model, scaler, target_names, targets, constants, bounds=None,
+                          n_starts=2048, steps=200, learning_rate=0.05, top_k=10, tolerance=1e-6, seed=None):
+    """
+    サロゲートモデルを使い、指定した目標値（または範囲）を満たす特徴量の組み合わせを探索する。
+    多数の初期点をまとめて1つのテンソルとして扱い、順伝播と勾配計算をバッチで行う。
+    探索はスケーリング後の [0, 1] 空間（学習データの範囲内）で行う。
+
+    Args:
+        model: 学習済みKerasモデル。
+        scaler: モデルの学習に使ったMinMaxScaler。
+        target_names (list): モデル出力の列名リスト。
+        targets (dict): {ターゲット名: 目標値 or {'min':, 'max':}}。
+        constants (dict): 固定する特徴量 {特徴量名: 値}。
+        bounds (dict, optional): 探索範囲を絞る特徴量 {特徴量名: [min, max]}。
+        n_starts (int, optional): 同時に最適化する初期点の数。
+        steps (int, optional): 最適化の最大ステップ数。
+        learning_rate (float, optional): Adamの学習率。
+        top_k (int, optional): 返す候補の数。
+        tolerance (float, optional): 全初期点の損失がこの値を下回ったら打ち切る。
+        seed (int, optional): 初期点生成の乱数シード。
+
+    Returns:
+        dict: {'candidates': [...], 'steps_run': int}
+    """
+    feature_names = list(scaler.feature_names_in_)
+    if bounds is not None and not isinstance(bounds, dict):
+        raise ValueError("'bounds' must be an object of {feature: [min, max]}.")
+    for name, pair in (bounds or {}).items():
+        if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+            raise ValueError(f"Bounds for '{name}' must be a [min, max] pair.")
+        if not all(np.isfinite(float(v)) for v in pair):
+            raise ValueError(f"Bounds for '{name}' must be finite numbers.")
+    for name in list(constants) + list(bounds or {}):
+        if name not in feature_names:
+            raise KeyError(f"Feature '{name}' not found in the features the model was trained on.")
+
+    free_idx = [i for i, f in enumerate(feature_names) if f not in constants]
+    if not free_idx:
+        raise ValueError("All features are fixed as constants. Nothing to search.")
+
+    t_idx, t_lower, t_upper = _parse_target_bounds(targets, target_names)
+
+    scale = scaler.scale_.astype(np.float32)
+    offset = scaler.min_.astype(np.float32)
+
+    # 定数列はスケーリング済みの値、探索列は0の基準ベクトル
+    base_row = np.zeros(len(feature_names), dtype=np.float32)
+    for name, value in constants.items():
+        i = feature_names.index(name)
+        base_row[i] = float(value) * scale[i] + offset[i]
+
+    # 探索変数 (n, k) を特徴量ベクトル (n, d) に埋め込むための選択行列
+    selector = np.zeros((len(free_idx), len(feature_names)), dtype=np.float32)
+    selector[np.arange(len(free_idx)), free_idx] = 1.0
+
+    free_low = np.zeros(len(free_idx), dtype=np.float32)
+    free_high = np.ones(len(free_idx), dtype=np.float32)
+    for name, (low, high) in (bounds or {}).items():
+        i = feature_names.index(name)
+        if i in free_idx:
+            j = free_idx.index(i)
+            free_low[j] = np.clip(float(low) * scale[i] + offset[i], 0.0, 1.0)
+            free_high[j] = np.clip(float(high) * scale[i] + offset[i], 0.0, 1.0)
+    lo, hi = np.minimum(free_low, free_high), np.maximum(free_low, free_high)
+
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform(lo, hi, size=(int(n_starts), len(free_idx))).astype(np.float32)
+
+    base_row_t = tf.constant(base_row)
+    selector_t = tf.constant(selector)
+    t_idx_t = tf.constant(t_idx, dtype=tf.int32)
+    lower_t = tf.constant(t_lower)
+    upper_t = tf.constant(t_upper)
+    lo_t, hi_t = tf.constant(lo), tf.constant(hi)
+
+    def compose(free_values):
+        return base_row_t + tf.matmul(free_values, selector_t)
+
+    # 目標ごとの損失を揃えるため、初期点での予測値の広がりで正規化する
+    initial_pred = model(compose(tf.constant(starts)), training=False).numpy()[:, t_idx]
+    spread = np.ptp(initial_pred, axis=0).astype(np.float32)
+    spread_t = tf.constant(np.where(spread > 0, spread, 1.0).astype(np.float32))
+
+    def candidate_loss(free_values):
+        pred = tf.gather(model(compose(free_values), training=False), t_idx_t, axis=1)
+        violation = tf.nn.relu(lower_t - pred) + tf.nn.relu(pred - upper_t)
+        return tf.reduce_sum(tf.square(violation / spread_t), axis=1)
+
+    variable = tf.Variable(starts)
+    optimizer = tf.keras.optimizers.Adam(learning_rate=learning_rate)
+
+    @tf.function
+    def train_step():
+        with tf.GradientTape() as tape:
+            losses = candidate_loss(variable)
+            # 各初期点の損失は独立なので、合計の勾配がそのまま各点の勾配になる
+            total = tf.reduce_sum(losses)
+        grads = tape.gradient(total, [variable])
+        optimizer.apply_gradients(zip(grads, [variable]))
+        variable.assign(tf.clip_by_value(variable, lo_t, hi_t))
+        return tf.reduce_max(losses)
+
+    steps_run = 0
+    for _ in range(int(steps)):
+        steps_run += 1
+        if float(train_step()) < tolerance:
+            break
+
+    final_scaled = compose(variable).numpy()
+    final_losses = candidate_loss(variable).numpy()
+    final_pred = model(final_scaled, training=False).numpy()
+    final_raw = (final_scaled - offset) / scale
+
+    # 損失の小さい順に、ほぼ同じ点に収束した候補を除いて選ぶ
+    candidates = []
+    seen = set()
+    for i in np.argsort(final_losses):
+        key = tuple(np.round(final_scaled[i, free_idx], 3))
+        if key in seen:
+            continue
+        seen.add(key)
+        candidates.append({
+            'features': {name: float(final_raw[i, j]) for j, name in enumerate(feature_names)},
+            'predictions': {name: float(final_pred[i, j]) for j, name in enumerate(target_names)},
+            'loss': float(final_losses[i]),
+        })
+        if len(candidates) >= top_k:
+            break
+
+    return {'candidates': candidates, 'steps_run': steps_run}
@@ -0,0 +1,217 @@
+import numpy as np
+
+# セルの角: 0=左下 (i, j), 1=右下 (i, j+1), 2=右上 (i+1, j+1), 3=左上 (i+1, j)
+# セルの辺: 'B'=下, 'R'=右, 'T'=上, 'L'=左
+_CORNERS = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]])
+_EDGE_MIDPOINTS = {'B': (0.5, 0.0), 'R': (1.0, 0.5), 'T': (0.5, 1.0), 'L': (0.0, 0.5)}
+
+# 角の状態（しきい値以上なら1）から決まる線分。16 / 17 はセル中心がしきい値以上の鞍点（5 / 10）
+_CASE_SEGMENTS = {
+    1: [('B', 'L')], 2: [('B', 'R')], 3: [('L', 'R')], 4: [('R', 'T')],
+    5: [('B', 'L'), ('R', 'T')], 6: [('B', 'T')], 7: [('L', 'T')], 8: [('L', 'T')],
+    9: [('B', 'T')], 10: [('B', 'R'), ('T', 'L')], 11: [('R', 'T')], 12: [('L', 'R')],
+    13: [('B', 'R')], 14: [('B', 'L')],
+    16: [('B', 'R'), ('T', 'L')], 17: [('B', 'L'), ('R', 'T')],
+}
+
+
+def _orient(case, start, end):
+    """
+    しきい値以上の領域が進行方向の左側になるように線分の向きを決める。
+    線分で分けられた角のうち少ない側（その側の角の状態は全て同じ）で判定する。
+    """
+    bits = {16: 5, 17: 10}.get(case, case)
+    high = [(bits >> k) & 1 for k in range(4)]
+    p0, p1 = np.array(_EDGE_MIDPOINTS[start]), np.array(_EDGE_MIDPOINTS[end])
+    d = p1 - p0
+    side = [d[0] * (c[1] - p0[1]) - d[1] * (c[0] - p0[0]) for c in _CORNERS]
+    left = [k for k in range(4) if side[k] > 0]
+    right = [k for k in range(4) if side[k] < 0]
+    minority, on_left = (left, True) if len(left) <= len(right) else (right, False)
+    minority_high = bool(high[minority[0]])
+    return (start, end) if minority_high == on_left else (end, start)
+
+
+_ORIENTED_SEGMENTS = {
+    case: [_orient(case, a, b) for a, b in segments] for case, segments in _CASE_SEGMENTS.items()
+}
+
+
+def _cell_cases(z, level):
+    above = z >= level
+    case = (above[:-1, :-1].astype(np.int8)
+            + above[:-1, 1:] * 2
+            + above[1:, 1:] * 4
+            + above[1:, :-1] * 8)
+    # 鞍点はセル中心（4角の平均）で接続を判定する
+    center_high = (z[:-1, :-1] + z[:-1, 1:] + z[1:, 1:] + z[1:, :-1]) / 4.0 >= level
+    case = np.where((case == 5) & center_high, 16, case)
+    case = np.where((case == 10) & center_high, 17, case)
+    # NaNを含むセルでは線を引かない
+    invalid = np.isnan(z[:-1, :-1]) | np.isnan(z[:-1, 1:]) | np.isnan(z[1:, 1:]) | np.isnan(z[1:, :-1])
+    return np.where(invalid, 0, case)
+
+
+def _edge_ids(edge, rows, cols, ny, nx):
+    """
+    セル (rows, cols) の辺の通し番号。横の辺が先、縦の辺が後に並ぶ。
+    """
+    n_horizontal = ny * (nx - 1)
+    if edge == 'B':
+        return rows * (nx - 1) + cols
+    if edge == 'T':
+        return (rows + 1) * (nx - 1) + cols
+    if edge == 'L':
+        return n_horizontal + rows * nx + cols
+    return n_horizontal + rows * nx + cols + 1
+
+
+def _edge_points(edge_ids, z, x, y, level):
+    """
+    辺の通し番号からしきい値を横切る点の座標を線形補間で求める。
+    """
+    ny, nx = z.shape
+    n_horizontal = ny * (nx - 1)
+    points = np.empty((len(edge_ids), 2))
+
+    horizontal = edge_ids < n_horizontal
+    hi, hj = np.divmod(edge_ids[horizontal], nx - 1)
+    za, zb = z[hi, hj], z[hi, hj + 1]
+    t = np.clip((level - za) / np.where(zb != za, zb - za, 1.0), 0.0, 1.0)
+    points[horizontal, 0] = x[hj] + t * (x[hj + 1] - x[hj])
+    points[horizontal, 1] = y[hi]
+
+    vi, vj = np.divmod(edge_ids[~horizontal] - n_horizontal, nx)
+    za, zb = z[vi, vj], z[vi + 1, vj]
+    t = np.clip((level - za) / np.where(zb != za, zb - za, 1.0), 0.0, 1.0)
+    points[~horizontal, 0] = x[vj]
+    points[~horizontal, 1] = y[vi] + t * (y[vi + 1] - y[vi])
+    return points
+
+
+def _chain_segments(starts, ends):
+    """
+    向き付きの線分（辺の番号 start -> end）をつないで、辺の番号の列（折れ線）のリストにする。
+    隣り合うセルは辺を共有し、向きが揃っているため、各辺は高々1つの線分の始点になる。
+    閉じた折れ線は最初と最後が同じ辺になる。
+    """
+    successor = dict(zip(starts.tolist(), ends.tolist()))
+    has_predecessor = set(ends.tolist())
+    chains = []
+
+    def walk(start):
+        chain = [start]
+        current = successor.pop(start)
+        while True:
+            chain.append(current)
+            if current == start or current not in successor:
+                return chain
+            current = successor.pop(current)
+
+    # 境界から始まる開いた折れ線を先に、残りの閉じた折れ線を後にたどる
+    for start in [s for s in starts.tolist() if s not in has_predecessor]:
+        if start in successor:
+            chains.append(walk(start))
+    while successor:
+        chains.append(walk(next(iter(successor))))
+    return chains
+
+
+def simplify_polyline(points, tolerance):
+    """
+    Ramer-Douglas-Peucker法で、元の線からのずれが tolerance 以下になる範囲で頂点を間引く。
+    """
+    if tolerance <= 0 or len(points) <= 2:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        p0, p1 = points[first], points[last]
+        segment = points[first + 1:last]
+        d = p1 - p0
+        norm = np.hypot(d[0], d[1])
+        if norm == 0:
+            distances = np.hypot(segment[:, 0] - p0[0], segment[:, 1] - p0[1])
+        else:
+            distances = np.abs(d[0] * (segment[:, 1] - p0[1]) - d[1] * (segment[:, 0] - p0[0])) / norm
+        k = int(np.argmax(distances))
+        if distances[k] > tolerance:
+            index = first + 1 + k
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return points[keep]
+
+
+def trace_isolines(z, x, y, level, tolerance=0.0):
+    """
+    ベクトル化したマーチングスクエアで、グリッド z（形状 (len(y), len(x))）の等値線を求める。
+    しきい値以上の領域が進行方向の左側になるように向き付けた折れ線 (N, 2) のリストを返す。
+    """
+    z = np.asarray(z, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    ny, nx = z.shape
+    if ny < 2 or nx < 2:
+        return []
+
+    cases = _cell_cases(z, level)
+    starts, ends = [], []
+    for case, segments in _ORIENTED_SEGMENTS.items():
+        rows, cols = np.nonzero(cases == case)
+        if rows.size == 0:
+            continue
+        for start, end in segments:
+            starts.append(_edge_ids(start, rows, cols, ny, nx))
+            ends.append(_edge_ids(end, rows, cols, ny, nx))
+    if not starts:
+        return []
+
+    starts, ends = np.concatenate(starts), np.concatenate(ends)
+    chains = _chain_segments(starts, ends)
+
+    used_edges = np.unique(np.concatenate([starts, ends]))
+    coords = _edge_points(used_edges, z, x, y, level)
+
+    polylines = []
+    for chain in chains:
+        points = coords[np.searchsorted(used_edges, np.asarray(chain))]
+        polylines.append(simplify_polyline(points, tolerance))
+    return polylines
+
+
+def trace_filled_regions(z, x, y, level, tolerance=0.0):
+    """
+    z >= level の領域の境界を閉じたリングのリストで返す。
+    グリッドの外周を level 未満の値で囲んでから等値線を求めるため、全ての境界が閉じる。
+    外側の境界は反時計回り、穴は時計回りになる（nonzeroの塗りつぶし規則で穴が抜ける）。
+    """
+    z = np.asarray(z, dtype=np.float64)
+    low = level - max(1.0, abs(level))
+    padded = np.pad(np.where(np.isnan(z), low, z), 1, constant_values=low)
+    # 外周の座標は端の座標を繰り返し、塗りつぶしがグリッドの範囲からはみ出さないようにする
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    padded_x = np.concatenate([[x[0]], x, [x[-1]]])
+    padded_y = np.concatenate([[y[0]], y, [y[-1]]])
+    return trace_isolines(padded, padded_x, padded_y, level, tolerance)
+
+
+def resolve_levels(z, levels):
+    """
+    levels が整数ならデータ範囲を等分した内側の値、リストならそのままのしきい値を返す。
+    """
+    if isinstance(levels, (list, tuple, np.ndarray)):
+        values = np.unique(np.asarray(levels, dtype=np.float64))
+        return values[np.isfinite(values)]
+    count = int(levels)
+    if count < 1:
+        raise ValueError('The number of contour levels must be at least 1.')
+    z_min, z_max = np.nanmin(z), np.nanmax(z)
+    if not np.isfinite(z_min) or z_min == z_max:
+        return np.array([z_min]) if np.isfinite(z_min) else np.array([])
+    return np.linspace(z_min, z_max, count + 2)[1:-1]
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+import numpy as np
+import pandas as pd
+from .cache_utils import LRUCache, touch
+from .ingest import parse_csv_chunked, peek_csv_frame, read_csv_header
+
+_DEFAULT_CHUNK_ROWS = 100000
+_MAX_CACHED_INDEXES = 16
+
+_indexes = LRUCache(maxsize=_MAX_CACHED_INDEXES, name='key_indexes')
+
+
+class KeyIndex:
+    """
+    1つのCSVファイルのキー列（main_id）をソートした索引。
+    sorted_keys[i] の行はファイル中の positions[i] 行目にある。
+    """
+    def __init__(self, sorted_keys, positions):
+        self.sorted_keys = sorted_keys
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+
+def _index_path(index_folder, filepath, key):
+    stat = os.stat(filepath)
+    identity = f"{os.path.abspath(filepath)}|{stat.st_mtime_ns}|{stat.st_size}|{key}"
+    digest = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+    return os.path.join(index_folder, f"{digest}.npz")
+
+
+def _normalize_keys(keys):
+    if pd.api.types.is_integer_dtype(keys.dtype) or pd.api.types.is_float_dtype(keys.dtype):
+        return keys
+    return keys.astype(str)
+
+
+def get_key_index(filepath, index_folder, key='main_id', chunk_rows=_DEFAULT_CHUNK_ROWS):
+    """
+    キー列のソート済み索引を返す。索引はファイルの内容（パス・更新時刻・サイズ）ごとに
+    index_folder に保存されるため、作成はファイルごとに1回だけで済む。
+    """
+    index_path = _index_path(index_folder, filepath, key)
+
+    index = _indexes.get(index_path)
+    if index is not None:
+        return index
+
+    if os.path.exists(index_path):
+        with np.load(index_path, allow_pickle=False) as data:
+            index = KeyIndex(data['sorted_keys'], data['positions'])
+        touch(index_path)
+    else:
+        keys = parse_csv_chunked(filepath, chunk_rows=chunk_rows, usecols=[key])[key].to_numpy()
+        keys = _normalize_keys(keys)
+        order = np.argsort(keys, kind='stable')
+        index = KeyIndex(keys[order], order.astype(np.int64))
+
+        os.makedirs(index_folder, exist_ok=True)
+        tmp_path = f"{index_path}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, sorted_keys=index.sorted_keys, positions=index.positions)
+        os.replace(tmp_path, index_path)
+
+    _indexes.set(index_path, index)
+    return index
+
+
+def join_positions(left, right, chunk_rows=_DEFAULT_CHUNK_ROWS):
+    """
+    2つのソート済み索引を内部結合し、結合後の各行が元ファイルの何行目に当たるかを
+    (left_positions, right_positions) の配列として返す。
+    左側のキーを chunk_rows 件ずつ右側に二分探索で照合するため、作業メモリはチャンク単位で済む。
+    行の順序は pd.merge(how='inner') と同じく左側ファイルの行順（重複キーは右側の行順）になる。
+    """
+    left_keys, right_keys = left.sorted_keys, right.sorted_keys
+    if left_keys.dtype.kind != right_keys.dtype.kind and 'U' in (left_keys.dtype.kind, right_keys.dtype.kind):
+        left_keys, right_keys = left_keys.astype(str), right_keys.astype(str)
+
+    left_parts, right_parts = [], []
+    for start in range(0, len(left_keys), chunk_rows):
+        chunk = left_keys[start:start + chunk_rows]
+        lo = np.searchsorted(right_keys, chunk, side='left')
+        hi = np.searchsorted(right_keys, chunk, side='right')
+        counts = hi - lo
+        total = int(counts.sum())
+        if total == 0:
+            continue
+
+        # 一致した各キーについて、右側の一致範囲 [lo, hi) を展開する
+        run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+        right_sorted_idx = np.repeat(lo, counts) + (np.arange(total) - run_starts)
+
+        left_parts.append(np.repeat(left.positions[start:start + chunk_rows], counts))
+        right_parts.append(right.positions[right_sorted_idx])
+
+    if not left_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    left_pos = np.concatenate(left_parts)
+    right_pos = np.concatenate(right_parts)
+    order = np.lexsort((right_pos, left_pos))
+    return left_pos[order], right_pos[order]
+
+
+def materialize_columns(filepath, positions, columns, chunk_rows=_DEFAULT_CHUNK_ROWS):
+    """
+    指定した列だけを読み込み、positions の行順に並べたDataFrameを返す。
+    バックグラウンドでパース済みのDataFrameがあればそれを使い、なければ必要な列だけをCSVから読む。
+    """
+    if not columns:
+        return pd.DataFrame(index=pd.RangeIndex(len(positions)))
+
+    frame = peek_csv_frame(filepath)
+    if frame is None:
+        frame = parse_csv_chunked(filepath, chunk_rows=chunk_rows, usecols=columns)
+    return frame[columns].take(positions).reset_index(drop=True)
+
+
+def indexed_join(feature_filepath, target_filepath, index_folder, columns=None, key='main_id'):
+    """
+    main_id の索引を使って Feature / Target を内部結合し、必要な列だけを実体化する。
+    結果の列構成は pd.merge(df_feature, df_target, on=key, how='inner') と同じ。
+    """
+    feature_header = read_csv_header(feature_filepath)
+    target_header = read_csv_header(target_filepath)
+
+    left_positions, right_positions = join_positions(
+        get_key_index(feature_filepath, index_folder, key),
+        get_key_index(target_filepath, index_folder, key)
+    )
+
+    overlapping = (set(feature_header) & set(target_header)) - {key}
+    wanted = None if columns is None else set(columns)
+
+    feature_columns, target_columns, renames = [key], [], {}
+    for col in feature_header:
+        if col != key and (wanted is None or col in wanted or f"{col}_x" in wanted):
+            feature_columns.append(col)
+            if col in overlapping:
+                renames.setdefault('feature', {})[col] = f"{col}_x"
+    for col in target_header:
+        if col != key and (wanted is None or col in wanted or f"{col}_y" in wanted):
+            target_columns.append(col)
+            if col in overlapping:
+                renames.setdefault('target', {})[col] = f"{col}_y"
+
+    df_feature = materialize_columns(feature_filepath, left_positions, feature_columns)
+    df_target = materialize_columns(target_filepath, right_positions, target_columns)
+    df_feature = df_feature.rename(columns=renames.get('feature', {}))
+    df_target = df_target.rename(columns=renames.get('target', {}))
+
+    return pd.concat([df_feature, df_target], axis=1)
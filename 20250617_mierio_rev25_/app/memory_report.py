@@ -0,0 +1,242 @@
+import os
+import sys
+import threading
+import tracemalloc
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+from .cache_utils import registered_caches
+
+_MAX_DEPTH = 6
+_KEY_REPR_LENGTH = 120
+
+_trace_lock = threading.Lock()
+_last_snapshot = None
+
+
+def _variable_bytes(variable):
+    dtype = getattr(variable.dtype, 'name', variable.dtype)
+    return int(np.prod(tuple(variable.shape), dtype=np.int64)) * np.dtype(str(dtype)).itemsize
+
+
+def _is_keras_model(obj):
+    return hasattr(obj, 'weights') and hasattr(obj, 'count_params') and hasattr(obj, 'layers')
+
+
+def estimate_bytes(obj, seen=None, depth=0):
+    """
+    オブジェクトが保持しているメモリ量の推定値（バイト）を返す。
+    DataFrame は memory_usage(deep=True)、配列は nbytes、Kerasモデルは重みの合計で数え、
+    コンテナや属性は再帰的にたどる。seen に含まれるオブジェクトは二重に数えない。
+    """
+    if seen is None:
+        seen = set()
+    if obj is None or id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        # ビューやメモリマップは元の配列・ファイルが実体なので、ヘッダー分だけ数える
+        if obj.base is not None or isinstance(obj, np.memmap):
+            return sys.getsizeof(obj)
+        return int(obj.nbytes)
+    if _is_keras_model(obj):
+        return sum(_variable_bytes(v) for v in obj.weights)
+    if isinstance(obj, Future):
+        if obj.done() and obj.exception() is None:
+            return estimate_bytes(obj.result(), seen, depth + 1)
+        return sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)):
+        return sys.getsizeof(obj)
+    if depth >= _MAX_DEPTH:
+        return sys.getsizeof(obj)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += estimate_bytes(key, seen, depth + 1) + estimate_bytes(value, seen, depth + 1)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += estimate_bytes(item, seen, depth + 1)
+    elif hasattr(obj, '__dict__'):
+        for value in vars(obj).values():
+            size += estimate_bytes(value, seen, depth + 1)
+    return size
+
+
+def _describe(obj):
+    if isinstance(obj, pd.DataFrame):
+        return f"DataFrame{obj.shape}"
+    if isinstance(obj, np.ndarray):
+        return f"ndarray{obj.shape} {obj.dtype}"
+    if _is_keras_model(obj):
+        return f"{type(obj).__name__} ({obj.count_params()} params)"
+    return type(obj).__name__
+
+
+def cache_report(top=10):
+    """
+    登録されている全ての LRUCache について、件数と推定バイト数、大きい順の上位 top 件を返す。
+    """
+    caches = []
+    for cache in registered_caches():
+        entries = []
+        for key, value in cache.items():
+            entries.append({
+                'key': repr(key)[:_KEY_REPR_LENGTH],
+                'type': _describe(value),
+                'bytes': estimate_bytes(value),
+            })
+        entries.sort(key=lambda e: e['bytes'], reverse=True)
+        caches.append({
+            'name': cache.name,
+            'entries': len(entries),
+            'maxsize': cache.maxsize,
+            'bytes': sum(e['bytes'] for e in entries),
+            'largest': entries[:top],
+        })
+    return caches
+
+
+def _plot_state_values(plot_state):
+    for name in list(vars(plot_state)):
+        if name.startswith('_'):
+            continue
+        value = plot_state.get_value(name)
+        if value is not None:
+            yield name, value
+
+
+def plot_state_report(plot_state):
+    """
+    PlotState の各属性（DataFrame・モデル・グリッドなど）の推定バイト数を返す。
+    """
+    attributes = {
+        name: {'type': _describe(value), 'bytes': estimate_bytes(value)}
+        for name, value in _plot_state_values(plot_state)
+    }
+    return {
+        'bytes': sum(a['bytes'] for a in attributes.values()),
+        'attributes': dict(sorted(attributes.items(), key=lambda item: item[1]['bytes'], reverse=True)),
+    }
+
+
+def session_report(session_interface, top=10):
+    """
+    サーバー側セッションの件数と、セッションごとの推定バイト数（大きい順に上位 top 件）を返す。
+    クッキーセッションの場合は中身がサーバーにないため件数は分からない。
+    """
+    backend = getattr(session_interface, 'backend', None)
+    if backend is None or not hasattr(backend, 'items'):
+        return {'backend': 'cookie', 'sessions': None}
+
+    sessions = []
+    for sid, data in backend.items():
+        sessions.append({'sid': f"{sid[:8]}...", 'keys': len(data), 'bytes': estimate_bytes(data)})
+    sessions.sort(key=lambda s: s['bytes'], reverse=True)
+    return {
+        'backend': type(backend).__name__,
+        'sessions': len(sessions),
+        'bytes': sum(s['bytes'] for s in sessions),
+        'largest': sessions[:top],
+    }
+
+
+def process_memory():
+    """
+    プロセスの常駐メモリ（RSS）。Linux では /proc から現在値、それ以外は最大値を返す。
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return {'rss_bytes': pages * os.sysconf('SC_PAGE_SIZE'), 'kind': 'current'}
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS はバイト、Linux はキロバイト単位
+        return {'rss_bytes': max_rss if sys.platform == 'darwin' else max_rss * 1024, 'kind': 'peak'}
+    except ImportError:
+        return {'rss_bytes': None, 'kind': None}
+
+
+def memory_report(app, top=10):
+    """
+    キャッシュ・PlotState・セッションごとの推定メモリ使用量をまとめて返す。
+    total_estimated_bytes は複数の場所から参照されているオブジェクトを1回だけ数えた合計。
+    """
+    seen = set()
+    total = sum(estimate_bytes(value, seen) for _, value in _plot_state_values(app.plot_state))
+    for cache in registered_caches():
+        total += sum(estimate_bytes(value, seen) for _, value in cache.items())
+
+    return {
+        'process': process_memory(),
+        'total_estimated_bytes': total,
+        'plot_state': plot_state_report(app.plot_state),
+        'caches': cache_report(top),
+        'sessions': session_report(app.session_interface, top),
+        'tracemalloc': {'tracing': tracemalloc.is_tracing()},
+    }
+
+
+def _take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+
+
+def start_tracing(frames=1):
+    """
+    tracemalloc による割り当ての追跡を開始し、比較の基準となるスナップショットを取る。
+    """
+    global _last_snapshot
+    with _trace_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        _last_snapshot = _take_snapshot()
+    return {'tracing': True, 'frames': tracemalloc.get_traceback_limit()}
+
+
+def stop_tracing():
+    global _last_snapshot
+    with _trace_lock:
+        tracemalloc.stop()
+        _last_snapshot = None
+    return {'tracing': False}
+
+
+def snapshot_diff(top=20):
+    """
+    新しいスナップショットを取り、前回のスナップショットから増えた割り当てを
+    ソース行ごとに大きい順で返す。今回のスナップショットが次回の比較の基準になる。
+    """
+    global _last_snapshot
+    with _trace_lock:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError('tracemalloc is not running. Start it first.')
+        snapshot = _take_snapshot()
+        previous, _last_snapshot = _last_snapshot, snapshot
+
+    current, peak = tracemalloc.get_traced_memory()
+    stats = snapshot.compare_to(previous, 'lineno') if previous is not None else snapshot.statistics('lineno')
+    return {
+        'traced_bytes': current,
+        'peak_traced_bytes': peak,
+        'top': [
+            {
+                'location': str(stat.traceback[0]),
+                'size_bytes': stat.size,
+                'size_diff_bytes': getattr(stat, 'size_diff', stat.size),
+                'count': stat.count,
+                'count_diff': getattr(stat, 'count_diff', stat.count),
+            }
+            for stat in stats[:top]
+        ],
+    }
@@ -0,0 +1,86 @@
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+def grid_columns(x_col, y_col, x_points, y_points):
+    """
+    x/yグリッドの全点を {列名: 値の配列} で返す。点は y が外側、x が内側の順に並ぶため、
+    評価結果を (len(y_points), len(x_points)) に reshape するとグリッドになる。
+    """
+    x_mesh, y_mesh = np.meshgrid(np.asarray(x_points, dtype=np.float64), np.asarray(y_points, dtype=np.float64))
+    return {x_col: x_mesh.ravel(), y_col: y_mesh.ravel()}
+
+
+def _evaluate_grid(evaluate, columns, shape, tile_size):
+    n_points = shape[0] * shape[1]
+    z = np.empty(n_points, dtype=np.float64)
+    for start in range(0, n_points, tile_size):
+        stop = min(start + tile_size, n_points)
+        z[start:stop] = np.asarray(
+            evaluate({name: values[start:stop] for name, values in columns.items()}), dtype=np.float64
+        ).reshape(-1)
+    return z.reshape(shape)
+
+
+def evaluate_models_on_grid(evaluators, columns, shape, tile_size=65536, workers=1):
+    """
+    共通の入力グリッド columns を各モデルの evaluate({列名: 値}) -> (点数,) に渡し、
+    形状 (モデル数,) + shape のグリッドを返す。workers > 1 の場合はモデルごとにスレッドで並列に評価する
+    （TensorFlow の推論と numexpr の計算はGILを解放する）。
+    """
+    z = np.empty((len(evaluators),) + tuple(shape), dtype=np.float64)
+
+    def run(index):
+        z[index] = _evaluate_grid(evaluators[index], columns, shape, tile_size)
+
+    if workers > 1 and len(evaluators) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(evaluators)), thread_name_prefix='model-compare') as executor:
+            # 例外があればここで送出される
+            list(executor.map(run, range(len(evaluators))))
+    else:
+        for index in range(len(evaluators)):
+            run(index)
+    return z
+
+
+def _location(grid, x_points, y_points):
+    if not np.isfinite(grid).any():
+        return None
+    row, col = np.unravel_index(np.nanargmax(grid), grid.shape)
+    return {'x': float(x_points[col]), 'y': float(y_points[row]), 'value': float(grid[row, col])}
+
+
+def compare_grids(z, labels, x_points, y_points):
+    """
+    モデルごとのグリッド z（形状 (モデル数, y, x)）から、各組の差分 (b - a) と、
+    各点でのモデル間の最大の差（最大値 - 最小値）のグリッド、およびその要約を返す。
+    """
+    with np.errstate(invalid='ignore'):
+        pairwise = []
+        for a, b in itertools.combinations(range(len(labels)), 2):
+            diff = z[b] - z[a]
+            abs_diff = np.abs(diff)
+            pairwise.append({
+                'a': labels[a],
+                'b': labels[b],
+                'z_grid': diff.tolist(),
+                'max_abs': float(np.nanmax(abs_diff)) if np.isfinite(abs_diff).any() else None,
+                'rms': float(np.sqrt(np.nanmean(diff ** 2))) if np.isfinite(diff).any() else None,
+                'max_location': _location(abs_diff, x_points, y_points),
+            })
+
+        spread = np.nanmax(z, axis=0) - np.nanmin(z, axis=0) if len(labels) > 1 else np.zeros(z.shape[1:])
+        # 各点で全モデルの平均から最も離れているモデル
+        mean = np.nanmean(z, axis=0)
+        farthest = np.argmax(np.nan_to_num(np.abs(z - mean), nan=-np.inf), axis=0)
+
+    return {
+        'pairwise': pairwise,
+        'max_deviation': {
+            'z_grid': spread.tolist(),
+            'max': float(np.nanmax(spread)) if np.isfinite(spread).any() else None,
+            'max_location': _location(spread, x_points, y_points),
+            'farthest_model': farthest.tolist(),
+        },
+    }
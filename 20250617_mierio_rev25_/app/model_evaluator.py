@@ -50,7 +50,7 @@ def generate_equation_string(target_name, fitting_config, functions_map, fitting
         
     return operator.join(substituted_parts)
 
-def calculate_targets(model_config, feature_values):
+def calculate_targets(model_config, feature_values, target_names=None):
     fitting_config = model_config.get('fitting_config', {})
     functions_list = model_config.get('functions', [])
     fitting_method = model_config.get('fitting_method', '線形結合')
@@ -70,12 +70,16 @@ def calculate_targets(model_config, feature_values):
     })
 
     for target_name in fitting_config.keys():
+        if target_names is not None and target_name not in target_names:
+            continue
         equation_str = generate_equation_string(target_name, fitting_config, functions_map, fitting_method)
         if equation_str:
             try:
-                # numexprで数式を高速に評価
+                # numexprで数式を高速に評価（特徴量に配列を渡せばグリッド全体を一括で評価する）
                 calculated_value = numexpr.evaluate(equation_str, local_dict=local_dict, global_dict={})
-                results[target_name] = calculated_value.item() if hasattr(calculated_value, 'item') else calculated_value
+                if hasattr(calculated_value, 'item') and np.ndim(calculated_value) == 0:
+                    calculated_value = calculated_value.item()
+                results[target_name] = calculated_value
             except Exception as e:
                 raise ValueError(f"Failed to evaluate expression for '{target_name}': {equation_str}. Error: {e}")
                 
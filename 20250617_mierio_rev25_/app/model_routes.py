@@ -1,14 +1,26 @@
 import os
 import json
 import re
+import codecs
 from datetime import datetime
-from flask import Blueprint, request, jsonify, session, current_app
+from flask import Blueprint, request, jsonify, session, current_app, Response, stream_with_context, send_file
 import pandas as pd
 import numpy as np
 import itertools
 from app.model_evaluator import calculate_targets
-from app.data_utils import load_and_merge_csvs
+from app.data_utils import load_and_merge_csvs, convert_columns_to_numeric, get_dataset_identity, get_variable_ranges, prune_disk_cache
 from . import surrogate_model
+from .inverse_design import search_inverse_design
+from . import accuracy_report
+from .warmup import start_overlap_warmup, get_warmup_status
+from .training_sets import load_or_generate_training_set
+from . import sweep_export
+from . import sobol
+from . import model_comparison
+from . import ingest
+from . import asset_store
+from .cache_utils import file_identity
+from .resource_manager import WorkloadBusyError
 
 model_bp = Blueprint('model_bp', __name__)
 
@@ -43,6 +55,9 @@ def save_model_config():
         'model_name': model_name,
         'feature_csv_path': os.path.abspath(feature_filepath),
         'target_csv_path': os.path.abspath(target_filepath),
+        # 保存後にCSVの保存場所が変わっても、内容で同じCSVかを判定できるようにする
+        'feature_csv_sha256': asset_store.file_digest(feature_filepath),
+        'target_csv_sha256': asset_store.file_digest(target_filepath),
         'fitting_method': fitting_method,
         'fitting_config': fitting_config_inverted,
         'functions': functions,
@@ -53,14 +68,22 @@ def save_model_config():
     json_filename = f"{base_filename}.json"
     json_filepath = os.path.join(current_app.config['JSON_FOLDER'], json_filename)
 
+    try:
+        training_options = surrogate_model.training_options(current_app.config, data)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Invalid training options: {str(e)}'}), 400
+
     try:
         with open(json_filepath, 'w', encoding='utf-8') as f:
             json.dump(save_data, f, ensure_ascii=False, indent=4)
 
         try:
-            _train_and_save_surrogate_model(save_data, base_filename)
+            training_report = _train_and_save_surrogate_model(save_data, base_filename, options=training_options)
             message = f'Model config and surrogate model saved successfully: {json_filename}'
-            return jsonify({'message': message, 'filepath': json_filepath}), 200
+            return jsonify({'message': message, 'filepath': json_filepath, 'training': training_report}), 200
+        except WorkloadBusyError as e:
+            message = f'Model config saved as {json_filename}, but the surrogate model was not trained: {str(e)}'
+            return jsonify({'error': message}), 503
         except Exception as e:
             message = f'Model config saved as {json_filename}, but failed to train surrogate model: {str(e)}'
             return jsonify({'error': message}), 500
@@ -69,18 +92,18 @@ def save_model_config():
         return jsonify({'error': f'Failed to save model configuration: {str(e)}'}), 500
 
 
-def _train_and_save_surrogate_model(model_config, base_filename, resolution=10):
+def _train_and_save_surrogate_model(model_config, base_filename, resolution=10, options=None):
     feature_filepath = session.get('feature_filepath')
     target_filepath = session.get('target_filepath')
     
-    df_merged = load_and_merge_csvs(feature_filepath, target_filepath)
-    
     feature_headers = session.get('feature_headers', [])
     target_headers = session.get('target_headers', [])
     
     feature_vars = [h for h in feature_headers if h.lower() != 'main_id']
     target_vars = [h for h in target_headers if h.lower() != 'main_id']
 
+    df_merged = load_and_merge_csvs(feature_filepath, target_filepath, columns=feature_vars)
+
     coords = {}
     for var in feature_vars:
         min_val, max_val = df_merged[var].min(), df_merged[var].max()
@@ -91,36 +114,42 @@ def _train_and_save_surrogate_model(model_config, base_filename, resolution=10):
         else:
             coords[var] = np.linspace(min_val, max_val, resolution)
     
-    grid_points = list(itertools.product(*coords.values()))
-    
-    all_results = []
-    for i, point in enumerate(grid_points):
-        feature_values_for_calc = dict(zip(feature_vars, point))
-        
-        for key, value in feature_values_for_calc.items():
-            try:
-                feature_values_for_calc[key] = float(value)
-            except (ValueError, TypeError):
-                pass
-        
-        calculated_targets = calculate_targets(model_config, feature_values_for_calc)
-        
-        result_row = {**feature_values_for_calc, **calculated_targets}
-        all_results.append(result_row)
-
-    results_df = pd.DataFrame(all_results)
+    results_df, cache_hit = load_or_generate_training_set(
+        model_config, feature_vars, target_vars, coords, current_app.config['TRAINING_SETS_FOLDER']
+    )
+    current_app.logger.info(f"Surrogate training set: {len(results_df)} rows ({'cached' if cache_hit else 'generated'}).")
+    prune_disk_cache('TRAINING_SETS_FOLDER')
 
     models_folder = current_app.config['MODELS_FOLDER']
     model_save_path = os.path.join(models_folder, f"{base_filename}.keras")
     scaler_save_path = os.path.join(models_folder, f"{base_filename}_scaler.joblib")
 
-    surrogate_model.train_and_save_model(
-        df=results_df,
-        feature_vars=feature_vars,
-        target_vars=target_vars,
-        model_path=model_save_path,
-        scaler_path=scaler_save_path
-    )
+    with current_app.resource_manager.workload('training'):
+        return surrogate_model.train_and_save_model(
+            df=results_df,
+            feature_vars=feature_vars,
+            target_vars=target_vars,
+            model_path=model_save_path,
+            scaler_path=scaler_save_path,
+            **(options or {})
+        )
+
+
+def _is_same_csv(saved_path, saved_digest, current_path):
+    """
+    モデル設定の保存時のCSVが現在のCSVと同じかを判定する。パスが異なっても
+    （アップロード先が assets/<asset_id>/ に変わる前に保存された設定など）、内容が同じなら同じとみなす。
+    ハッシュを持たない古い設定では、保存時のパスにファイルが残っていればその内容と比較する。
+    """
+    if not saved_path:
+        return False
+    if os.path.normpath(saved_path) == os.path.normpath(current_path):
+        return True
+    if not saved_digest:
+        if not os.path.isfile(saved_path):
+            return False
+        saved_digest = asset_store.file_digest(saved_path)
+    return saved_digest == asset_store.file_digest(current_path)
 
 
 @model_bp.route('/load_model_config', methods=['POST'])
@@ -158,11 +187,8 @@ def load_model_config():
         
         session['loaded_model_config'] = loaded_data
 
-        loaded_feature_csv_path = loaded_data.get('feature_csv_path')
-        loaded_target_csv_path = loaded_data.get('target_csv_path')
-
-        if not (os.path.normpath(loaded_feature_csv_path) == os.path.normpath(current_feature_filepath) and \
-                os.path.normpath(loaded_target_csv_path) == os.path.normpath(current_target_filepath)):
+        if not (_is_same_csv(loaded_data.get('feature_csv_path'), loaded_data.get('feature_csv_sha256'), current_feature_filepath) and
+                _is_same_csv(loaded_data.get('target_csv_path'), loaded_data.get('target_csv_sha256'), current_target_filepath)):
             return jsonify({'error': 'The configuration file was saved with different CSV files. Please load the matching CSVs first.'}), 400
         
         base_filename, _ = os.path.splitext(json_filename)
@@ -171,18 +197,32 @@ def load_model_config():
         scaler_path = os.path.join(models_folder, f"{base_filename}_scaler.joblib")
 
         plot_state = current_app.plot_state
+        warmup_started = False
         
         if os.path.exists(model_path) and os.path.exists(scaler_path):
             try:
                 model, scaler = surrogate_model.load_model_and_scaler(model_path, scaler_path)
                 plot_state.set_value('loaded_model', model)
                 plot_state.set_value('loaded_scaler', scaler)
+                plot_state.set_value('loaded_model_identity', surrogate_model.get_model_identity(model_path, scaler_path))
+                if data.get('warmup', current_app.config['WARMUP_ON_MODEL_LOAD']) and model is not None:
+                    warmup_started = True
+                    start_overlap_warmup(
+                        current_app._get_current_object(),
+                        model,
+                        scaler,
+                        plot_state.get_value('loaded_model_identity'),
+                        current_feature_filepath,
+                        current_target_filepath
+                    )
             except Exception as e:
                 plot_state.set_value('loaded_model', None)
                 plot_state.set_value('loaded_scaler', None)
+                plot_state.set_value('loaded_model_identity', None)
         else:
             plot_state.set_value('loaded_model', None)
             plot_state.set_value('loaded_scaler', None)
+            plot_state.set_value('loaded_model_identity', None)
         
         plot_state.set_value('overlap_contour_data', None)
 
@@ -207,7 +247,8 @@ def load_model_config():
             'model_name': loaded_data.get('model_name', ''),
             'fitting_config': fitting_config_for_frontend,
             'fitting_method': loaded_data.get('fitting_method'),
-            'functions': loaded_data.get('functions')
+            'functions': loaded_data.get('functions'),
+            'warmup_started': warmup_started
         }), 200
 
     except json.JSONDecodeError:
@@ -263,3 +304,578 @@ def run_calculation_demo():
 
     except Exception as e:
         return jsonify({'error': f'An error occurred during the calculation demo: {str(e)}'}), 500
+
+
+def _get_prediction_target_names(json_filename):
+    json_filepath = os.path.join(current_app.config['JSON_FOLDER'], json_filename)
+    if os.path.exists(json_filepath):
+        with open(json_filepath, 'r', encoding='utf-8') as f:
+            model_config = json.load(f)
+        target_csv_path = model_config.get('target_csv_path')
+        if target_csv_path and os.path.exists(target_csv_path):
+            columns = pd.read_csv(target_csv_path, nrows=0).columns.str.strip()
+            return [h for h in columns if h.lower() != 'main_id']
+
+    return [h for h in session.get('target_headers', []) if h.lower() != 'main_id']
+
+
+def _iter_prediction_input(payload, feature_names, chunk_size):
+    """
+    リクエストの入力点を chunk_size 行ごとの DataFrame として順に返す。
+    JSON本文の 'points'、アップロードファイル（CSV / NDJSON）、
+    または text/csv・application/x-ndjson の本文に対応する。
+    """
+    if payload is not None:
+        points = payload.get('points')
+        if not isinstance(points, list):
+            raise ValueError("'points' must be a list of points.")
+        columns = payload.get('columns') or feature_names
+        for start in range(0, len(points), chunk_size):
+            batch = points[start:start + chunk_size]
+            if batch and isinstance(batch[0], dict):
+                yield pd.DataFrame(batch)
+            else:
+                yield pd.DataFrame(batch, columns=columns)
+        return
+
+    if 'file' in request.files:
+        file = request.files['file']
+        stream = file.stream
+        is_ndjson = file.filename.lower().endswith(('.ndjson', '.jsonl'))
+    else:
+        stream = request.stream
+        is_ndjson = request.mimetype in ('application/x-ndjson', 'application/jsonl')
+
+    if is_ndjson:
+        reader = pd.read_json(codecs.getreader('utf-8')(stream), lines=True, chunksize=chunk_size)
+    else:
+        reader = pd.read_csv(stream, chunksize=chunk_size)
+
+    for chunk in reader:
+        chunk.columns = chunk.columns.astype(str).str.strip()
+        yield chunk
+
+
+@model_bp.route('/predict', methods=['POST'])
+def predict():
+    payload = request.get_json() if request.is_json else None
+    params = payload if payload is not None else request.args
+    json_filename = params.get('json_filename')
+    output_format = params.get('format', 'ndjson')
+
+    if not json_filename:
+        return jsonify({'error': 'No model file specified.'}), 400
+    if output_format not in ('ndjson', 'csv'):
+        return jsonify({'error': f"Unsupported output format: {output_format}"}), 400
+
+    model_path, scaler_path = surrogate_model.resolve_model_paths(current_app.config['MODELS_FOLDER'], json_filename)
+    if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+        return jsonify({'error': f'Model (.keras) or scaler (.joblib) file not found for {json_filename}.'}), 404
+
+    model, scaler = surrogate_model.load_model_and_scaler(model_path, scaler_path)
+    if model is None or scaler is None:
+        return jsonify({'error': 'Failed to load model or scaler.'}), 500
+
+    feature_names = list(scaler.feature_names_in_)
+    target_names = _get_prediction_target_names(json_filename)
+    if len(target_names) != model.output_shape[-1]:
+        return jsonify({'error': 'Target headers for this model could not be determined. Please re-upload the target CSV.'}), 400
+
+    chunk_size = current_app.config['PREDICT_CHUNK_SIZE']
+    try:
+        chunks = _iter_prediction_input(payload, feature_names, chunk_size)
+        first_chunk = next(chunks, None)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Failed to read input points: {str(e)}'}), 400
+
+    if first_chunk is None or first_chunk.empty:
+        return jsonify({'error': 'No input points provided.'}), 400
+
+    missing = [f for f in feature_names if f not in first_chunk.columns]
+    if missing:
+        return jsonify({'error': f'Input is missing feature columns: {missing}'}), 400
+
+    def generate():
+        # 応答の送信開始後に失敗した場合は、途中までの結果を完全な結果と取り違えないよう
+        # 最後にエラー行（NDJSON は {"error": ...}、CSV は "# ERROR: ..." のコメント行）を出力する
+        header_written = False
+        try:
+            for chunk in itertools.chain([first_chunk], chunks):
+                # 点のリストやNDJSONではチャンクごとに列が変わりうるため、毎回確かめる
+                missing = [f for f in feature_names if f not in chunk.columns]
+                if missing:
+                    raise KeyError(f'Input is missing feature columns: {missing}')
+                X = chunk[feature_names].to_numpy(dtype=np.float32)
+                with current_app.resource_manager.workload('evaluation'):
+                    predictions = surrogate_model.predict_batch(model, scaler, X)
+
+                result_df = chunk.drop(columns=[c for c in chunk.columns if c in target_names]).reset_index(drop=True)
+                result_df[target_names] = predictions
+
+                if output_format == 'csv':
+                    yield result_df.to_csv(index=False, header=not header_written)
+                    header_written = True
+                else:
+                    lines = result_df.to_json(orient='records', lines=True)
+                    yield lines if lines.endswith('\n') else lines + '\n'
+        except Exception as e:
+            current_app.logger.error(f"Error while streaming predictions: {e}", exc_info=True)
+            message = f'Prediction aborted: {str(e)}'
+            if output_format == 'ndjson':
+                yield json.dumps({'error': message}) + '\n'
+            else:
+                yield '# ERROR: ' + ' '.join(message.splitlines()) + '\n'
+
+    mimetype = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+@model_bp.route('/inverse_design', methods=['POST'])
+def inverse_design():
+    data = request.get_json()
+    json_filename = data.get('json_filename')
+    targets = data.get('targets') or {}
+    constants = data.get('constants') or {}
+
+    if not json_filename:
+        return jsonify({'error': 'No model file specified.'}), 400
+    if not targets:
+        return jsonify({'error': 'No target values specified.'}), 400
+
+    model_path, scaler_path = surrogate_model.resolve_model_paths(current_app.config['MODELS_FOLDER'], json_filename)
+    if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+        return jsonify({'error': f'Model (.keras) or scaler (.joblib) file not found for {json_filename}.'}), 404
+
+    try:
+        model, scaler = surrogate_model.load_model_and_scaler(model_path, scaler_path)
+        if model is None or scaler is None:
+            return jsonify({'error': 'Failed to load model or scaler.'}), 500
+
+        target_names = _get_prediction_target_names(json_filename)
+        if len(target_names) != model.output_shape[-1]:
+            return jsonify({'error': 'Target headers for this model could not be determined. Please re-upload the target CSV.'}), 400
+
+        steps = int(data.get('steps', 200))
+        if not 1 <= steps <= current_app.config['INVERSE_DESIGN_MAX_STEPS']:
+            return jsonify({'error': f"steps must be between 1 and {current_app.config['INVERSE_DESIGN_MAX_STEPS']}."}), 400
+
+        with current_app.resource_manager.workload('batch'):
+            result = search_inverse_design(
+                model=model,
+                scaler=scaler,
+                target_names=target_names,
+                targets=targets,
+                constants={name: float(value) for name, value in constants.items()},
+                bounds=data.get('bounds'),
+                n_starts=min(int(data.get('n_starts', 2048)), current_app.config['INVERSE_DESIGN_MAX_STARTS']),
+                steps=steps,
+                top_k=int(data.get('top_k', 10)),
+                seed=data.get('seed')
+            )
+        return jsonify(result), 200
+
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 400
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Invalid search parameters: {str(e)}'}), 400
+    except WorkloadBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        current_app.logger.error(f"Error in inverse_design: {e}", exc_info=True)
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+
+@model_bp.route('/evaluate', methods=['POST'])
+def evaluate():
+    data = request.get_json()
+    json_filename = data.get('json_filename')
+    x_col = data.get('x_col')
+    y_col = data.get('y_col')
+    bins = data.get('bins', 20)
+
+    if not json_filename:
+        return jsonify({'error': 'No model file specified.'}), 400
+
+    feature_filepath = session.get('feature_filepath')
+    target_filepath = session.get('target_filepath')
+    if not feature_filepath or not target_filepath:
+        return jsonify({'error': 'Feature or Target CSV files are not currently loaded. Please load them first.'}), 400
+
+    model_path, scaler_path = surrogate_model.resolve_model_paths(current_app.config['MODELS_FOLDER'], json_filename)
+    if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+        return jsonify({'error': f'Model (.keras) or scaler (.joblib) file not found for {json_filename}.'}), 404
+
+    try:
+        bins = int(bins)
+        if not 1 <= bins <= 200:
+            return jsonify({'error': 'bins must be between 1 and 200.'}), 400
+
+        model, scaler = surrogate_model.load_model_and_scaler(model_path, scaler_path)
+        if model is None or scaler is None:
+            return jsonify({'error': 'Failed to load model or scaler.'}), 500
+
+        model_identity = surrogate_model.get_model_identity(model_path, scaler_path)
+        dataset_identity = get_dataset_identity(feature_filepath, target_filepath)
+        target_names = _get_prediction_target_names(json_filename)
+        if len(target_names) != model.output_shape[-1]:
+            return jsonify({'error': 'Target headers for this model could not be determined. Please re-upload the target CSV.'}), 400
+
+        # 再表示ではCSVの読み込み・結合を行わず、キャッシュ済みの残差をそのまま使う
+        residual_set = accuracy_report.peek_residual_set(model_identity, dataset_identity)
+        if residual_set is None:
+            feature_names = list(scaler.feature_names_in_)
+            df = load_and_merge_csvs(feature_filepath, target_filepath, columns=feature_names + target_names)
+            df = convert_columns_to_numeric(df, feature_names + target_names)
+
+            with current_app.resource_manager.workload('evaluation'):
+                residual_set = accuracy_report.get_residual_set(model_identity, dataset_identity, model, scaler, df, target_names)
+
+        result = {'count': len(residual_set.features), 'stats': residual_set.stats}
+        if x_col and y_col:
+            result['residual_map'] = accuracy_report.get_residual_map(model_identity, dataset_identity, residual_set, x_col, y_col, bins)
+        return jsonify(result), 200
+
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 400
+    except KeyError as e:
+        return jsonify({'error': f'Column not found during evaluation: {str(e)}. The model may be incompatible.'}), 400
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except WorkloadBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        current_app.logger.error(f"Error in evaluate: {e}", exc_info=True)
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+
+@model_bp.route('/warmup_status', methods=['GET'])
+def warmup_status():
+    return jsonify(get_warmup_status()), 200
+
+
+@model_bp.route('/sweep', methods=['POST'])
+def start_sweep():
+    data = request.get_json()
+    json_filename = data.get('json_filename')
+    mode = data.get('mode', 'surrogate')
+    output_format = data.get('format', 'npy')
+    constants = data.get('constants') or {}
+
+    if not json_filename:
+        return jsonify({'error': 'No model file specified.'}), 400
+    if mode not in ('surrogate', 'exact'):
+        return jsonify({'error': f'Unknown sweep mode: {mode}'}), 400
+    if output_format not in sweep_export.SWEEP_FORMATS:
+        return jsonify({'error': f"Unsupported output format: {output_format}. Available: {list(sweep_export.SWEEP_FORMATS)}"}), 400
+
+    try:
+        axes = sweep_export.parse_sweep_axes(data.get('axes'))
+        constants = {name: float(value) for name, value in constants.items()}
+        total = sweep_export.sweep_size(axes)
+        if total > current_app.config['SWEEP_MAX_POINTS']:
+            return jsonify({'error': f"The sweep has {total} points, more than the limit of {current_app.config['SWEEP_MAX_POINTS']}."}), 400
+
+        if mode == 'exact':
+            json_filepath = os.path.join(current_app.config['JSON_FOLDER'], json_filename)
+            if not os.path.exists(json_filepath):
+                return jsonify({'error': f'JSON file not found: {json_filename}'}), 404
+            with open(json_filepath, 'r', encoding='utf-8') as f:
+                model_config = json.load(f)
+
+            output_names = list(data.get('targets') or model_config.get('fitting_config', {}).keys())
+            evaluate = sweep_export.law_evaluator(model_config, output_names, constants,
+                                                  axis_names=[name for name, _ in axes])
+        else:
+            model_path, scaler_path = surrogate_model.resolve_model_paths(current_app.config['MODELS_FOLDER'], json_filename)
+            if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+                return jsonify({'error': f'Model (.keras) or scaler (.joblib) file not found for {json_filename}.'}), 404
+
+            model, scaler = surrogate_model.load_model_and_scaler(model_path, scaler_path)
+            if model is None or scaler is None:
+                return jsonify({'error': 'Failed to load model or scaler.'}), 500
+
+            output_names = _get_prediction_target_names(json_filename)
+            if len(output_names) != model.output_shape[-1]:
+                return jsonify({'error': 'Target headers for this model could not be determined. Please re-upload the target CSV.'}), 400
+            evaluate = sweep_export.surrogate_evaluator(model, scaler, [name for name, _ in axes], constants)
+
+        if not output_names:
+            return jsonify({'error': 'The model has no targets to evaluate.'}), 400
+
+        job_id = sweep_export.start_sweep_export(
+            current_app._get_current_object(),
+            evaluate,
+            axes,
+            output_names,
+            output_format,
+            current_app.config['SWEEP_CHUNK_SIZE']
+        )
+        job = sweep_export.get_sweep_job(job_id)
+        job.pop('path', None)
+        return jsonify(job), 202
+
+    except sweep_export.InsufficientDiskSpaceError as e:
+        return jsonify({'error': str(e)}), 507
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 400
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Invalid sweep parameters: {str(e)}'}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error in start_sweep: {e}", exc_info=True)
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+
+@model_bp.route('/sweep/<job_id>', methods=['GET'])
+def sweep_status(job_id):
+    job = sweep_export.get_sweep_job(job_id)
+    if job is None:
+        return jsonify({'error': f'Sweep job not found: {job_id}'}), 404
+    job.pop('path', None)
+    return jsonify(job), 200
+
+
+@model_bp.route('/sweep/<job_id>/download', methods=['GET'])
+def download_sweep(job_id):
+    job = sweep_export.get_sweep_job(job_id)
+    if job is None:
+        return jsonify({'error': f'Sweep job not found: {job_id}'}), 404
+    if job['state'] != 'done':
+        return jsonify({'error': f"Sweep job is not finished (state: {job['state']})."}), 409
+    if not os.path.exists(job['path']):
+        return jsonify({'error': 'The sweep output file no longer exists.'}), 410
+    return send_file(job['path'], as_attachment=True, download_name=os.path.basename(job['path']))
+
+
+@model_bp.route('/sensitivity', methods=['POST'])
+def sensitivity():
+    data = request.get_json()
+    json_filename = data.get('json_filename')
+    mode = data.get('mode', 'surrogate')
+    constants = data.get('constants') or {}
+    bounds_override = data.get('bounds') or {}
+
+    if not json_filename:
+        return jsonify({'error': 'No model file specified.'}), 400
+    if mode not in ('surrogate', 'exact'):
+        return jsonify({'error': f'Unknown sensitivity mode: {mode}'}), 400
+
+    try:
+        n = int(data.get('n', 1024))
+        n_bootstrap = int(data.get('n_bootstrap', 100))
+        confidence = float(data.get('confidence', 0.95))
+        seed = int(data.get('seed', 0))
+        if not 2 <= n <= current_app.config['SOBOL_MAX_BASE_SAMPLES']:
+            return jsonify({'error': f"n must be between 2 and {current_app.config['SOBOL_MAX_BASE_SAMPLES']}."}), 400
+        if not 0 <= n_bootstrap <= 1000 or not 0 < confidence < 1:
+            return jsonify({'error': 'n_bootstrap must be between 0 and 1000 and confidence between 0 and 1.'}), 400
+        constants = {name: float(value) for name, value in constants.items()}
+
+        if mode == 'exact':
+            json_filepath = os.path.join(current_app.config['JSON_FOLDER'], json_filename)
+            if not os.path.exists(json_filepath):
+                return jsonify({'error': f'JSON file not found: {json_filename}'}), 404
+            with open(json_filepath, 'r', encoding='utf-8') as f:
+                model_config = json.load(f)
+
+            fitting_config = model_config.get('fitting_config', {})
+            target_names = list(data.get('targets') or fitting_config.keys())
+            feature_names = sorted({f for features in fitting_config.values() for f in features
+                                    if f.lower() != 'main_id' and f not in constants})
+            missing = [f for f in feature_names if f not in bounds_override]
+            if missing:
+                feature_filepath = model_config.get('feature_csv_path')
+                if not feature_filepath or not os.path.exists(feature_filepath):
+                    feature_filepath = session.get('feature_filepath')
+                if not feature_filepath:
+                    return jsonify({'error': 'Feature CSV for the feature ranges is not available.'}), 400
+                ranges = get_variable_ranges(ingest.read_csv_frame(feature_filepath), missing)
+                model_identity = file_identity(json_filepath, feature_filepath)
+            else:
+                ranges = {}
+                model_identity = file_identity(json_filepath)
+            bounds = [bounds_override.get(f) or (ranges[f]['min'], ranges[f]['max']) for f in feature_names]
+            evaluate = sweep_export.law_evaluator(model_config, target_names, constants)
+        else:
+            model_path, scaler_path = surrogate_model.resolve_model_paths(current_app.config['MODELS_FOLDER'], json_filename)
+            if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+                return jsonify({'error': f'Model (.keras) or scaler (.joblib) file not found for {json_filename}.'}), 404
+
+            model, scaler = surrogate_model.load_model_and_scaler(model_path, scaler_path)
+            if model is None or scaler is None:
+                return jsonify({'error': 'Failed to load model or scaler.'}), 500
+
+            target_names = _get_prediction_target_names(json_filename)
+            if len(target_names) != model.output_shape[-1]:
+                return jsonify({'error': 'Target headers for this model could not be determined. Please re-upload the target CSV.'}), 400
+
+            all_features = list(scaler.feature_names_in_)
+            feature_names = [f for f in all_features if f not in constants]
+            bounds = [bounds_override.get(f) or (scaler.data_min_[all_features.index(f)], scaler.data_max_[all_features.index(f)])
+                      for f in feature_names]
+            model_identity = surrogate_model.get_model_identity(model_path, scaler_path)
+            evaluate = sweep_export.surrogate_evaluator(model, scaler, feature_names, constants)
+
+        if not feature_names:
+            return jsonify({'error': 'No features left to analyze. Remove some constants.'}), 400
+        if not target_names:
+            return jsonify({'error': 'The model has no targets to analyze.'}), 400
+        bounds = [(float(low), float(high)) for low, high in bounds]
+
+        cache_key = (mode, model_identity, tuple(target_names), tuple(feature_names), tuple(bounds),
+                     tuple(sorted(constants.items())), n, n_bootstrap, confidence, seed)
+        with current_app.resource_manager.workload('batch'):
+            result = sobol.analyze(
+                evaluate, feature_names, bounds, target_names,
+                n=n, n_bootstrap=n_bootstrap, confidence=confidence, seed=seed,
+                batch_size=current_app.config['SWEEP_CHUNK_SIZE'], cache_key=cache_key
+            )
+        result['mode'] = mode
+        return jsonify(result), 200
+
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 400
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Invalid sensitivity parameters: {str(e)}'}), 400
+    except WorkloadBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        current_app.logger.error(f"Error in sensitivity: {e}", exc_info=True)
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+
+def _comparison_evaluator(spec, x_col, y_col, z_col, constants):
+    """
+    比較するモデルの指定から、(評価関数, 表示名, x/y の範囲) を返す。
+    source は 'surrogate'（MODELS_FOLDER）、'tuned'（TUNED_MODELS_FOLDER のファインチューニング済みモデル）、
+    'exact'（法則モデルの数式）のいずれか。
+    """
+    json_filename = spec.get('json_filename')
+    source = spec.get('source', 'surrogate')
+    if not json_filename:
+        raise ValueError("Each model needs a 'json_filename'.")
+    if source not in ('surrogate', 'tuned', 'exact'):
+        raise ValueError(f"Unknown model source: {source}")
+    label = spec.get('label') or f"{os.path.splitext(json_filename)[0]} ({source})"
+
+    if source == 'exact':
+        json_filepath = os.path.join(current_app.config['JSON_FOLDER'], json_filename)
+        if not os.path.exists(json_filepath):
+            raise FileNotFoundError(f'JSON file not found: {json_filename}')
+        with open(json_filepath, 'r', encoding='utf-8') as f:
+            model_config = json.load(f)
+
+        feature_filepath = model_config.get('feature_csv_path')
+        if not feature_filepath or not os.path.exists(feature_filepath):
+            feature_filepath = session.get('feature_filepath')
+        ranges = None
+        if feature_filepath:
+            ranges = get_variable_ranges(ingest.read_csv_frame(feature_filepath), [x_col, y_col])
+            ranges = {name: (r['min'], r['max']) for name, r in ranges.items()}
+        evaluate = sweep_export.law_evaluator(model_config, [z_col], constants, axis_names=[x_col, y_col])
+        return evaluate, label, ranges
+
+    model_path, scaler_path = surrogate_model.resolve_model_paths(current_app.config['MODELS_FOLDER'], json_filename)
+    if source == 'tuned':
+        # ファインチューニング済みモデルは元のスケーラーをそのまま使う
+        model_path = os.path.join(current_app.config['TUNED_MODELS_FOLDER'], os.path.basename(model_path))
+    if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+        raise FileNotFoundError(f'Model (.keras) or scaler (.joblib) file not found for {json_filename} ({source}).')
+
+    model, scaler = surrogate_model.load_model_and_scaler(model_path, scaler_path)
+    if model is None or scaler is None:
+        raise FileNotFoundError(f'Failed to load model or scaler for {json_filename} ({source}).')
+
+    target_names = _get_prediction_target_names(json_filename)
+    if z_col not in target_names or len(target_names) != model.output_shape[-1]:
+        raise KeyError(f"Target '{z_col}' is not an output of {json_filename}.")
+    target_index = target_names.index(z_col)
+
+    feature_names = list(scaler.feature_names_in_)
+    ranges = {
+        name: (scaler.data_min_[feature_names.index(name)], scaler.data_max_[feature_names.index(name)])
+        for name in (x_col, y_col) if name in feature_names
+    }
+    evaluate_all = sweep_export.surrogate_evaluator(model, scaler, [x_col, y_col], constants)
+    return (lambda columns: evaluate_all(columns)[:, target_index]), label, ranges
+
+
+@model_bp.route('/compare', methods=['POST'])
+def compare_models():
+    data = request.get_json()
+    model_specs = data.get('models') or []
+    feature_params = data.get('featureParams', [])
+    z_col = data.get('targetParam')
+
+    if len(model_specs) < 2:
+        return jsonify({'error': 'At least two models are required for a comparison.'}), 400
+    if len(model_specs) > current_app.config['COMPARE_MAX_MODELS']:
+        return jsonify({'error': f"At most {current_app.config['COMPARE_MAX_MODELS']} models can be compared at once."}), 400
+    if not feature_params or not z_col:
+        return jsonify({'error': 'Axis or Target parameters not provided.'}), 400
+
+    try:
+        resolution = int(data.get('resolution', 50))
+        if not 2 <= resolution <= current_app.config['CONTOUR_MAX_RESOLUTION']:
+            return jsonify({'error': f"Resolution must be between 2 and {current_app.config['CONTOUR_MAX_RESOLUTION']}."}), 400
+
+        x_col = next((p['name'] for p in feature_params if p['type'] == 'X_axis'), None)
+        y_col = next((p['name'] for p in feature_params if p['type'] == 'Y_axis'), None)
+        constants = {p['name']: float(p['value']) for p in feature_params if p['type'] == 'Constant'}
+        if not x_col or not y_col:
+            return jsonify({'error': 'X-axis or Y-axis not defined.'}), 400
+
+        evaluators, labels, model_ranges = [], [], []
+        for spec in model_specs:
+            evaluate, label, ranges = _comparison_evaluator(spec, x_col, y_col, z_col, constants)
+            evaluators.append(evaluate)
+            labels.append(label)
+            model_ranges.append(ranges or {})
+        if len(set(labels)) != len(labels):
+            return jsonify({'error': 'Model labels must be unique.'}), 400
+
+        # 範囲の指定がなければ、全モデルの範囲を合わせた範囲でグリッドを作る
+        axis_ranges = {}
+        for name, key in ((x_col, 'x_range'), (y_col, 'y_range')):
+            if data.get(key):
+                axis_ranges[name] = tuple(float(v) for v in data[key])
+                continue
+            known = [r[name] for r in model_ranges if name in r]
+            if not known:
+                return jsonify({'error': f"Range for '{name}' could not be determined. Please specify '{key}'."}), 400
+            axis_ranges[name] = (float(min(r[0] for r in known)), float(max(r[1] for r in known)))
+
+        x_points = np.linspace(*axis_ranges[x_col], resolution)
+        y_points = np.linspace(*axis_ranges[y_col], resolution)
+        columns = model_comparison.grid_columns(x_col, y_col, x_points, y_points)
+
+        with current_app.resource_manager.workload('evaluation') as threads:
+            z = model_comparison.evaluate_models_on_grid(
+                evaluators, columns, (resolution, resolution),
+                tile_size=current_app.config['GRID_TILE_SIZE'],
+                workers=min(current_app.config['COMPARE_WORKERS'], threads)
+            )
+        comparison = model_comparison.compare_grids(z, labels, x_points, y_points)
+
+        return jsonify({
+            'x_grid': x_points.tolist(),
+            'y_grid': y_points.tolist(),
+            'target': z_col,
+            'models': [
+                {'label': label, 'source': spec.get('source', 'surrogate'), 'json_filename': spec.get('json_filename'),
+                 'z_grid': z[i].tolist()}
+                for i, (label, spec) in enumerate(zip(labels, model_specs))
+            ],
+            **comparison
+        }), 200
+
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 400
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Invalid comparison parameters: {str(e)}'}), 400
+    except WorkloadBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        current_app.logger.error(f"Error in compare_models: {e}", exc_info=True)
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
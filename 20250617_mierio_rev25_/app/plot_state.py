@@ -14,7 +14,9 @@ class PlotState:
             
             self.loaded_model = None
             self.loaded_scaler = None
+            self.loaded_model_identity: str = None
             self.overlap_contour_data: dict = None
+            self.overlap_etag: str = None
 
     def set_value(self, key: str, value):
         with self._lock:
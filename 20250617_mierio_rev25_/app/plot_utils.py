@@ -1,12 +1,53 @@
 import plotly.utils
+import plotly.colors
 import plotly.graph_objects as go
 import json
 from plotly.utils import PlotlyJSONEncoder
-import pandas as pd
 import numpy as np
-import itertools
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app, session
 from . import surrogate_model
+from .model_evaluator import calculate_targets
+from .cache_utils import LRUCache
+from . import isolines
+from .request_coalescing import raise_if_cancelled
+
+# (モデル識別子, x軸, y軸, 定数, 解像度) ごとの全ターゲットのオーバーラップ用グリッド
+_overlap_grid_cache = LRUCache(maxsize=512, name='overlap_grids')
+
+def _get_target_headers():
+    target_headers = [h for h in session.get('target_headers', []) if h.lower() != 'main_id']
+    if not target_headers:
+         raise ValueError("Target headers not found in session. Please re-upload the target CSV.")
+    return target_headers
+
+def _get_axis_ranges(scaler, x_col, y_col):
+    feature_names = list(scaler.feature_names_in_)
+    min_vals, max_vals = scaler.data_min_, scaler.data_max_
+    try:
+        x_min, x_max = min_vals[feature_names.index(x_col)], max_vals[feature_names.index(x_col)]
+        y_min, y_max = min_vals[feature_names.index(y_col)], max_vals[feature_names.index(y_col)]
+    except ValueError as e:
+        raise KeyError(f"Axis '{e.args[0].replace(' is not in list', '')}' not found in the features the model was trained on.")
+    return (x_min, x_max), (y_min, y_max)
+
+def _build_grid_inputs(feature_names, x_col, y_col, x_points, y_points, constants):
+    """
+    グリッド点の入力行列を直接NumPy配列として作る。
+    行の並びは itertools.product(x_points, y_points) と同じ（xが外側のループ）。
+    """
+    xx, yy = np.meshgrid(x_points, y_points, indexing='ij')
+    inputs = np.empty((xx.size, len(feature_names)), dtype=np.float32)
+    for i, name in enumerate(feature_names):
+        if name == x_col:
+            inputs[:, i] = xx.ravel()
+        elif name == y_col:
+            inputs[:, i] = yy.ravel()
+        elif name in constants:
+            inputs[:, i] = float(constants[name])
+        else:
+            raise KeyError(f"Constant value for '{name}' is required by the model but was not provided.")
+    return inputs
 
 def generate_scatter_plot(df_filtered, x_col, y_col, z_col):
     if df_filtered.empty:
@@ -44,7 +85,13 @@ def generate_scatter_plot(df_filtered, x_col, y_col, z_col):
     return json.dumps([scatter_data], cls=plotly.utils.PlotlyJSONEncoder), \
            json.dumps(layout, cls=plotly.utils.PlotlyJSONEncoder)
 
-def generate_contour_plot(grid_results, x_col, y_col, z_col):
+def generate_contour_plot(grid_results, x_col, y_col, z_col, isoline_levels=None, simplify_tolerance=0.5):
+    """
+    グリッドからコンター表示用のPlotlyトレースのJSONを作る。
+    isoline_levels を指定した場合（レベル数またはレベル値のリスト）はサーバー側で等値線を求め、
+    グリッド全体の代わりに、レベルごとの塗りつぶし多角形と等値線の折れ線（Scatterトレースのリスト）を返す。
+    simplify_tolerance はグリッド間隔に対する折れ線の間引きの許容誤差。
+    """
     if not grid_results:
         return None
 
@@ -59,6 +106,10 @@ def generate_contour_plot(grid_results, x_col, y_col, z_col):
         current_app.logger.error(f"Failed to extract data from grid_results: {e}")
         return None
 
+    if isoline_levels is not None:
+        traces = _isoline_traces(x_coords, y_coords, z_matrix, z_col, isoline_levels, simplify_tolerance)
+        return json.dumps(traces, cls=PlotlyJSONEncoder)
+
     contour_trace = go.Contour(
         x=x_coords,
         y=y_coords,
@@ -75,51 +126,212 @@ def generate_contour_plot(grid_results, x_col, y_col, z_col):
 
     return json.dumps(contour_trace, cls=PlotlyJSONEncoder)
 
+def _join_paths(paths):
+    """
+    折れ線のリストを、None で区切った1本の x / y 列にまとめる（1トレースで複数の線を描くため）。
+    """
+    xs, ys = [], []
+    for path in paths:
+        if xs:
+            xs.append(None)
+            ys.append(None)
+        xs.extend(np.round(path[:, 0], 6).tolist())
+        ys.extend(np.round(path[:, 1], 6).tolist())
+    return xs, ys
 
-def generate_grid_with_surrogate(model_path, scaler_path, x_col, y_col, z_col, constants, resolution=50):
-    current_app.logger.info("--- Generating grid data with surrogate model ---")
-    
-    model, scaler = surrogate_model.load_model_and_scaler(model_path, scaler_path)
-    if model is None or scaler is None:
-        raise FileNotFoundError("Failed to load model or scaler.")
+def _isoline_traces(x_coords, y_coords, z_matrix, z_col, levels, simplify_tolerance):
+    x = np.asarray(x_coords, dtype=float)
+    y = np.asarray(y_coords, dtype=float)
+    z = np.asarray(z_matrix, dtype=float)
+    level_values = isolines.resolve_levels(z, levels)
+    if level_values.size == 0:
+        return []
 
-    current_app.logger.debug("Model and scaler loaded successfully.")
+    spacing = min(np.min(np.abs(np.diff(x))) if x.size > 1 else 0.0, np.min(np.abs(np.diff(y))) if y.size > 1 else 0.0)
+    tolerance = simplify_tolerance * spacing
 
-    feature_names = scaler.feature_names_in_
-    min_vals, max_vals = scaler.data_min_, scaler.data_max_
-    
-    try:
-        x_min, x_max = min_vals[list(feature_names).index(x_col)], max_vals[list(feature_names).index(x_col)]
-        y_min, y_max = min_vals[list(feature_names).index(y_col)], max_vals[list(feature_names).index(y_col)]
-    except ValueError as e:
-        raise KeyError(f"Axis '{e.args[0].replace('is not in list', '')}' not found in the features the model was trained on.")
+    # 各帯（最小値〜最初のレベル、レベル間、最後のレベル〜最大値）の中央の値で色を決める
+    z_min, z_max = np.nanmin(z), np.nanmax(z)
+    bounds = np.concatenate([[min(z_min, level_values[0])], level_values, [max(z_max, level_values[-1])]])
+    span = bounds[-1] - bounds[0]
+    fractions = ((bounds[:-1] + bounds[1:]) / 2 - bounds[0]) / span if span > 0 else np.full(len(bounds) - 1, 0.5)
+    band_colors = plotly.colors.sample_colorscale('Jet', np.clip(fractions, 0.0, 1.0).tolist())
+
+    traces = []
+    # 下の帯から順に「z >= レベル」の領域を不透明に重ねて塗ることで、各帯が自分の色だけで表示される
+    # （半透明にすると下の帯の色と混ざる）。等値線はその上に描く
+    fills = [(bounds[0], isolines.trace_filled_regions(z, x, y, bounds[0], tolerance))]
+    fills += [(level, isolines.trace_filled_regions(z, x, y, level, tolerance)) for level in level_values]
+    for (level, rings), color in zip(fills, band_colors):
+        if not rings:
+            continue
+        xs, ys = _join_paths(rings)
+        traces.append(go.Scatter(
+            x=xs, y=ys, mode='lines', fill='toself', fillcolor=color,
+            line=dict(width=0), hoverinfo='skip', showlegend=False,
+            name=f'{z_col} >= {level:.4g}'
+        ))
+
+    for level in level_values:
+        paths = isolines.trace_isolines(z, x, y, level, tolerance)
+        if not paths:
+            continue
+        xs, ys = _join_paths(paths)
+        traces.append(go.Scatter(
+            x=xs, y=ys, mode='lines', line=dict(color='black', width=1),
+            hoverinfo='name', showlegend=False, name=f'{z_col} = {level:.4g}'
+        ))
+    return traces
+
+def _predict_grid_tile(model, scaler, base_row, x_index, y_index, slice_index, x_points, y_points, slice_values,
+                       start, stop, target_index):
+    """
+    (スライス, y, x) を平坦化した通し番号 start〜stop の点をまとめて1回で推論する。
+    """
+    flat = np.arange(start, stop, dtype=np.int64)
+    slice_pos, rest = np.divmod(flat, len(y_points) * len(x_points))
+    y_pos, x_pos = np.divmod(rest, len(x_points))
 
+    inputs = np.empty((stop - start, base_row.size), dtype=np.float32)
+    inputs[:] = base_row
+    inputs[:, x_index] = x_points[x_pos]
+    inputs[:, y_index] = y_points[y_pos]
+    if slice_index is not None:
+        inputs[:, slice_index] = slice_values[slice_pos]
+    predictions = surrogate_model.predict_batch(model, scaler, inputs)
+    return predictions[:, target_index]
+
+def predict_grid_tiled(model, scaler, x_col, y_col, x_points, y_points, constants, target_index, tile_size=65536, workers=1, out=None,
+                       slice_col=None, slice_values=None, cancel_token=None):
+    """
+    x/yグリッド上の1つのターゲットの予測値を、形状 (len(y_points), len(x_points)) の配列に書き込んで返す。
+    slice_col を指定した場合は、その特徴量を slice_values の各値にしたグリッドを積み重ねた
+    (len(slice_values), len(y_points), len(x_points)) の配列を返す。
+    入力は (スライス, y, x) を平坦化した点の並びを約 tile_size 点ずつのタイルに分けて作るため、
+    複数のスライスが1回の推論にまとまり、作業メモリはタイルの大きさだけで決まる。
+    workers > 1 の場合はタイルをスレッドプールで並列に推論する。
+    cancel_token が取り消されると、次のタイルを推論する前に RequestCancelled を送出する。
+    """
+    feature_names = list(scaler.feature_names_in_)
+    axes = (x_col, y_col) if slice_col is None else (x_col, y_col, slice_col)
+    base_row = np.empty(len(feature_names), dtype=np.float32)
+    for i, name in enumerate(feature_names):
+        if name in axes:
+            base_row[i] = 0.0
+        elif name in constants:
+            base_row[i] = float(constants[name])
+        else:
+            raise KeyError(f"Constant value for '{name}' is required by the model but was not provided.")
+    x_index, y_index = feature_names.index(x_col), feature_names.index(y_col)
+    slice_index = feature_names.index(slice_col) if slice_col is not None else None
+
+    x_points = np.asarray(x_points, dtype=np.float32)
+    y_points = np.asarray(y_points, dtype=np.float32)
+    slice_values = np.asarray(slice_values if slice_col is not None else [0.0], dtype=np.float32)
+    shape = (len(slice_values), len(y_points), len(x_points))
+    if out is None:
+        out = np.empty(shape if slice_col is not None else shape[1:], dtype=np.float32)
+    flat_out = out.reshape(-1)
+
+    total = flat_out.size
+    tile_size = max(1, int(tile_size))
+    starts = range(0, total, tile_size)
+
+    def run_tile(start):
+        raise_if_cancelled(cancel_token)
+        stop = min(start + tile_size, total)
+        flat_out[start:stop] = _predict_grid_tile(
+            model, scaler, base_row, x_index, y_index, slice_index,
+            x_points, y_points, slice_values, start, stop, target_index
+        )
+
+    if workers > 1 and len(starts) > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='grid-tile') as executor:
+            # 例外があればここで送出される
+            list(executor.map(run_tile, starts))
+    else:
+        for start in starts:
+            run_tile(start)
+    return out
+
+def generate_gradient_grids_with_surrogate(model, scaler, x_col, y_col, constants, resolution=50,
+                                           target_names=None, feature_names=None, tile_size=65536, target_headers=None,
+                                           cancel_token=None):
+    """
+    x/yグリッド上の各ターゲットの予測値と、各特徴量に対する偏微分（感度）のグリッドを計算する。
+    グリッドはタイルごとに1回の GradientTape で全ターゲット・全特徴量の勾配をまとめて求める。
+    戻り値のグリッドは全て (y, x) の形状。cancel_token が取り消されるとタイルの間で打ち切る。
+    """
+    if target_headers is None:
+        target_headers = _get_target_headers()
+    all_features = list(scaler.feature_names_in_)
+    target_names = list(target_names or target_headers)
+    feature_names = list(feature_names or all_features)
+    for name in target_names:
+        if name not in target_headers:
+            raise KeyError(f"Target '{name}' not found in target headers.")
+    for name in feature_names:
+        if name not in all_features:
+            raise KeyError(f"Feature '{name}' not found in the features the model was trained on.")
+    t_idx = [target_headers.index(name) for name in target_names]
+    f_idx = [all_features.index(name) for name in feature_names]
+
+    (x_min, x_max), (y_min, y_max) = _get_axis_ranges(scaler, x_col, y_col)
     x_points = np.linspace(x_min, x_max, resolution)
     y_points = np.linspace(y_min, y_max, resolution)
 
-    grid_points = list(itertools.product(x_points, y_points))
-    input_df = pd.DataFrame(grid_points, columns=[x_col, y_col])
+    z = np.empty((len(t_idx), resolution, resolution), dtype=np.float32)
+    grads = np.empty((len(t_idx), len(f_idx), resolution, resolution), dtype=np.float32)
 
-    for const_name, const_value in constants.items():
-        input_df[const_name] = float(const_value)
-        
-    input_df = input_df[feature_names]
+    rows_per_tile = max(1, int(tile_size) // resolution)
+    for row_start in range(0, resolution, rows_per_tile):
+        raise_if_cancelled(cancel_token)
+        row_stop = min(row_start + rows_per_tile, resolution)
+        # y を外側のループにして、出力の (y, x) の行ブロックにそのまま書き込めるようにする
+        inputs = _build_grid_inputs(all_features, y_col, x_col, y_points[row_start:row_stop], x_points, constants)
+        predictions, gradients = surrogate_model.predict_with_gradients(model, scaler, inputs)
+        n_rows = row_stop - row_start
+        z[:, row_start:row_stop] = predictions[:, t_idx].T.reshape(len(t_idx), n_rows, resolution)
+        grads[:, :, row_start:row_stop] = (
+            gradients[:, t_idx][:, :, f_idx].transpose(1, 2, 0).reshape(len(t_idx), len(f_idx), n_rows, resolution)
+        )
 
-    current_app.logger.debug(f"DataFrame shape for prediction: {input_df.shape}")
-    current_app.logger.debug(f"DataFrame columns for prediction (should be ordered): {input_df.columns.tolist()}")
-    current_app.logger.debug(f"First 5 rows of prediction input:\n{input_df.head().to_string()}")
+    return {
+        'x_grid': x_points.tolist(),
+        'y_grid': y_points.tolist(),
+        'targets': {
+            target: {
+                'z_grid': z[i].tolist(),
+                'gradients': {feature: grads[i, j].tolist() for j, feature in enumerate(feature_names)},
+            }
+            for i, target in enumerate(target_names)
+        },
+    }
 
-    predictions = surrogate_model.predict_with_loaded_model(model, scaler, input_df)
+def generate_grid_with_surrogate(model_path, scaler_path, x_col, y_col, z_col, constants, resolution=50, cancel_token=None):
+    current_app.logger.info("--- Generating grid data with surrogate model ---")
     
-    target_headers = [h for h in session.get('target_headers', []) if h.lower() != 'main_id']
-    if not target_headers:
-         raise ValueError("Target headers not found in session. Please re-upload the target CSV.")
+    model, scaler = surrogate_model.load_model_and_scaler(model_path, scaler_path)
+    if model is None or scaler is None:
+        raise FileNotFoundError("Failed to load model or scaler.")
 
-    predictions_df = pd.DataFrame(predictions, columns=target_headers)
+    current_app.logger.debug("Model and scaler loaded successfully.")
 
-    z_values = predictions_df[z_col].values
-    
-    z_grid = z_values.reshape((resolution, resolution)).T
+    (x_min, x_max), (y_min, y_max) = _get_axis_ranges(scaler, x_col, y_col)
+    x_points = np.linspace(x_min, x_max, resolution)
+    y_points = np.linspace(y_min, y_max, resolution)
+
+    target_headers = _get_target_headers()
+    if z_col not in target_headers:
+        raise KeyError(f"Target '{z_col}' not found in target headers.")
+
+    z_grid = predict_grid_tiled(
+        model, scaler, x_col, y_col, x_points, y_points, constants,
+        target_index=target_headers.index(z_col),
+        tile_size=current_app.config['GRID_TILE_SIZE'],
+        workers=min(current_app.config['GRID_TILE_WORKERS'], current_app.resource_manager.threads_for('interactive')),
+        cancel_token=cancel_token
+    )
     
     grid_results = {
         'x_grid': x_points,
@@ -132,44 +344,90 @@ def generate_grid_with_surrogate(model_path, scaler_path, x_col, y_col, z_col, c
     current_app.logger.info("--- Grid data generation finished ---")
     return grid_results
 
-def calculate_overlap_grid(model, scaler, x_col, y_col, z_col, constants, resolution=10):
-    if model is None or scaler is None:
-        current_app.logger.warning("calculate_overlap_grid called but model or scaler is None.")
-        return None
+def generate_grid_with_law_model(model_config, x_col, y_col, z_col, constants, x_range, y_range, resolution=50):
+    """
+    法則モデルの数式をx/yのメッシュグリッド上で直接評価する（サロゲートモデル不要）。
+    定数はスカラーのままブロードキャストされ、numexprによる1回のベクトル演算で計算される。
+    """
+    current_app.logger.info("--- Generating exact grid data with law model ---")
 
-    current_app.logger.info("--- Calculating overlap grid data ---")
+    x_points = np.linspace(float(x_range[0]), float(x_range[1]), resolution)
+    y_points = np.linspace(float(y_range[0]), float(y_range[1]), resolution)
+    x_mesh, y_mesh = np.meshgrid(x_points, y_points)
 
-    feature_names = scaler.feature_names_in_
-    min_vals, max_vals = scaler.data_min_, scaler.data_max_
-    
-    try:
-        x_min, x_max = min_vals[list(feature_names).index(x_col)], max_vals[list(feature_names).index(x_col)]
-        y_min, y_max = min_vals[list(feature_names).index(y_col)], max_vals[list(feature_names).index(y_col)]
-    except ValueError as e:
-        raise KeyError(f"Axis '{e.args[0].replace(' is not in list', '')}' not found in the features the model was trained on.")
+    feature_values = {name: float(value) for name, value in constants.items()}
+    feature_values[x_col] = x_mesh
+    feature_values[y_col] = y_mesh
+
+    results = calculate_targets(model_config, feature_values, target_names=[z_col])
+    if z_col not in results:
+        raise KeyError(f"No law-model expression defined for target '{z_col}'.")
+
+    z_grid = np.broadcast_to(np.asarray(results[z_col], dtype=float), x_mesh.shape)
 
+    current_app.logger.info("--- Exact grid data generation finished ---")
+    return {
+        'x_grid': x_points,
+        'y_grid': y_points,
+        'z_grid': z_grid,
+    }
+
+def _overlap_cache_key(model_identity, x_col, y_col, constants, resolution):
+    return (model_identity, x_col, y_col, tuple(sorted((k, float(v)) for k, v in constants.items())), resolution)
+
+def predict_overlap_grids(model, scaler, x_col, y_col, constants_list, resolution=10):
+    """
+    複数の定数の組み合わせについて、全ターゲットのオーバーラップ用グリッドを1回の推論で計算する。
+    戻り値は (x_points, y_points, z) で、z の形状は (組み合わせ数, ターゲット数, resolution, resolution)。
+    """
+    feature_names = list(scaler.feature_names_in_)
+    (x_min, x_max), (y_min, y_max) = _get_axis_ranges(scaler, x_col, y_col)
     x_points = np.linspace(x_min, x_max, resolution)
     y_points = np.linspace(y_min, y_max, resolution)
 
-    grid_points = list(itertools.product(x_points, y_points))
-    input_df = pd.DataFrame(grid_points, columns=[x_col, y_col])
-    
-    for const_name, const_value in constants.items():
-        input_df[const_name] = float(const_value)
-        
-    input_df = input_df[feature_names]
+    inputs = np.concatenate([
+        _build_grid_inputs(feature_names, x_col, y_col, x_points, y_points, constants)
+        for constants in constants_list
+    ])
+    predictions = surrogate_model.predict_batch(model, scaler, inputs)
 
-    predictions = surrogate_model.predict_with_loaded_model(model, scaler, input_df)
-    
-    target_headers = [h for h in session.get('target_headers', []) if h.lower() != 'main_id']
-    if not target_headers:
-         raise ValueError("Target headers not found in session. Please re-upload the target CSV.")
+    # (組み合わせ, x, y, ターゲット) -> (組み合わせ, ターゲット, y, x)
+    z = predictions.reshape(len(constants_list), resolution, resolution, -1).transpose(0, 3, 2, 1)
+    return x_points, y_points, z
 
-    predictions_df = pd.DataFrame(predictions, columns=target_headers)
+def store_overlap_grids(model_identity, x_col, y_col, constants, resolution, x_points, y_points, z_by_target):
+    _overlap_grid_cache.set(
+        _overlap_cache_key(model_identity, x_col, y_col, constants, resolution),
+        (x_points, y_points, z_by_target)
+    )
 
-    z_values = predictions_df[z_col].values
-    
-    z_grid = z_values.reshape((resolution, resolution)).T
+def calculate_overlap_grid(model, scaler, x_col, y_col, z_col, constants, resolution=10, model_identity=None, target_headers=None):
+    if model is None or scaler is None:
+        current_app.logger.warning("calculate_overlap_grid called but model or scaler is None.")
+        return None
+
+    current_app.logger.info("--- Calculating overlap grid data ---")
+
+    if target_headers is None:
+        target_headers = _get_target_headers()
+
+    # 全ターゲット分のグリッドをモデルごとにキャッシュする（バックグラウンドのウォームアップも同じキャッシュに書き込む）
+    cached = None
+    if model_identity is not None:
+        cached = _overlap_grid_cache.get(_overlap_cache_key(model_identity, x_col, y_col, constants, resolution))
+
+    if cached is None:
+        x_points, y_points, z = predict_overlap_grids(model, scaler, x_col, y_col, [constants], resolution)
+        cached = (x_points, y_points, z[0])
+        if model_identity is not None:
+            store_overlap_grids(model_identity, x_col, y_col, constants, resolution, *cached)
+    else:
+        current_app.logger.debug("Overlap grid served from cache.")
+
+    x_points, y_points, z_by_target = cached
+    if z_col not in target_headers:
+        raise KeyError(f"Target '{z_col}' not found in target headers.")
+    z_grid = z_by_target[target_headers.index(z_col)]
     
     grid_results = {
         'x_grid': x_points.tolist(),
@@ -179,3 +437,52 @@ def calculate_overlap_grid(model, scaler, x_col, y_col, z_col, constants, resolu
     
     current_app.logger.info("--- Overlap grid data calculation finished ---")
     return grid_results
+
+
+def generate_slice_grids_with_surrogate(model_path, scaler_path, x_col, y_col, z_col, constants, slice_col, slice_values, resolution=50):
+    """
+    1つの定数（slice_col）を複数の値に変えたコンターグリッドをまとめて計算する。
+    全スライスの点を GRID_TILE_SIZE 点ずつのタイルでまとめて推論するため、推論の呼び出し回数は
+    スライス数ではなく点数で決まり、スライス数×解像度に比例した入力行列は作らない。
+    """
+    current_app.logger.info(f"--- Generating {len(slice_values)} contour slices over '{slice_col}' ---")
+
+    model, scaler = surrogate_model.load_model_and_scaler(model_path, scaler_path)
+    if model is None or scaler is None:
+        raise FileNotFoundError("Failed to load model or scaler.")
+
+    feature_names = list(scaler.feature_names_in_)
+    if slice_col not in feature_names:
+        raise KeyError(f"Slice parameter '{slice_col}' not found in the features the model was trained on.")
+    if slice_col in (x_col, y_col):
+        raise ValueError("The slice parameter must be different from the X and Y axes.")
+
+    (x_min, x_max), (y_min, y_max) = _get_axis_ranges(scaler, x_col, y_col)
+    x_points = np.linspace(x_min, x_max, resolution)
+    y_points = np.linspace(y_min, y_max, resolution)
+
+    target_headers = _get_target_headers()
+    if z_col not in target_headers:
+        raise KeyError(f"Target '{z_col}' not found in target headers.")
+
+    # 全スライスの (スライス, y, x) の点をまとめてタイルに分け、複数のスライスを1回の推論で処理する
+    z_grids = predict_grid_tiled(
+        model, scaler, x_col, y_col, x_points, y_points, constants,
+        target_index=target_headers.index(z_col),
+        tile_size=current_app.config['GRID_TILE_SIZE'],
+        workers=min(current_app.config['GRID_TILE_WORKERS'], current_app.resource_manager.threads_for('interactive')),
+        slice_col=slice_col,
+        slice_values=slice_values
+    )
+
+    current_app.logger.info("--- Contour slice generation finished ---")
+    return {
+        'x_grid': x_points.tolist(),
+        'y_grid': y_points.tolist(),
+        'z_min': float(np.nanmin(z_grids)),
+        'z_max': float(np.nanmax(z_grids)),
+        'slices': [
+            {'value': float(value), 'z_grid': z_grids[i].tolist()}
+            for i, value in enumerate(slice_values)
+        ],
+    }
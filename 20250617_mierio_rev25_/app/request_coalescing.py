@@ -0,0 +1,179 @@
+import json
+import threading
+from functools import wraps
+from flask import Response, current_app, g, jsonify, request, session
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        # 結果を待っている全リクエスト（実行者を含む）の CancelToken。取り消しできないリクエストは None
+        self.tokens = []
+        self.cancel_token = _SharedCancelToken(self.tokens)
+
+
+class _SharedCancelToken:
+    """
+    同じ処理を待つ全てのリクエストが取り消された場合にだけ取り消し扱いになるトークン。
+    実行中の処理はこれをタイルの間などで確認し、結果を待つ者がいなくなれば打ち切る。
+    """
+    def __init__(self, tokens):
+        self._tokens = tokens
+
+    @property
+    def cancelled(self):
+        return all(token is not None and token.cancelled for token in list(self._tokens))
+
+
+class SingleFlight:
+    """
+    同じキーの処理が実行中であれば新たに実行せず、その結果を待って共有する。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, cancel_token=None, poll_interval=0.05):
+        """
+        fn(shared_token) を key ごとに1回だけ実行し、(結果, 自分が実行したか) を返す。
+        待機中に cancel_token が取り消されると RequestCancelled を送出する。
+        shared_token は待っている全員の cancel_token が取り消されると取り消し扱いになるため、
+        fn はそれを確認して RequestCancelled で処理を打ち切れる。
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            call.tokens.append(cancel_token)
+
+        if leader:
+            try:
+                call.result = fn(call.cancel_token)
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.event.set()
+        else:
+            while not call.event.wait(poll_interval):
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise RequestCancelled()
+
+        if isinstance(call.error, RequestCancelled) and not (cancel_token is not None and cancel_token.cancelled):
+            # 他の全員が取り消して打ち切られた処理に、打ち切りの直前に加わった場合はやり直す
+            return self.do(key, fn, cancel_token, poll_interval)
+        if call.error is not None:
+            raise call.error
+        return call.result, leader
+
+
+class CancelToken:
+    def __init__(self):
+        self.cancelled = False
+
+
+class SupersedeRegistry:
+    """
+    スコープ（セッション + エンドポイント）ごとに最新のリクエストを記録し、
+    新しいリクエストが来たら古いリクエストの CancelToken を取り消す。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = {}
+
+    def begin(self, scope):
+        token = CancelToken()
+        with self._lock:
+            previous = self._tokens.get(scope)
+            if previous is not None:
+                previous.cancelled = True
+            self._tokens[scope] = token
+        return token
+
+    def end(self, scope, token):
+        with self._lock:
+            if self._tokens.get(scope) is token:
+                del self._tokens[scope]
+
+
+_single_flight = SingleFlight()
+_supersede_registry = SupersedeRegistry()
+
+
+def _request_key():
+    """
+    リクエストの内容を正規化したキー。結果に影響するセッション上のファイルと、
+    ロード中のモデルも含める。
+    """
+    body = request.get_json(silent=True)
+    return json.dumps({
+        'path': request.path,
+        'method': request.method,
+        'args': sorted(request.args.items(multi=True)),
+        'if_none_match': request.headers.get('If-None-Match'),
+        'body': body if body is not None else request.get_data(as_text=True),
+        'feature_filepath': session.get('feature_filepath'),
+        'target_filepath': session.get('target_filepath'),
+        'target_headers': session.get('target_headers'),
+        'loaded_model': current_app.plot_state.get_value('loaded_model_identity'),
+    }, sort_keys=True, default=str)
+
+
+def _session_scope():
+    return getattr(session, 'sid', None) or request.remote_addr
+
+
+def current_cancel_token():
+    """
+    coalesce_requests で実行中のビューから、処理を打ち切るべきかを示すトークンを返す。
+    まとめられた全てのリクエストが新しいリクエストに置き換えられると cancelled が True になる。
+    """
+    return g.get('coalesced_cancel_token')
+
+
+def raise_if_cancelled(cancel_token):
+    if cancel_token is not None and cancel_token.cancelled:
+        raise RequestCancelled()
+
+
+def coalesce_requests(view):
+    """
+    同じ内容のリクエストが同時に来た場合に処理を1回にまとめるデコレーター。
+    X-Cancel-Superseded ヘッダーを付けたリクエストは、同じセッションから同じエンドポイントへ
+    より新しいリクエストが来た時点で待機を打ち切り、409 を返す。まとめられた全てのリクエストが
+    打ち切られた場合、実行中のビューも current_cancel_token() を確認した時点で打ち切られる。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = _request_key()
+
+        scope, token = None, None
+        if request.headers.get('X-Cancel-Superseded', '').lower() in ('1', 'true'):
+            scope = (_session_scope(), request.endpoint)
+            token = _supersede_registry.begin(scope)
+
+        def run_view(shared_token):
+            g.coalesced_cancel_token = shared_token
+            response = current_app.make_response(view(*args, **kwargs))
+            return response.get_data(), response.status_code, list(response.headers.items())
+
+        try:
+            (body, status, headers), _ = _single_flight.do(key, run_view, cancel_token=token)
+        except RequestCancelled:
+            return jsonify({'error': 'Request superseded by a newer request.', 'cancelled': True}), 409
+        finally:
+            if token is not None:
+                _supersede_registry.end(scope, token)
+
+        return Response(body, status=status, headers=headers)
+
+    return wrapper
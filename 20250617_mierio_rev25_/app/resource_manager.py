@@ -0,0 +1,125 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+_DEFAULT_TIMEOUT = object()
+
+
+class WorkloadBusyError(RuntimeError):
+    """
+    ワークロードの実行枠が待ち時間内に空かなかった場合の例外（HTTPでは503として返す）。
+    """
+
+
+class ResourceManager:
+    """
+    ワークロードの種類ごとにCPUスレッド数を割り当てる。
+    - training: サロゲートモデルの学習
+    - interactive: 画面操作に応じたプロット・コンター・最近傍探索
+    - evaluation: 精度評価・モデル比較・ストリーミング予測のチャンク
+    - batch: 長時間かかる処理（スイープ・ウォームアップ・Sobol解析・逆設計）。
+      他のワークロードの実行枠を長時間ふさがないよう、別の枠で実行する
+
+    TensorFlow・numexpr・BLAS のスレッド数はプロセス全体で共有される設定のため、
+    起動時に configure_native_threads で一度だけ設定し、処理の実行中には変更しない
+    （重なって実行される処理が互いの設定を上書きしないようにするため）。
+    各ワークロードの割り当ては、同時に実行できる処理数（セマフォの枠）と、
+    threads_for で決まるスレッドプールの大きさで守る。
+    """
+    def __init__(self, budgets, concurrency, acquire_timeout=None):
+        self.budgets = dict(budgets)
+        self.concurrency = dict(concurrency)
+        self.acquire_timeout = acquire_timeout
+        self._semaphores = {name: threading.BoundedSemaphore(n) for name, n in self.concurrency.items()}
+        self._lock = threading.Lock()
+        self._active = {name: 0 for name in self.budgets}
+        self._native_threads = None
+        self._blas_limits = None
+
+    def configure_native_threads(self):
+        """
+        TensorFlow・numexpr・BLAS の演算スレッド数を設定する。TensorFlowの初期化前に一度だけ呼ぶ必要がある。
+        1回の演算が使うスレッド数は最も大きい割り当てに揃える。
+        """
+        import numexpr
+        import tensorflow as tf
+
+        intra = max(self.budgets.values())
+        inter = max(1, min(2, intra))
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(intra)
+            tf.config.threading.set_inter_op_parallelism_threads(inter)
+            tensorflow_threads = {'intra_op': intra, 'inter_op': inter}
+        except RuntimeError:
+            # すでに初期化済みの場合は変更できない
+            tensorflow_threads = {
+                'intra_op': tf.config.threading.get_intra_op_parallelism_threads(),
+                'inter_op': tf.config.threading.get_inter_op_parallelism_threads(),
+            }
+
+        numexpr.set_num_threads(intra)
+        if threadpool_limits is not None:
+            # 参照を保持している間は制限が有効なまま残る
+            self._blas_limits = threadpool_limits(limits=intra, user_api='blas')
+        self._native_threads = {'tensorflow': tensorflow_threads, 'numexpr': intra,
+                                'blas': intra if threadpool_limits is not None else None}
+
+    def threads_for(self, workload):
+        return self.budgets[workload]
+
+    @contextmanager
+    def workload(self, name, timeout=_DEFAULT_TIMEOUT):
+        """
+        ワークロードの実行枠を確保する。timeout 秒（既定は acquire_timeout、None なら無制限）
+        以内に空かなければ WorkloadBusyError を送出する。
+        """
+        if timeout is _DEFAULT_TIMEOUT:
+            timeout = self.acquire_timeout
+        semaphore = self._semaphores[name]
+        if not semaphore.acquire(timeout=timeout):
+            raise WorkloadBusyError(f"The server is busy with other '{name}' work. Please retry later.")
+        with self._lock:
+            self._active[name] += 1
+        try:
+            yield self.budgets[name]
+        finally:
+            with self._lock:
+                self._active[name] -= 1
+            semaphore.release()
+
+    def report(self):
+        with self._lock:
+            active = dict(self._active)
+        return {
+            'cpu_count': os.cpu_count(),
+            'native_threads': self._native_threads,
+            'acquire_timeout_seconds': self.acquire_timeout,
+            'threadpoolctl_available': threadpool_limits is not None,
+            'workloads': {
+                name: {
+                    'threads': self.budgets[name],
+                    'max_concurrent': self.concurrency[name],
+                    'active': active[name],
+                }
+                for name in self.budgets
+            },
+        }
+
+
+def default_thread_budgets(cpu_count=None):
+    """
+    コア数から既定のスレッド割り当てを決める。学習はコアの半分、評価と長時間の処理はそれぞれ8分の1、
+    対話的な推論は残りのコアを使い、合計がコア数を超えないようにする
+    （コア数が少ない場合は、各ワークロードに最低1スレッドを割り当てる）。
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    training = max(1, cpu_count // 2)
+    evaluation = max(1, cpu_count // 8)
+    batch = max(1, cpu_count // 8)
+    interactive = max(1, cpu_count - training - evaluation - batch)
+    return {'training': training, 'interactive': interactive, 'evaluation': evaluation, 'batch': batch}
@@ -1,16 +1,51 @@
 import os
+import json
 from flask import Blueprint, request, jsonify, session, current_app
-import pandas as pd
 import numpy as np
 from app import plot_utils
-from app.data_utils import load_and_merge_csvs, filter_dataframe, convert_columns_to_numeric
+from app.data_utils import load_and_merge_csvs, filter_dataframe, convert_columns_to_numeric, get_variable_ranges, get_dataset_identity
+from app.spatial_index import get_spatial_index
+from app.request_coalescing import coalesce_requests, current_cancel_token, RequestCancelled
+from app.etags import compute_etag, not_modified_response, attach_etag
+from app.cache_utils import LRUCache, file_identity
+from app.resource_manager import WorkloadBusyError
+from app.waveform_features import WAVEFORM_FEATURE_COLUMNS, get_waveform_folder
 from werkzeug.utils import secure_filename
 # ▼▼▼ここから修正▼▼▼
 from app import surrogate_model
+from app import ingest
+from app import asset_store
 # ▲▲▲ここまで修正▲▲▲
 
 data_bp = Blueprint('data_bp', __name__)
 
+# ETagごとの get_plot_data の計算結果（304応答時にサーバー側の状態を復元するため）
+_plot_results_cache = LRUCache(maxsize=8, name='plot_results')
+
+def _activate_asset(upload_folder, asset_id, feature_columns=None, target_columns=None):
+    """
+    保存済みのアセットをセッションの現在のデータセットにし、列名を返す。
+    """
+    feature_filepath, target_filepath = asset_store.asset_paths(upload_folder, asset_id)
+    if feature_columns is None:
+        feature_columns = ingest.read_csv_header(feature_filepath)
+    if target_columns is None:
+        target_columns = ingest.read_csv_header(target_filepath)
+
+    headers = {
+        'feature': [h for h in feature_columns if h.lower() != 'main_id'],
+        'target': [h for h in target_columns if h.lower() != 'main_id'],
+        'waveform': WAVEFORM_FEATURE_COLUMNS if get_waveform_folder(feature_filepath) else [],
+    }
+    session['feature_filepath'] = feature_filepath
+    session['feature_headers'] = headers['feature']
+    session['target_filepath'] = target_filepath
+    session['target_headers'] = headers['target']
+    session['waveform_headers'] = headers['waveform']
+    session['asset_id'] = asset_id
+    return headers
+
+
 @data_bp.route('/upload_asset_folder', methods=['POST'])
 def upload_asset_folder():
     try:
@@ -27,8 +62,9 @@ def upload_asset_folder():
         session.pop('feature_headers', None)
         session.pop('target_filepath', None)
         session.pop('target_headers', None)
+        session.pop('waveform_headers', None)
+        session.pop('asset_id', None)
 
-        saved_files = {}
         feature_file, target_file = None, None
 
         for file in files:
@@ -41,40 +77,33 @@ def upload_asset_folder():
         if not feature_file or not target_file:
             return jsonify({'error': '選択したフォルダの直下に Feature.csv と Target.csv が見つかりません。'}), 400
 
+        waveform_files = [f for f in request.files.getlist('waveforms[]') if f.filename]
         try:
-            filename = secure_filename(feature_file.filename)
-            filepath = os.path.join(upload_folder, filename)
-            feature_file.save(filepath)
-            df = pd.read_csv(filepath)
-            df.columns = df.columns.str.strip()
-            headers = [h for h in df.columns.tolist() if h.lower() != 'main_id']
-            session['feature_filepath'] = filepath
-            session['feature_headers'] = headers
-            saved_files['feature'] = {'headers': headers}
+            stored = asset_store.store_asset(upload_folder, feature_file, target_file, waveform_files)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
-            current_app.logger.error(f"Failed to process Feature.csv: {e}")
-            return jsonify({'error': f'Feature.csvの読み込みまたは処理に失敗しました: {str(e)}'}), 500
-
-        try:
-            filename = secure_filename(target_file.filename)
-            filepath = os.path.join(upload_folder, filename)
-            target_file.save(filepath)
-            df = pd.read_csv(filepath)
-            df.columns = df.columns.str.strip()
-            headers = [h for h in df.columns.tolist() if h.lower() != 'main_id']
-            session['target_filepath'] = filepath
-            session['target_headers'] = headers
-            saved_files['target'] = {'headers': headers}
-        except Exception as e:
-            current_app.logger.error(f"Failed to process Target.csv: {e}")
-            return jsonify({'error': f'Target.csvの読み込みまたは処理に失敗しました: {str(e)}'}), 500
+            current_app.logger.error(f"Failed to store asset folder: {e}")
+            return jsonify({'error': f'アセットフォルダの保存に失敗しました: {str(e)}'}), 500
+
+        asset_id = stored['asset_id']
+        # 同じ内容のアセットではパースが完了済みか実行中のため、新たなパースは行われない
+        ingest.schedule_parse(stored['feature_filepath'])
+        ingest.schedule_parse(stored['target_filepath'])
+        headers = _activate_asset(upload_folder, asset_id, stored['feature_columns'], stored['target_columns'])
+
+        # セッションごとにアセット名（フォルダ名）から内容のハッシュへの対応を持つ
+        asset_name = request.form.get('asset_name') or asset_id[:12]
+        assets = dict(session.get('assets', {}))
+        assets[asset_name] = asset_id
+        session['assets'] = assets
+        if stored['reused']:
+            current_app.logger.info(f"Asset '{asset_name}' matches stored asset {asset_id[:12]}; reusing it.")
         
         return jsonify({
             'message': 'Asset folder processed successfully.',
-            'headers': {
-                'feature': saved_files['feature']['headers'],
-                'target': saved_files['target']['headers']
-            }
+            'asset': {'name': asset_name, 'id': asset_id, 'reused': stored['reused']},
+            'headers': headers
         }), 200
 
     except Exception as e:
@@ -82,6 +111,41 @@ def upload_asset_folder():
         return jsonify({'error': f'サーバーで予期せぬエラーが発生しました: {str(e)}'}), 500
 
 
+@data_bp.route('/assets', methods=['GET'])
+def list_assets():
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    assets = session.get('assets', {})
+    return jsonify({
+        'current': session.get('asset_id'),
+        'assets': [
+            {'name': name, 'id': asset_id}
+            for name, asset_id in assets.items()
+            if asset_store.asset_exists(upload_folder, asset_id)
+        ]
+    }), 200
+
+
+@data_bp.route('/select_asset', methods=['POST'])
+def select_asset():
+    data = request.get_json()
+    asset_name = data.get('name')
+    asset_id = session.get('assets', {}).get(asset_name)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+
+    if not asset_id or not asset_store.asset_exists(upload_folder, asset_id):
+        return jsonify({'error': f'Asset not found: {asset_name}'}), 404
+
+    try:
+        headers = _activate_asset(upload_folder, asset_id)
+        feature_filepath, target_filepath = asset_store.asset_paths(upload_folder, asset_id)
+        ingest.schedule_parse(feature_filepath)
+        ingest.schedule_parse(target_filepath)
+        return jsonify({'asset': {'name': asset_name, 'id': asset_id}, 'headers': headers}), 200
+    except Exception as e:
+        current_app.logger.error(f"Failed to select asset {asset_name}: {e}", exc_info=True)
+        return jsonify({'error': f'Failed to select asset: {str(e)}'}), 500
+
+
 @data_bp.route('/upload_csv', methods=['POST'])
 def upload_csv():
     file_type = request.form.get('file_type')
@@ -97,14 +161,12 @@ def upload_csv():
     if file:
         filename = secure_filename(file.filename)
         filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
         
         if filename.endswith('.csv'):
             try:
-                df = pd.read_csv(filepath)
-                df.columns = df.columns.str.strip()
+                headers = ingest.save_upload_stream(file, filepath)
+                ingest.schedule_parse(filepath)
                 
-                headers = df.columns.tolist()
                 filtered_headers = [h for h in headers if h.lower() != 'main_id']
 
                 session[f'{file_type}_filepath'] = filepath
@@ -122,6 +184,7 @@ def upload_csv():
                 return jsonify({'error': f'Failed to read CSV or extract headers: {str(e)}'}), 500
         
         else:
+            file.save(filepath)
             session[f'{file_type}_filepath'] = filepath
             return jsonify({
                 'filename': filename,
@@ -133,6 +196,7 @@ def upload_csv():
 
 
 @data_bp.route('/get_plot_data', methods=['POST'])
+@coalesce_requests
 def get_plot_data():
     data = request.get_json()
     feature_params = data.get('featureParams', [])
@@ -145,11 +209,35 @@ def get_plot_data():
         return jsonify({'error': 'Asset folder not uploaded yet.'}), 400
 
     try:
-        df_merged = load_and_merge_csvs(feature_filepath, target_filepath)
-        df_merged.columns = df_merged.columns.str.strip()
+        x_col = next((p['name'] for p in feature_params if p['type'] == 'X_axis'), None)
+        y_col = next((p['name'] for p in feature_params if p['type'] == 'Y_axis'), None)
+        z_col = target_param
+
+        if not x_col or not y_col or not z_col:
+            current_app.plot_state.set_value('overlap_contour_data', None)
+            return jsonify({'error': 'Please select X-axis, Y-axis, and Target parameter.'}), 400
+
+        plot_state = current_app.plot_state
+        etag = compute_etag(
+            'plot', get_dataset_identity(feature_filepath, target_filepath),
+            session.get('feature_headers'), session.get('target_headers'),
+            feature_params, target_param, plot_state.get_value('loaded_model_identity')
+        )
+        # ブラウザが同じ結果を持っていれば、計算結果の状態だけを復元して 304 を返す
+        cached_state = _plot_results_cache.get(etag)
+        if cached_state is not None:
+            not_modified = not_modified_response(etag)
+            if not_modified is not None:
+                for key, value in cached_state.items():
+                    plot_state.set_value(key, value)
+                return not_modified
+
+        # 描画とフィルタに使う列だけを結合・実体化する
+        used_columns = [x_col, y_col, z_col] + [p['name'] for p in feature_params if p['type'] == 'Constant']
+        df_merged = load_and_merge_csvs(feature_filepath, target_filepath, columns=used_columns)
 
         feature_headers = session.get('feature_headers', [])
-        target_headers = session.get('target_headers', [])
+        target_headers = session.get('target_headers', []) + session.get('waveform_headers', [])
         all_vars = list(set(feature_headers + target_headers))
         df_merged = convert_columns_to_numeric(df_merged, all_vars)
         
@@ -157,41 +245,35 @@ def get_plot_data():
 
         df_filtered = filter_dataframe(df_merged, feature_params)
         
-        x_col = next((p['name'] for p in feature_params if p['type'] == 'X_axis'), None)
-        y_col = next((p['name'] for p in feature_params if p['type'] == 'Y_axis'), None)
-        z_col = target_param
-
-        if not x_col or not y_col or not z_col:
-            current_app.plot_state.set_value('overlap_contour_data', None)
-            return jsonify({'error': 'Please select X-axis, Y-axis, and Target parameter.'}), 400
-        
         if df_filtered.empty:
             return jsonify({'error': 'No data matches the selected constant filters.'}), 400
 
         df_final = df_filtered.dropna(subset=[x_col, y_col, z_col])
         current_app.plot_state.set_value('df_filtered', df_final)
+        current_app.plot_state.set_value('df_filtered_spec', {'feature_params': feature_params, 'dropna': [x_col, y_col, z_col]})
 
         if df_final.empty:
             return jsonify({'error': 'No valid numerical data after filtering and type conversion.'}), 400
 
         graph_json, layout_json = plot_utils.generate_scatter_plot(df_final, x_col, y_col, z_col)
         
-        plot_state = current_app.plot_state
         if plot_state.get_value('loaded_model') is not None:
             try:
                 model = plot_state.get_value('loaded_model')
                 scaler = plot_state.get_value('loaded_scaler')
                 constants = {p['name']: float(p['value']) for p in feature_params if p['type'] == 'Constant'}
 
-                grid_results = plot_utils.calculate_overlap_grid(
-                    model=model,
-                    scaler=scaler,
-                    x_col=x_col,
-                    y_col=y_col,
-                    z_col=z_col,
-                    constants=constants,
-                    resolution=10
-                )
+                with current_app.resource_manager.workload('interactive'):
+                    grid_results = plot_utils.calculate_overlap_grid(
+                        model=model,
+                        scaler=scaler,
+                        x_col=x_col,
+                        y_col=y_col,
+                        z_col=z_col,
+                        constants=constants,
+                        resolution=current_app.config['OVERLAP_RESOLUTION'],
+                        model_identity=plot_state.get_value('loaded_model_identity')
+                    )
                 
                 if grid_results:
                     standardized_grid = {
@@ -209,7 +291,14 @@ def get_plot_data():
         else:
             plot_state.set_value('overlap_contour_data', None)
 
-        return jsonify({'graph_json': graph_json, 'layout_json': layout_json}), 200
+        overlap_data = plot_state.get_value('overlap_contour_data')
+        plot_state.set_value('overlap_etag', compute_etag('overlap', etag) if overlap_data is not None else None)
+        _plot_results_cache.set(etag, {
+            key: plot_state.get_value(key)
+            for key in ('df_merged', 'df_filtered', 'df_filtered_spec', 'overlap_contour_data', 'overlap_etag')
+        })
+
+        return attach_etag((jsonify({'graph_json': graph_json, 'layout_json': layout_json}), 200), etag)
 
     except FileNotFoundError as e:
         return jsonify({'error': str(e)}), 400
@@ -248,6 +337,14 @@ def finetune_grid():
         if not feature_vars or not target_vars:
             return jsonify({'error': '特徴量またはターゲットの情報がセッションに見つかりません。'}), 400
 
+        # 表示用のデータは描画に使う列しか持たないため、不足する列は同じフィルタ条件で読み直す
+        if any(col not in plot_df.columns for col in feature_vars + target_vars):
+            spec = plot_state.get_value('df_filtered_spec') or {}
+            df_full = load_and_merge_csvs(session.get('feature_filepath'), session.get('target_filepath'),
+                                          columns=feature_vars + target_vars)
+            df_full = convert_columns_to_numeric(df_full, feature_vars + target_vars)
+            plot_df = filter_dataframe(df_full, spec.get('feature_params', [])).dropna(subset=spec.get('dropna'))
+
         # 4. 必要なファイルパスを構築
         base_name, _ = os.path.splitext(base_model_json_filename)
         
@@ -262,23 +359,33 @@ def finetune_grid():
         if not os.path.exists(original_model_path) or not os.path.exists(original_scaler_path):
             return jsonify({'error': f'ベースモデル({base_name}.keras)またはスケーラーが見つかりません。'}), 404
         
+        try:
+            training_options = surrogate_model.training_options(current_app.config, data)
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': f'Invalid training options: {str(e)}'}), 400
+
         # 6. モデルの再学習（ファインチューニング）を実行
-        surrogate_model.train_and_save_model(
-            df=plot_df,
-            feature_vars=feature_vars,
-            target_vars=target_vars,
-            model_path=tuned_model_path,       # 新しいモデルの保存先
-            scaler_path=original_scaler_path,  # オリジナルのスケーラーを読み込む
-            base_model_path=original_model_path # ベースとして使うオリジナルモデル
-        )
+        with current_app.resource_manager.workload('training'):
+            training_report = surrogate_model.train_and_save_model(
+                df=plot_df,
+                feature_vars=feature_vars,
+                target_vars=target_vars,
+                model_path=tuned_model_path,       # 新しいモデルの保存先
+                scaler_path=original_scaler_path,  # オリジナルのスケーラーを読み込む
+                base_model_path=original_model_path, # ベースとして使うオリジナルモデル
+                **training_options
+            )
 
         # 7. 成功メッセージを返す
         return jsonify({
             'message': f'モデルのファインチューニングが完了しました。',
             'new_model_name': f'{base_name}.keras',
-            'saved_location': 'tuned_models folder'
+            'saved_location': 'tuned_models folder',
+            'training': training_report
         }), 200
 
+    except WorkloadBusyError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         current_app.logger.error(f"Error in finetune_grid: {e}", exc_info=True)
         return jsonify({'error': f'ファインチューニング中に予期せぬエラーが発生しました: {str(e)}'}), 500
@@ -299,24 +406,41 @@ def get_model_table_headers():
     }), 200
 
 @data_bp.route('/get_calculated_contour', methods=['POST'])
+@coalesce_requests
 def get_calculated_contour():
     data = request.get_json()
     json_filename = data.get('json_filename')
     feature_params = data.get('featureParams', [])
     target_param = data.get('targetParam')
+    mode = data.get('mode', 'surrogate')
 
     if not json_filename:
         return jsonify({'error': 'No model file specified.'}), 400
     if not feature_params or not target_param:
         return jsonify({'error': 'Axis or Target parameters not provided.'}), 400
+    if mode not in ('surrogate', 'exact'):
+        return jsonify({'error': f'Unknown contour mode: {mode}'}), 400
 
     try:
-        base_filename, _ = os.path.splitext(json_filename)
-        model_path = os.path.join(current_app.config['MODELS_FOLDER'], f"{base_filename}.keras")
-        scaler_path = os.path.join(current_app.config['MODELS_FOLDER'], f"{base_filename}_scaler.joblib")
-
-        if not os.path.exists(model_path) or not os.path.exists(scaler_path):
-            return jsonify({'error': f'Model (.keras) or scaler (.joblib) file not found for {base_filename}.'}), 404
+        resolution = int(data.get('resolution', 50))
+        if not 2 <= resolution <= current_app.config['CONTOUR_MAX_RESOLUTION']:
+            return jsonify({'error': f"Resolution must be between 2 and {current_app.config['CONTOUR_MAX_RESOLUTION']}."}), 400
+
+        # isolines: true（既定のレベル数）、レベル数、またはレベル値のリスト
+        isoline_levels = data.get('isolines')
+        if isoline_levels is True:
+            isoline_levels = current_app.config['CONTOUR_ISOLINE_LEVELS']
+        elif not isoline_levels:
+            isoline_levels = None
+        elif isinstance(isoline_levels, list):
+            isoline_levels = [float(v) for v in isoline_levels]
+        else:
+            isoline_levels = int(isoline_levels)
+        max_levels = current_app.config['CONTOUR_MAX_ISOLINE_LEVELS']
+        if isoline_levels is not None:
+            count = len(isoline_levels) if isinstance(isoline_levels, list) else isoline_levels
+            if not 1 <= count <= max_levels:
+                return jsonify({'error': f"The number of isoline levels must be between 1 and {max_levels}."}), 400
 
         x_col = next((p['name'] for p in feature_params if p['type'] == 'X_axis'), None)
         y_col = next((p['name'] for p in feature_params if p['type'] == 'Y_axis'), None)
@@ -326,34 +450,227 @@ def get_calculated_contour():
         if not x_col or not y_col:
             return jsonify({'error': 'X-axis or Y-axis not defined.'}), 400
 
-        grid_results = plot_utils.generate_grid_with_surrogate(
-            model_path=model_path,
-            scaler_path=scaler_path,
-            x_col=x_col,
-            y_col=y_col,
-            z_col=z_col,
-            constants=constants,
-            resolution=50
-        )
+        if mode == 'exact':
+            json_filepath = os.path.join(current_app.config['JSON_FOLDER'], json_filename)
+            if not os.path.exists(json_filepath):
+                return jsonify({'error': f'JSON file not found: {json_filename}'}), 404
+            with open(json_filepath, 'r', encoding='utf-8') as f:
+                model_config = json.load(f)
+
+            feature_filepath = model_config.get('feature_csv_path')
+            if not feature_filepath or not os.path.exists(feature_filepath):
+                feature_filepath = session.get('feature_filepath')
+            if not feature_filepath:
+                return jsonify({'error': 'Feature CSV for the axis ranges is not available.'}), 400
+
+            etag = compute_etag('contour', mode, file_identity(json_filepath, feature_filepath),
+                                x_col, y_col, z_col, constants, resolution, isoline_levels)
+            not_modified = not_modified_response(etag)
+            if not_modified is not None:
+                return not_modified
+
+            ranges = get_variable_ranges(ingest.read_csv_frame(feature_filepath), [x_col, y_col])
+
+            with current_app.resource_manager.workload('interactive'):
+                grid_results = plot_utils.generate_grid_with_law_model(
+                    model_config=model_config,
+                    x_col=x_col,
+                    y_col=y_col,
+                    z_col=z_col,
+                    constants=constants,
+                    x_range=(ranges[x_col]['min'], ranges[x_col]['max']),
+                    y_range=(ranges[y_col]['min'], ranges[y_col]['max']),
+                    resolution=resolution
+                )
+        else:
+            base_filename, _ = os.path.splitext(json_filename)
+            model_path, scaler_path = surrogate_model.resolve_model_paths(current_app.config['MODELS_FOLDER'], json_filename)
+
+            if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+                return jsonify({'error': f'Model (.keras) or scaler (.joblib) file not found for {base_filename}.'}), 404
+
+            etag = compute_etag('contour', mode, surrogate_model.get_model_identity(model_path, scaler_path),
+                                session.get('target_headers'), x_col, y_col, z_col, constants, resolution, isoline_levels)
+            not_modified = not_modified_response(etag)
+            if not_modified is not None:
+                return not_modified
+
+            with current_app.resource_manager.workload('interactive'):
+                grid_results = plot_utils.generate_grid_with_surrogate(
+                    model_path=model_path,
+                    scaler_path=scaler_path,
+                    x_col=x_col,
+                    y_col=y_col,
+                    z_col=z_col,
+                    constants=constants,
+                    resolution=resolution,
+                    cancel_token=current_cancel_token()
+                )
 
         if not grid_results:
             return jsonify({'error': 'Failed to generate grid data with surrogate model.'}), 500
 
-        contour_json = plot_utils.generate_contour_plot(grid_results, x_col, y_col, z_col)
+        # isolines を指定すると、グリッドの代わりに等値線と塗りつぶし多角形のトレースのリストを返す
+        contour_json = plot_utils.generate_contour_plot(grid_results, x_col, y_col, z_col, isoline_levels=isoline_levels)
         
         if not contour_json:
             return jsonify({'error': 'Failed to generate contour plot data from the grid.'}), 500
             
-        return jsonify({'contour_json': contour_json}), 200
+        return attach_etag((jsonify({'contour_json': contour_json}), 200), etag)
 
     except FileNotFoundError as e:
         return jsonify({'error': str(e)}), 404
     except KeyError as e:
         return jsonify({'error': f'Column not found during data processing: {str(e)}. The model may be incompatible.'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except WorkloadBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except RequestCancelled:
+        # coalesce_requests が 409 を返す
+        raise
     except Exception as e:
         current_app.logger.error(f"Error in get_calculated_contour: {e}", exc_info=True)
         return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
 
+@data_bp.route('/get_calculated_contour_slices', methods=['POST'])
+def get_calculated_contour_slices():
+    data = request.get_json()
+    json_filename = data.get('json_filename')
+    feature_params = data.get('featureParams', [])
+    target_param = data.get('targetParam')
+    slice_param = data.get('sliceParam')
+    slice_values = data.get('sliceValues')
+    slice_range = data.get('sliceRange')
+
+    if not json_filename:
+        return jsonify({'error': 'No model file specified.'}), 400
+    if not feature_params or not target_param:
+        return jsonify({'error': 'Axis or Target parameters not provided.'}), 400
+    if not slice_param:
+        return jsonify({'error': 'No slice parameter specified.'}), 400
+
+    try:
+        if slice_values is None and slice_range:
+            start, stop, step = float(slice_range['start']), float(slice_range['stop']), float(slice_range['step'])
+            if not np.isfinite([start, stop, step]).all() or step <= 0:
+                return jsonify({'error': 'Slice start, stop and step must be finite and the step positive.'}), 400
+            # 値のリストを作る前に個数を確かめる（小さすぎる step で巨大な配列を作らないため）
+            count = int(np.floor((stop - start) / step + 1e-9)) + 1
+            if count > current_app.config['CONTOUR_MAX_SLICES']:
+                return jsonify({'error': f"Too many slices requested (max {current_app.config['CONTOUR_MAX_SLICES']})."}), 400
+            slice_values = (start + step * np.arange(max(count, 0))).tolist()
+        if not slice_values:
+            return jsonify({'error': 'No slice values specified.'}), 400
+        if len(slice_values) > current_app.config['CONTOUR_MAX_SLICES']:
+            return jsonify({'error': f"Too many slices requested (max {current_app.config['CONTOUR_MAX_SLICES']})."}), 400
+        slice_values = [float(v) for v in slice_values]
+
+        model_path, scaler_path = surrogate_model.resolve_model_paths(current_app.config['MODELS_FOLDER'], json_filename)
+        if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+            return jsonify({'error': f'Model (.keras) or scaler (.joblib) file not found for {json_filename}.'}), 404
+
+        x_col = next((p['name'] for p in feature_params if p['type'] == 'X_axis'), None)
+        y_col = next((p['name'] for p in feature_params if p['type'] == 'Y_axis'), None)
+        constants = {p['name']: float(p['value']) for p in feature_params
+                     if p['type'] == 'Constant' and p['name'] != slice_param}
+
+        if not x_col or not y_col:
+            return jsonify({'error': 'X-axis or Y-axis not defined.'}), 400
+
+        with current_app.resource_manager.workload('interactive'):
+            slice_results = plot_utils.generate_slice_grids_with_surrogate(
+                model_path=model_path,
+                scaler_path=scaler_path,
+                x_col=x_col,
+                y_col=y_col,
+                z_col=target_param,
+                constants=constants,
+                slice_col=slice_param,
+                slice_values=slice_values,
+                resolution=50
+            )
+        return jsonify(slice_results), 200
+
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except KeyError as e:
+        return jsonify({'error': f'Column not found during data processing: {str(e)}. The model may be incompatible.'}), 400
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except WorkloadBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        current_app.logger.error(f"Error in get_calculated_contour_slices: {e}", exc_info=True)
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+@data_bp.route('/get_sensitivity_maps', methods=['POST'])
+@coalesce_requests
+def get_sensitivity_maps():
+    data = request.get_json()
+    json_filename = data.get('json_filename')
+    feature_params = data.get('featureParams', [])
+    target_names = data.get('targets')
+    feature_names = data.get('features')
+
+    if not json_filename:
+        return jsonify({'error': 'No model file specified.'}), 400
+    if not feature_params:
+        return jsonify({'error': 'Axis parameters not provided.'}), 400
+
+    try:
+        resolution = int(data.get('resolution', 50))
+        if not 2 <= resolution <= current_app.config['CONTOUR_MAX_RESOLUTION']:
+            return jsonify({'error': f"Resolution must be between 2 and {current_app.config['CONTOUR_MAX_RESOLUTION']}."}), 400
+
+        x_col = next((p['name'] for p in feature_params if p['type'] == 'X_axis'), None)
+        y_col = next((p['name'] for p in feature_params if p['type'] == 'Y_axis'), None)
+        constants = {p['name']: float(p['value']) for p in feature_params if p['type'] == 'Constant'}
+        if not x_col or not y_col:
+            return jsonify({'error': 'X-axis or Y-axis not defined.'}), 400
+
+        model_path, scaler_path = surrogate_model.resolve_model_paths(current_app.config['MODELS_FOLDER'], json_filename)
+        if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+            return jsonify({'error': f'Model (.keras) or scaler (.joblib) file not found for {json_filename}.'}), 404
+
+        etag = compute_etag('sensitivity', surrogate_model.get_model_identity(model_path, scaler_path),
+                            session.get('target_headers'), x_col, y_col, constants, resolution, target_names, feature_names)
+        not_modified = not_modified_response(etag)
+        if not_modified is not None:
+            return not_modified
+
+        model, scaler = surrogate_model.load_model_and_scaler(model_path, scaler_path)
+        if model is None or scaler is None:
+            return jsonify({'error': 'Failed to load model or scaler.'}), 500
+
+        with current_app.resource_manager.workload('interactive'):
+            sensitivity = plot_utils.generate_gradient_grids_with_surrogate(
+                model=model,
+                scaler=scaler,
+                x_col=x_col,
+                y_col=y_col,
+                constants=constants,
+                resolution=resolution,
+                target_names=target_names,
+                feature_names=feature_names,
+                tile_size=current_app.config['GRID_TILE_SIZE'],
+                cancel_token=current_cancel_token()
+            )
+        return attach_etag((jsonify(sensitivity), 200), etag)
+
+    except KeyError as e:
+        return jsonify({'error': f'Column not found during data processing: {str(e)}. The model may be incompatible.'}), 400
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except WorkloadBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except RequestCancelled:
+        # coalesce_requests が 409 を返す
+        raise
+    except Exception as e:
+        current_app.logger.error(f"Error in get_sensitivity_maps: {e}", exc_info=True)
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
 @data_bp.route('/get_overlap_data', methods=['GET'])
 def get_overlap_data():
     plot_state = current_app.plot_state
@@ -362,6 +679,11 @@ def get_overlap_data():
     if overlap_data is None:
         return jsonify({'data': None, 'message': 'Overlap data not yet calculated.'})
 
+    etag = plot_state.get_value('overlap_etag')
+    not_modified = not_modified_response(etag)
+    if not_modified is not None:
+        return not_modified
+
     try:
         x_data = overlap_data['X']
         y_data = overlap_data['Y']
@@ -372,8 +694,57 @@ def get_overlap_data():
             'Y': y_data.tolist() if isinstance(y_data, np.ndarray) else y_data,
             'Z': z_data.tolist() if isinstance(z_data, np.ndarray) else z_data,
         }
-        return jsonify({'data': json_safe_data})
+        return attach_etag(jsonify({'data': json_safe_data}), etag)
 
     except Exception as e:
         current_app.logger.error(f"Error processing overlap data for jsonify: {e}", exc_info=True)
         return jsonify({'error': 'Failed to process stored overlap data.'}), 500
+
+
+@data_bp.route('/nearest', methods=['POST'])
+def nearest():
+    data = request.get_json()
+    feature_params = data.get('featureParams', [])
+    points = data.get('points')
+    k = data.get('k', 5)
+
+    feature_filepath = session.get('feature_filepath')
+    target_filepath = session.get('target_filepath')
+
+    if not feature_filepath or not target_filepath:
+        return jsonify({'error': 'Asset folder not uploaded yet.'}), 400
+    if not points:
+        return jsonify({'error': 'No query points provided.'}), 400
+
+    x_col = next((p['name'] for p in feature_params if p['type'] == 'X_axis'), None)
+    y_col = next((p['name'] for p in feature_params if p['type'] == 'Y_axis'), None)
+    if not x_col or not y_col:
+        return jsonify({'error': 'X-axis or Y-axis not defined.'}), 400
+
+    target_headers = [h for h in session.get('target_headers', []) if h.lower() != 'main_id']
+
+    def build_df():
+        used_columns = [x_col, y_col] + target_headers + [p['name'] for p in feature_params if p['type'] == 'Constant']
+        df = load_and_merge_csvs(feature_filepath, target_filepath, columns=used_columns)
+        df = convert_columns_to_numeric(df, [x_col, y_col] + target_headers)
+        df = filter_dataframe(df, feature_params).dropna(subset=[x_col, y_col])
+        return df, target_headers
+
+    try:
+        dataset_identity = get_dataset_identity(feature_filepath, target_filepath)
+        index = get_spatial_index(dataset_identity, x_col, y_col, feature_params, build_df)
+        with current_app.resource_manager.workload('interactive') as threads:
+            results = index.query(points, k=k, workers=threads)
+        return jsonify({'x_col': x_col, 'y_col': y_col, 'results': results}), 200
+
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 400
+    except KeyError as e:
+        return jsonify({'error': f'Missing column in CSV: {str(e)}. Please check your CSV headers.'}), 400
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except WorkloadBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        current_app.logger.error(f"Error in nearest: {e}", exc_info=True)
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
@@ -0,0 +1,195 @@
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+_PURGE_INTERVAL_SECONDS = 60
+_REFRESH_INTERVAL_SECONDS = 60
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """
+    サーバー側に保存されるセッション。クッキーには署名付きのセッションIDだけが入る。
+    """
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class MemorySessionBackend:
+    """
+    プロセス内の辞書にセッションを保持するバックエンド。最終アクセスから ttl 秒で失効する。
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = {}
+        self._last_purge = time.monotonic()
+
+    def get(self, sid):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at < now:
+                del self._data[sid]
+                return None
+            self._data[sid] = (now + self.ttl, data)
+            return data
+
+    def set(self, sid, data):
+        now = time.monotonic()
+        with self._lock:
+            self._data[sid] = (now + self.ttl, data)
+            if now - self._last_purge > _PURGE_INTERVAL_SECONDS:
+                self._data = {k: v for k, v in self._data.items() if v[0] >= now}
+                self._last_purge = now
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def items(self):
+        now = time.monotonic()
+        with self._lock:
+            return [(sid, data) for sid, (expires_at, data) in self._data.items() if expires_at >= now]
+
+
+class SQLiteSessionBackend:
+    """
+    ローカルのSQLiteファイルにセッションを保存するバックエンド。
+    複数プロセスから共有でき、MemorySessionBackend と同じく最終アクセスから ttl 秒で失効する。
+    """
+    def __init__(self, db_path, ttl):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._serializer = TaggedJSONSerializer()
+        self._lock = threading.Lock()
+        self._last_purge = time.monotonic()
+        with self._transaction() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)')
+            conn.execute('DELETE FROM sessions WHERE expires_at < ?', (time.time(),))
+
+    @contextmanager
+    def _transaction(self):
+        """
+        接続を開いてトランザクションを実行し、終了時に必ず接続を閉じる
+        （sqlite3 の接続の with 文はコミット・ロールバックだけで接続を閉じないため）。
+        """
+        with closing(sqlite3.connect(self.db_path, timeout=10)) as conn:
+            with conn:
+                yield conn
+
+    def _purge_expired(self, conn, now):
+        with self._lock:
+            if time.monotonic() - self._last_purge < _PURGE_INTERVAL_SECONDS:
+                return
+            self._last_purge = time.monotonic()
+        conn.execute('DELETE FROM sessions WHERE expires_at < ?', (now,))
+
+    def get(self, sid):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute('SELECT data, expires_at FROM sessions WHERE sid = ?', (sid,)).fetchone()
+            if row is None or row[1] < now:
+                return None
+            # アクセスのたびに書き込まないよう、前回の延長から一定時間経った場合だけ期限を延ばす
+            if row[1] - now < self.ttl - min(_REFRESH_INTERVAL_SECONDS, self.ttl / 2):
+                conn.execute('UPDATE sessions SET expires_at = ? WHERE sid = ?', (now + self.ttl, sid))
+            self._purge_expired(conn, now)
+        return self._serializer.loads(row[0])
+
+    def set(self, sid, data):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)',
+                         (sid, self._serializer.dumps(data), now + self.ttl))
+            self._purge_expired(conn, now)
+
+    def delete(self, sid):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def items(self):
+        with self._transaction() as conn:
+            rows = conn.execute('SELECT sid, data FROM sessions WHERE expires_at >= ?', (time.time(),)).fetchall()
+        return [(sid, self._serializer.loads(data)) for sid, data in rows]
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    セッションの中身をバックエンドに保存し、クッキーにはセッションIDのみを載せる。
+    これによりリクエストごとの転送量がセッションの大きさに依存しなくなる。
+    """
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='server-side-session')
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('utf-8')
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.backend.get(sid)
+                if data is not None:
+                    return ServerSideSession(data, sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified or session.new:
+            self.backend.set(session.sid, dict(session))
+
+        if session.new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid.encode('utf-8')).decode('utf-8'),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def create_session_interface(config):
+    """
+    SESSION_BACKEND の設定に応じたセッションインターフェースを返す。
+    'cookie' の場合は None を返し、Flask標準のクッキーセッションを使う。
+    """
+    backend_name = config.get('SESSION_BACKEND', 'cookie')
+    ttl = config.get('SESSION_TTL_SECONDS', 7 * 24 * 3600)
+
+    if backend_name == 'cookie':
+        return None
+    if backend_name == 'memory':
+        return ServerSideSessionInterface(MemorySessionBackend(ttl))
+    if backend_name == 'sqlite':
+        return ServerSideSessionInterface(SQLiteSessionBackend(config['SESSION_DB_PATH'], ttl))
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend_name}")
@@ -0,0 +1,133 @@
+import numpy as np
+from scipy.stats import qmc
+from .cache_utils import LRUCache
+
+# (手法, モデル識別子, 解析条件) ごとのSobol指数
+_sobol_cache = LRUCache(maxsize=32, name='sobol_indices')
+
+
+def saltelli_matrices(bounds, n, seed=None):
+    """
+    Saltelliの方法の標本行列を作る。2d次元のSobol列から A, B (n, d) を取り、
+    AB[i] は A の i 列目を B の i 列目で置き換えたもの。
+    戻り値は全ての評価点を縦に積んだ (n * (d + 2), d) の行列で、並びは A, B, AB[0], ..., AB[d-1]。
+    """
+    bounds = np.asarray(bounds, dtype=np.float64)
+    d = len(bounds)
+    # n を2の累乗に揃えるとSobol列の均一性が保たれる
+    sampler = qmc.Sobol(d=2 * d, scramble=True, seed=seed)
+    base = sampler.random(n)
+    low, high = bounds[:, 0], bounds[:, 1]
+    A = low + base[:, :d] * (high - low)
+    B = low + base[:, d:] * (high - low)
+
+    samples = np.empty((n * (d + 2), d), dtype=np.float64)
+    samples[:n] = A
+    samples[n:2 * n] = B
+    for i in range(d):
+        block = samples[(2 + i) * n:(3 + i) * n]
+        block[:] = A
+        block[:, i] = B[:, i]
+    return samples
+
+
+def evaluate_in_batches(evaluate, samples, feature_names, batch_size):
+    """
+    標本行列を batch_size 行ずつ evaluate({特徴量名: 列}) に渡し、(行数, ターゲット数) の結果にまとめる。
+    """
+    outputs = None
+    for start in range(0, len(samples), batch_size):
+        block = samples[start:start + batch_size]
+        result = np.asarray(evaluate({name: block[:, i] for i, name in enumerate(feature_names)}), dtype=np.float64)
+        if outputs is None:
+            outputs = np.empty((len(samples), result.shape[1]), dtype=np.float64)
+        outputs[start:start + len(block)] = result
+    return outputs
+
+
+def _indices(fA, fB, fAB, variance):
+    """
+    1次指数（Saltelli 2010）と総合指数（Jansen）。fA, fB は (..., n, T)、fAB は (d, ..., n, T)。
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        first = np.mean(fB * (fAB - fA), axis=-2) / variance
+        total = 0.5 * np.mean((fA - fAB) ** 2, axis=-2) / variance
+    return first, total
+
+
+def sobol_indices(outputs, n, d, n_bootstrap=100, confidence=0.95, seed=None):
+    """
+    saltelli_matrices の並びで評価した結果から、各ターゲットの1次・総合Sobol指数と
+    ブートストラップによる信頼区間を計算する。戻り値の配列は全て (d, T) の形状。
+    """
+    fA = outputs[:n]
+    fB = outputs[n:2 * n]
+    fAB = outputs[2 * n:].reshape(d, n, -1)
+
+    variance = np.var(np.concatenate([fA, fB]), axis=0)
+    first, total = _indices(fA, fB, fAB, variance)
+
+    rng = np.random.default_rng(seed)
+    first_samples = np.empty((n_bootstrap, d, outputs.shape[1]))
+    total_samples = np.empty_like(first_samples)
+    for r in range(n_bootstrap):
+        idx = rng.integers(0, n, size=n)
+        boot_variance = np.var(np.concatenate([fA[idx], fB[idx]]), axis=0)
+        first_samples[r], total_samples[r] = _indices(fA[idx], fB[idx], fAB[:, idx], boot_variance)
+
+    alpha = (1.0 - confidence) / 2.0 * 100.0
+    first_ci = np.nanpercentile(first_samples, [alpha, 100.0 - alpha], axis=0)
+    total_ci = np.nanpercentile(total_samples, [alpha, 100.0 - alpha], axis=0)
+    return first, first_ci, total, total_ci
+
+
+def _round(value):
+    return float(value) if np.isfinite(value) else None
+
+
+def analyze(evaluate, feature_names, bounds, target_names, n=1024, n_bootstrap=100, confidence=0.95,
+            seed=0, batch_size=65536, cache_key=None):
+    """
+    特徴量の範囲全体での各ターゲットのSobol指数を計算する。
+    evaluate は {特徴量名: 値の配列} を受け取り (行数, ターゲット数) を返す関数
+    （法則モデル・サロゲートモデルの評価関数をそのまま使える）。
+    cache_key を渡すと、同じキーの結果はキャッシュから返す。
+    """
+    if cache_key is not None:
+        cached = _sobol_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+    d = len(feature_names)
+    samples = saltelli_matrices(bounds, n, seed)
+    outputs = evaluate_in_batches(evaluate, samples, feature_names, batch_size)
+    first, first_ci, total, total_ci = sobol_indices(outputs, n, d, n_bootstrap, confidence, seed)
+
+    indices = {}
+    for t, target in enumerate(target_names):
+        indices[target] = {
+            feature: {
+                'S1': _round(first[i, t]),
+                'S1_ci': [_round(first_ci[0, i, t]), _round(first_ci[1, i, t])],
+                'ST': _round(total[i, t]),
+                'ST_ci': [_round(total_ci[0, i, t]), _round(total_ci[1, i, t])],
+            }
+            for i, feature in enumerate(feature_names)
+        }
+
+    result = {
+        'features': list(feature_names),
+        'bounds': {name: [float(low), float(high)] for name, (low, high) in zip(feature_names, bounds)},
+        'n': n,
+        'evaluations': len(samples),
+        'confidence': confidence,
+        'indices': indices,
+        # 総合指数の大きい順の特徴量（ターゲットごと）
+        'ranking': {
+            target: [feature_names[i] for i in np.argsort(-np.nan_to_num(total[:, t], nan=-np.inf))]
+            for t, target in enumerate(target_names)
+        },
+    }
+    if cache_key is not None:
+        _sobol_cache.set(cache_key, result)
+    return dict(result, cached=False)
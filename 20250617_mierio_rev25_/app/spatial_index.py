@@ -0,0 +1,84 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from .cache_utils import LRUCache
+
+_index_cache = LRUCache(maxsize=16, name='spatial_index')
+
+
+class SpatialIndex:
+    """
+    フィルタ済みの測定データに対する、正規化したx/y平面上の最近傍探索用索引。
+    各軸をデータの最小値・最大値で [0, 1] に正規化してから cKDTree を構築する。
+    """
+    def __init__(self, df, x_col, y_col, target_cols):
+        xy = df[[x_col, y_col]].to_numpy(dtype=np.float64)
+        self.x_col = x_col
+        self.y_col = y_col
+        self.target_cols = list(target_cols)
+        self.offset = xy.min(axis=0)
+        span = xy.max(axis=0) - self.offset
+        self.scale = np.where(span > 0, span, 1.0)
+
+        self.main_ids = df['main_id'].to_numpy() if 'main_id' in df.columns else df.index.to_numpy()
+        self.xy = xy
+        self.targets = df[self.target_cols].to_numpy(dtype=np.float64)
+        self.tree = cKDTree((xy - self.offset) / self.scale)
+
+    def __len__(self):
+        return len(self.main_ids)
+
+    def query(self, points, k=5, workers=1):
+        """
+        クエリ座標（元の単位）ごとに、近い順に k 件の測定点を返す。
+        距離は正規化後の平面上のユークリッド距離。workers は探索に使うスレッド数。
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        if points.shape[1] != 2:
+            raise ValueError("Query points must be given as [x, y] pairs.")
+        if not np.isfinite(points).all():
+            raise ValueError("Query points must be finite numbers (NaN and infinity are not allowed).")
+
+        k = max(1, min(int(k), len(self)))
+        distances, indices = self.tree.query((points - self.offset) / self.scale, k=k, workers=max(1, int(workers)))
+        distances = distances.reshape(len(points), k)
+        indices = indices.reshape(len(points), k)
+
+        results = []
+        for row_dist, row_idx in zip(distances, indices):
+            neighbors = []
+            for dist, idx in zip(row_dist, row_idx):
+                neighbors.append({
+                    'main_id': self.main_ids[idx].item() if hasattr(self.main_ids[idx], 'item') else self.main_ids[idx],
+                    self.x_col: float(self.xy[idx, 0]),
+                    self.y_col: float(self.xy[idx, 1]),
+                    'distance': float(dist),
+                    'targets': {name: (None if np.isnan(value) else value)
+                                for name, value in zip(self.target_cols, self.targets[idx].tolist())},
+                })
+            results.append(neighbors)
+        return results
+
+
+def _filter_key(feature_params):
+    return tuple(sorted(
+        (p['name'], str(p.get('value')).strip())
+        for p in feature_params
+        if p.get('type') == 'Constant' and p.get('value') is not None and str(p.get('value')).strip() != ''
+    ))
+
+
+def get_spatial_index(dataset_identity, x_col, y_col, feature_params, build_df):
+    """
+    データセットとフィルタ条件ごとにキャッシュされた SpatialIndex を返す。
+    キャッシュにない場合のみ build_df() でデータを用意して索引を構築する。
+    build_df は (DataFrame, ターゲット列名リスト) を返す関数。
+    """
+    key = (dataset_identity, x_col, y_col, _filter_key(feature_params))
+
+    def build():
+        df, target_cols = build_df()
+        if df.empty:
+            raise ValueError('No data matches the selected constant filters.')
+        return SpatialIndex(df, x_col, y_col, target_cols)
+
+    return _index_cache.get_or_create(key, build)
@@ -9,6 +9,39 @@ const _handleErrorResponse = async (response) => {
     }
 };
 
+// ETag付きで返された POST レスポンスを保持し、同じリクエストでは If-None-Match で再検証する
+const _etagCache = new Map();
+const ETAG_CACHE_LIMIT = 20;
+
+const _postJsonWithETag = async (url, payload) => {
+    const body = JSON.stringify(payload);
+    const cacheKey = `${url}|${body}`;
+    const cached = _etagCache.get(cacheKey);
+
+    const headers = { 'Content-Type': 'application/json' };
+    if (cached) headers['If-None-Match'] = cached.etag;
+
+    const response = await fetch(url, { method: 'POST', headers: headers, body: body });
+
+    if (response.status === 304 && cached) {
+        _etagCache.delete(cacheKey);
+        _etagCache.set(cacheKey, cached);
+        return cached.data;
+    }
+    if (!response.ok) throw await _handleErrorResponse(response);
+
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        _etagCache.delete(cacheKey);
+        _etagCache.set(cacheKey, { etag: etag, data: data });
+        if (_etagCache.size > ETAG_CACHE_LIMIT) {
+            _etagCache.delete(_etagCache.keys().next().value);
+        }
+    }
+    return data;
+};
+
 const APIService = {
     uploadAssetFolder: async (formData) => {
         try {
@@ -49,14 +82,7 @@ const APIService = {
     },
 
     getPlotData: async (payload) => {
-        const response = await fetch('/get_plot_data', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload),
-        });
-
-        if (!response.ok) throw await _handleErrorResponse(response);
-        return response.json();
+        return _postJsonWithETag('/get_plot_data', payload);
     },
 
     // ▼▼▼ここから修正▼▼▼
@@ -73,7 +99,11 @@ const APIService = {
     // ▲▲▲ここまで修正▲▲▲
 
     getCalculatedContour: async (payload) => {
-        const response = await fetch('/get_calculated_contour', {
+        return _postJsonWithETag('/get_calculated_contour', payload);
+    },
+
+    getCalculatedContourSlices: async (payload) => {
+        const response = await fetch('/get_calculated_contour_slices', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(payload),
@@ -83,6 +113,10 @@ const APIService = {
         return response.json();
     },
 
+    getSensitivityMaps: async (payload) => {
+        return _postJsonWithETag('/get_sensitivity_maps', payload);
+    },
+
     getOverlapData: async () => {
         const response = await fetch('/get_overlap_data', {
             method: 'GET',
@@ -93,6 +127,17 @@ const APIService = {
         return response.json();
     },
 
+    getNearestMeasurements: async (payload) => {
+        const response = await fetch('/nearest', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload),
+        });
+
+        if (!response.ok) throw await _handleErrorResponse(response);
+        return response.json();
+    },
+
     getModelTableHeaders: async () => {
         const response = await fetch('/get_model_table_headers');
         if (!response.ok) throw await _handleErrorResponse(response);
@@ -127,6 +172,17 @@ const APIService = {
             headers: { 'Content-Type': 'application/json' },
         });
 
+        if (!response.ok) throw await _handleErrorResponse(response);
+        return response.json();
+    },
+
+    compareModels: async (payload) => {
+        const response = await fetch('/model/compare', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload),
+        });
+
         if (!response.ok) throw await _handleErrorResponse(response);
         return response.json();
     }
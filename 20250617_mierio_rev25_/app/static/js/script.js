@@ -16,7 +16,7 @@ document.addEventListener('DOMContentLoaded', () => {
         'asset-folder-input',
         'asset-folder-name',
         // Assetフォルダの読み込みが成功した時の処理
-        (featureHeaders, targetHeaders) => {
+        (featureHeaders, targetHeaders, waveformHeaders) => {
             // Feature関連のUIと状態を更新
             ViewTab.setFeatureHeaders(featureHeaders);
             ViewTab.setCurrentFeatureSelections({});
@@ -24,6 +24,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
             // Target関連のUIと状態を更新
             ViewTab.setTargetHeaders(targetHeaders);
+            ViewTab.setWaveformHeaders(waveformHeaders);
             ViewTab.setCurrentTargetSelection('');
             ViewTab.populateTargetParameters(targetHeaders);
 
@@ -48,6 +49,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
             // Target関連のUIと状態をクリア
             ViewTab.setTargetHeaders([]);
+            ViewTab.setWaveformHeaders([]);
             ViewTab.setCurrentTargetSelection('');
             document.getElementById('target-params-container').innerHTML = '';
 
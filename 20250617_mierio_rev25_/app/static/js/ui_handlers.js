@@ -33,15 +33,24 @@ const UIHandlers = {
 
                 let featureFile = null;
                 let targetFile = null;
+                const waveformFiles = [];
                 for (const file of files) {
                     if (file.name.toLowerCase() === 'feature.csv') featureFile = file;
                     if (file.name.toLowerCase() === 'target.csv') targetFile = file;
+                    const pathParts = file.webkitRelativePath.split('/');
+                    if (pathParts.length === 3 && pathParts[1] === 'Waveform' && file.name.toLowerCase().endsWith('.csv')) {
+                        waveformFiles.push(file);
+                    }
                 }
 
                 if (featureFile && targetFile) {
                     const formData = new FormData();
+                    formData.append('asset_name', folderName);
                     formData.append('files[]', featureFile, featureFile.name);
                     formData.append('files[]', targetFile, targetFile.name);
+                    for (const waveformFile of waveformFiles) {
+                        formData.append('waveforms[]', waveformFile, waveformFile.name);
+                    }
                     const result = await APIService.uploadAssetFolder(formData);
                     
                     if (result.error) {
@@ -49,7 +58,7 @@ const UIHandlers = {
                         displayName.value = '';
                         onClear();
                     } else {
-                        onUploadSuccess(result.headers.feature, result.headers.target);
+                        onUploadSuccess(result.headers.feature, result.headers.target, result.headers.waveform || []);
                     }
                 } else {
                     alert('選択したフォルダに Feature.csv と Target.csv が見つかりません。');
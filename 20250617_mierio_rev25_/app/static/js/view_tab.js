@@ -1,5 +1,6 @@
 let featureHeaders = [];
 let targetHeaders = [];
+let waveformHeaders = [];
 let currentFeatureSelections = {};
 let currentTargetSelection = '';
 let plotlyGraphContainer;
@@ -220,7 +221,8 @@ const ViewTab = {
         select.classList.add('param-dropdown');
         select.innerHTML = '<option value="">-- Targetを選択 --</option>';
 
-        targetHeaders.forEach(header => {
+        // 波形から抽出した特徴量もVIEWタブのターゲットとして選択できるようにする
+        targetHeaders.concat(waveformHeaders).forEach(header => {
             if (header.toLowerCase() !== 'main_id') {
                 const option = document.createElement('option');
                 option.value = header;
@@ -299,6 +301,7 @@ const ViewTab = {
 
     setFeatureHeaders: (headers) => { featureHeaders = headers; },
     setTargetHeaders: (headers) => { targetHeaders = headers; },
+    setWaveformHeaders: (headers) => { waveformHeaders = headers; },
     setCurrentFeatureSelections: (selections) => { currentFeatureSelections = selections; },
     setCurrentTargetSelection: (selection) => { currentTargetSelection = selection; },
     getFeatureHeaders: () => featureHeaders,
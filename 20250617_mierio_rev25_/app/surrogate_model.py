@@ -1,9 +1,16 @@
+import numpy as np
 import pandas as pd
 import tensorflow as tf
 from sklearn.preprocessing import MinMaxScaler
 import joblib
-from functools import lru_cache
 import os
+import time
+from flask import current_app
+from .cache_utils import LRUCache, file_identity
+
+_model_cache = LRUCache(maxsize=32, name='surrogate_models')
+_DEFAULT_BATCH_SIZE = 32
+_FAST_BATCH_SIZE = 256
 
 def _create_model(input_dim, output_dim):
     """
@@ -17,7 +24,34 @@ def _create_model(input_dim, output_dim):
     ])
     return model
 
-def train_and_save_model(df, feature_vars, target_vars, model_path, scaler_path, base_model_path=None, epochs=50, batch_size=32):
+class _TimeBudget(tf.keras.callbacks.Callback):
+    """
+    経過時間が予算を超えたエポックの終わりで学習を打ち切るコールバック。
+    """
+    def __init__(self, seconds):
+        super().__init__()
+        self.seconds = seconds
+        self.exceeded = False
+        self._started = None
+
+    def on_train_begin(self, logs=None):
+        self._started = time.monotonic()
+
+    def on_epoch_end(self, epoch, logs=None):
+        if time.monotonic() - self._started > self.seconds:
+            self.exceeded = True
+            self.model.stop_training = True
+
+
+def _make_dataset(X, y, batch_size, shuffle, seed=None):
+    dataset = tf.data.Dataset.from_tensor_slices((X, y))
+    if shuffle:
+        dataset = dataset.shuffle(min(len(X), 100000), seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def train_and_save_model(df, feature_vars, target_vars, model_path, scaler_path, base_model_path=None, epochs=50, batch_size=None,
+                         fast=False, patience=5, time_budget_seconds=None, seed=0):
     """
     モデルの新規学習またはファインチューニングを行い、保存する。
 
@@ -29,32 +63,45 @@ def train_and_save_model(df, feature_vars, target_vars, model_path, scaler_path,
         scaler_path (str): スケーラーの保存先パス (.joblib)。
         base_model_path (str, optional): ファインチューニングのベースとなる既存モデルのパス。
                                          Noneの場合は新規学習を行う。デフォルトはNone。
-        epochs (int, optional): 学習のエポック数。
-        batch_size (int, optional): 学習のバッチサイズ。
+        epochs (int, optional): 学習のエポック数（高速モードでは上限）。
+        batch_size (int, optional): 学習のバッチサイズ。Noneの場合は通常 32、高速モードでは 256。
+        fast (bool, optional): 高速モード。検証損失が patience エポック改善しなければ打ち切って最良の重みに戻し、
+                               大きなバッチに合わせて学習率を上げ、ログを出さずに tf.data で入力する。
+        patience (int, optional): 高速モードの早期終了までに待つエポック数。
+        time_budget_seconds (float, optional): 高速モードの学習時間の上限（秒）。
+        seed (int, optional): 高速モードの検証データの分割とシャッフルの乱数シード。
+
+    Returns:
+        dict: 実際に学習したエポック数や学習時間、打ち切りで短縮できた推定時間などの学習結果。
     """
     X = df[feature_vars]
     y = df[target_vars]
+    if batch_size is None:
+        batch_size = _FAST_BATCH_SIZE if fast else _DEFAULT_BATCH_SIZE
+    # 高速モードでは進捗のログもデバッグレベルに落とす
+    log = current_app.logger.debug if fast else current_app.logger.info
 
     if base_model_path and os.path.exists(base_model_path):
         # --- ファインチューニング（追加学習）の場合 ---
-        print(f"Loading base model from {base_model_path} for fine-tuning...")
+        log(f"Loading base model from {base_model_path} for fine-tuning...")
         
-        # 既存のモデルとスケーラーをロード
-        model, scaler = load_model_and_scaler(base_model_path, scaler_path)
-        if model is None or scaler is None:
+        # 既存のモデルとスケーラーをロード。モデルは学習で重みが変わるため、
+        # キャッシュで共有されているオブジェクトではなく新しく読み込んだものを使う
+        _, scaler = load_model_and_scaler(base_model_path, scaler_path)
+        if scaler is None:
             raise ValueError(f"Failed to load base model or scaler from the provided paths.")
+        model = tf.keras.models.load_model(base_model_path)
         
         # 既存のスケーラーを使って新しいデータを変換
         X_scaled = scaler.transform(X)
         
         # モデルの学習率を少し下げてファインチューニングすることが一般的
-        # Adamオプティマイザの学習率を再設定
-        model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=0.0001), loss='mean_squared_error')
-        print("Continuing training on new data (fine-tuning)...")
+        base_learning_rate = 0.0001
+        log("Continuing training on new data (fine-tuning)...")
 
     else:
         # --- 新規学習の場合 ---
-        print("Creating and training a new model...")
+        log("Creating and training a new model...")
         
         # 新しいスケーラーを作成し、学習データにフィットさせる
         scaler = MinMaxScaler()
@@ -68,41 +115,166 @@ def train_and_save_model(df, feature_vars, target_vars, model_path, scaler_path,
         output_dim = len(target_vars)
         model = _create_model(input_dim, output_dim)
         
-        model.compile(optimizer='adam', loss='mean_squared_error')
-    
-    # モデルのサマリーを表示
-    model.summary()
-    
-    # モデルの学習を実行
-    model.fit(
-        X_scaled,
-        y,
-        epochs=epochs,
-        batch_size=batch_size,
-        validation_split=0.2,
-        verbose=1
-    )
+        base_learning_rate = 0.001
+
+    # バッチを大きくした分だけ学習率を上げる（Adamでは平方根でのスケーリングが安定する）
+    learning_rate = base_learning_rate * np.sqrt(batch_size / _DEFAULT_BATCH_SIZE)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate), loss='mean_squared_error')
+
+    started = time.monotonic()
+    if fast:
+        X_scaled = np.asarray(X_scaled, dtype=np.float32)
+        y_values = y.to_numpy(dtype=np.float32)
+
+        # 学習データはグリッド順に並んでいることが多いため、末尾ではなくランダムに検証用を選ぶ
+        order = np.random.default_rng(seed).permutation(len(X_scaled))
+        n_val = max(1, int(len(order) * 0.2)) if len(order) > 1 else 0
+        val_idx, train_idx = order[:n_val], order[n_val:]
+
+        early_stopping = tf.keras.callbacks.EarlyStopping(
+            monitor='val_loss' if n_val else 'loss', patience=patience, restore_best_weights=True
+        )
+        callbacks = [early_stopping]
+        time_budget = None
+        if time_budget_seconds:
+            time_budget = _TimeBudget(time_budget_seconds)
+            callbacks.append(time_budget)
+
+        history = model.fit(
+            _make_dataset(X_scaled[train_idx], y_values[train_idx], batch_size, shuffle=True, seed=seed),
+            validation_data=_make_dataset(X_scaled[val_idx], y_values[val_idx], batch_size, shuffle=False) if n_val else None,
+            epochs=epochs,
+            callbacks=callbacks,
+            verbose=0
+        )
+    else:
+        # モデルのサマリーを表示
+        model.summary()
+        
+        # モデルの学習を実行
+        history = model.fit(
+            X_scaled,
+            y,
+            epochs=epochs,
+            batch_size=batch_size,
+            validation_split=0.2,
+            verbose=1
+        )
+        early_stopping = time_budget = None
+    train_seconds = time.monotonic() - started
     
     # 学習後のモデルを指定されたパスに保存
     model.save(model_path)
-    print(f"Model saved to {model_path}")
+    log(f"Model saved to {model_path}")
+
+    epochs_run = len(history.history.get('loss', []))
+    val_losses = history.history.get('val_loss') or history.history.get('loss') or []
+    if time_budget is not None and time_budget.exceeded:
+        stop_reason = 'time_budget'
+    elif early_stopping is not None and early_stopping.stopped_epoch > 0:
+        stop_reason = 'converged'
+    else:
+        stop_reason = 'max_epochs'
+
+    report = {
+        'fast': fast,
+        'epochs_requested': epochs,
+        'epochs_run': epochs_run,
+        'best_epoch': int(np.argmin(val_losses)) + 1 if val_losses else None,
+        'best_val_loss': float(np.min(val_losses)) if val_losses else None,
+        'stop_reason': stop_reason,
+        'batch_size': batch_size,
+        'learning_rate': float(learning_rate),
+        'train_seconds': train_seconds,
+        # 残りのエポックも同じ速さで進んだ場合に、打ち切りで節約できた時間の推定値
+        'estimated_seconds_saved': train_seconds / epochs_run * (epochs - epochs_run) if epochs_run else 0.0,
+    }
+    log(f"Training finished: {epochs_run}/{epochs} epochs in {train_seconds:.1f}s ({stop_reason}).")
+    return report
+
+
+def _parse_flag(value):
+    """
+    リクエストの真偽値を厳密に解釈する（文字列の "false" を True としないため）。
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ('true', '1', 'yes', 'on'):
+            return True
+        if text in ('false', '0', 'no', 'off'):
+            return False
+    raise ValueError(f"Invalid boolean value: {value!r}")
+
+
+def training_options(config, overrides=None):
+    """
+    設定（TRAINING_*）とリクエストでの指定から train_and_save_model の学習オプションを作る。
+    不正な値は学習やファイルの書き出しを始める前に ValueError / TypeError で送出する。
+    """
+    overrides = overrides or {}
+    fast = overrides.get('fast_training')
+    epochs = int(overrides.get('epochs', config['TRAINING_EPOCHS']))
+    patience = int(overrides.get('patience', config['TRAINING_PATIENCE']))
+    time_budget = overrides.get('time_budget_seconds', config['TRAINING_TIME_BUDGET_SECONDS'])
+    time_budget = float(time_budget) if time_budget else None
+    if epochs < 1:
+        raise ValueError(f"epochs must be at least 1 (got {epochs}).")
+    if patience < 1:
+        raise ValueError(f"patience must be at least 1 (got {patience}).")
+    if time_budget is not None and not time_budget > 0:
+        raise ValueError(f"time_budget_seconds must be positive (got {time_budget}).")
+    return {
+        'epochs': epochs,
+        'fast': config['TRAINING_FAST_MODE'] if fast is None else _parse_flag(fast),
+        'patience': patience,
+        'time_budget_seconds': time_budget,
+    }
 
 
-@lru_cache(maxsize=32)
 def load_model_and_scaler(model_path, scaler_path):
     """
     キャッシュ機能付きでモデルとスケーラーをロードする。
+    キャッシュはファイルの識別子（パス・更新時刻・サイズ）ごとに持つため、
+    ファインチューニングなどで同じパスのファイルが書き換えられると読み込み直す。
     """
+    try:
+        key = get_model_identity(model_path, scaler_path)
+    except OSError as e:
+        print(f"Error loading model or scaler: {e}")
+        return None, None
+    cached = _model_cache.get(key)
+    if cached is not None:
+        return cached
     try:
         print(f"Loading model from: {model_path}")
         model = tf.keras.models.load_model(model_path)
         print(f"Loading scaler from: {scaler_path}")
         scaler = joblib.load(scaler_path)
+        _model_cache.set(key, (model, scaler))
         return model, scaler
     except Exception as e:
         print(f"Error loading model or scaler: {e}")
         return None, None
 
+def resolve_model_paths(models_folder, json_filename):
+    """
+    JSON設定ファイル名から、対応するモデル (.keras) とスケーラー (.joblib) のパスを返す。
+    """
+    base_filename, _ = os.path.splitext(json_filename)
+    model_path = os.path.join(models_folder, f"{base_filename}.keras")
+    scaler_path = os.path.join(models_folder, f"{base_filename}_scaler.joblib")
+    return model_path, scaler_path
+
+def get_model_identity(model_path, scaler_path):
+    """
+    モデルとスケーラーのファイルの組を識別するハッシュ。
+    """
+    return file_identity(model_path, scaler_path)
+
 def predict_with_loaded_model(model, scaler, input_df):
     """
     ロード済みのモデルとスケーラーを使って予測を行う。
@@ -110,3 +282,35 @@ def predict_with_loaded_model(model, scaler, input_df):
     input_scaled = scaler.transform(input_df)
     predictions = model.predict(input_scaled)
     return predictions
+
+def scale_features(scaler, X):
+    """
+    MinMaxScalerの変換をNumPy配列に直接適用する。
+    列は scaler.feature_names_in_ の順に並んでいる必要がある。
+    """
+    X = np.asarray(X, dtype=np.float32)
+    return X * scaler.scale_.astype(np.float32) + scaler.min_.astype(np.float32)
+
+def predict_batch(model, scaler, X):
+    """
+    1つのバッチを1回の順伝播で予測する。
+    model.predict のような内部のミニバッチ分割やコールバック処理を行わないため、
+    大きな配列をチャンク単位で流す場合に高速。
+    """
+    X_scaled = scale_features(scaler, X)
+    return np.asarray(model.predict_on_batch(X_scaled))
+
+def predict_with_gradients(model, scaler, X):
+    """
+    予測値と、各ターゲットの各特徴量に対する偏微分を1回の順伝播と逆伝播でまとめて計算する。
+    MinMaxScaler の変換 x_scaled = x * scale_ + min_ の連鎖律を適用し、元の単位での勾配を返す。
+    戻り値は (予測値 (N, ターゲット数), 勾配 (N, ターゲット数, 特徴量数))。
+    """
+    X_scaled = tf.convert_to_tensor(scale_features(scaler, X))
+    with tf.GradientTape() as tape:
+        tape.watch(X_scaled)
+        predictions = model(X_scaled, training=False)
+    # 各行の出力はその行の入力にしか依存しないため、batch_jacobian で行ごとのヤコビアンが得られる
+    jacobian = tape.batch_jacobian(predictions, X_scaled)
+    gradients = jacobian.numpy() * scaler.scale_.astype(np.float32)[np.newaxis, np.newaxis, :]
+    return predictions.numpy(), gradients
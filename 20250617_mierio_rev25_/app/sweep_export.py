@@ -0,0 +1,303 @@
+import os
+import secrets
+import shutil
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from . import surrogate_model
+from .model_evaluator import calculate_targets
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+SWEEP_FORMATS = ('npy', 'parquet') if pq is not None else ('npy',)
+_MAX_TRACKED_JOBS = 32
+
+_lock = threading.Lock()
+_jobs = OrderedDict()
+
+
+class InsufficientDiskSpaceError(OSError):
+    """
+    スイープの出力を書き出すための空き容量が足りない場合の例外（HTTPでは507として返す）。
+    """
+
+
+def estimate_output_bytes(total, n_columns):
+    """
+    出力ファイルの大きさの見積もり（float64 の表。parquet は圧縮されるため、これより小さくなることが多い）。
+    """
+    return int(total) * int(n_columns) * np.dtype(np.float64).itemsize
+
+
+def check_disk_space(folder, required_bytes, min_free_bytes=0):
+    """
+    出力先に required_bytes を書き出しても min_free_bytes 以上の空き容量が残るかを確かめる。
+    実行中のスイープがこれから書き出す分も使用済みとして扱う。
+    """
+    with _lock:
+        pending = sum(
+            job['estimated_bytes'] * (1 - job['points_done'] / job['points_total'])
+            for job in _jobs.values()
+            if job['state'] == 'running' and job['points_total']
+        )
+    free = shutil.disk_usage(folder).free
+    if required_bytes + pending + min_free_bytes > free:
+        raise InsufficientDiskSpaceError(
+            f"The sweep output needs about {required_bytes / 2**30:.2f} GiB, but only "
+            f"{max(0.0, (free - pending - min_free_bytes) / 2**30):.2f} GiB of disk space is available."
+        )
+
+
+def parse_sweep_axes(axes_spec):
+    """
+    スイープ軸の指定を [(列名, 値の配列), ...] に変換する。
+    各軸は {'name':, 'values': [...]} または {'name':, 'min':, 'max':, 'steps':} で指定する。
+    """
+    if not isinstance(axes_spec, list) or not axes_spec:
+        raise ValueError("'axes' must be a non-empty list.")
+
+    axes, seen = [], set()
+    for spec in axes_spec:
+        name = spec.get('name')
+        if not name:
+            raise ValueError("Each axis needs a 'name'.")
+        if name in seen:
+            raise ValueError(f"Axis '{name}' is specified more than once.")
+        seen.add(name)
+
+        if spec.get('values') is not None:
+            values = np.asarray(spec['values'], dtype=np.float64)
+        else:
+            steps = int(spec.get('steps', 0))
+            if steps < 1:
+                raise ValueError(f"Axis '{name}' needs 'values' or 'min', 'max' and 'steps' >= 1.")
+            values = np.linspace(float(spec['min']), float(spec['max']), steps)
+
+        if values.ndim != 1 or values.size == 0:
+            raise ValueError(f"Axis '{name}' has no values.")
+        axes.append((name, values))
+    return axes
+
+
+def sweep_size(axes):
+    return int(np.prod([values.size for _, values in axes], dtype=object))
+
+
+def iter_sweep_chunks(axes, chunk_size):
+    """
+    N次元グリッドの点をインデックス順（最後の軸が最も速く変わる）に chunk_size 点ずつ生成する。
+    グリッド全体は実体化せず、各チャンクの通し番号から np.unravel_index で各軸の値を求める。
+    """
+    shape = tuple(values.size for _, values in axes)
+    total = sweep_size(axes)
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        indices = np.unravel_index(np.arange(start, stop, dtype=np.int64), shape)
+        yield start, stop, {name: values[idx] for (name, values), idx in zip(axes, indices)}
+
+
+def surrogate_evaluator(model, scaler, axis_names, constants):
+    """
+    サロゲートモデルでチャンクを評価する関数を返す。軸にも定数にもない特徴量があればエラー。
+    """
+    feature_names = list(scaler.feature_names_in_)
+    unknown = [name for name in list(axis_names) + list(constants) if name not in feature_names]
+    if unknown:
+        raise KeyError(f"Features {unknown} not found in the features the model was trained on.")
+    missing = [f for f in feature_names if f not in axis_names and f not in constants]
+    if missing:
+        raise KeyError(f"Features {missing} are neither sweep axes nor constants.")
+
+    def evaluate(columns):
+        n_rows = len(next(iter(columns.values())))
+        X = np.empty((n_rows, len(feature_names)), dtype=np.float32)
+        for i, name in enumerate(feature_names):
+            X[:, i] = columns[name] if name in columns else float(constants[name])
+        return surrogate_model.predict_batch(model, scaler, X)
+
+    return evaluate
+
+
+def law_evaluator(model_config, target_names, constants, axis_names=None):
+    """
+    法則モデルの数式でチャンクを評価する関数を返す。
+    axis_names を渡すと、数式が使う特徴量が軸にも定数にもない場合に、評価を始める前にエラーにする。
+    """
+    if axis_names is not None:
+        fitting_config = model_config.get('fitting_config', {})
+        unknown = [t for t in target_names if t not in fitting_config]
+        if unknown:
+            raise KeyError(f"No law-model expression defined for targets: {unknown}")
+        required = {f for t in target_names for f in fitting_config[t] if f.lower() != 'main_id'}
+        missing = sorted(f for f in required if f not in axis_names and f not in constants)
+        if missing:
+            raise KeyError(f"Features {missing} are neither sweep axes nor constants.")
+
+    def evaluate(columns):
+        n_rows = len(next(iter(columns.values())))
+        feature_values = {name: float(value) for name, value in constants.items()}
+        feature_values.update(columns)
+        results = calculate_targets(model_config, feature_values, target_names=target_names)
+        missing = [t for t in target_names if t not in results]
+        if missing:
+            raise KeyError(f"No law-model expression defined for targets: {missing}")
+        return np.column_stack([
+            np.broadcast_to(np.asarray(results[t], dtype=np.float64), (n_rows,)) for t in target_names
+        ])
+
+    return evaluate
+
+
+class _NpyWriter:
+    def __init__(self, path, n_rows, columns):
+        self._array = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(n_rows, len(columns)))
+
+    def write(self, start, stop, block):
+        self._array[start:stop] = block
+
+    def close(self):
+        self._array.flush()
+        del self._array
+
+
+class _ParquetWriter:
+    def __init__(self, path, n_rows, columns):
+        self._columns = columns
+        self._writer = pq.ParquetWriter(path, pa.schema([(c, pa.float64()) for c in columns]))
+
+    def write(self, start, stop, block):
+        table = pa.Table.from_arrays([pa.array(block[:, i]) for i in range(block.shape[1])], names=self._columns)
+        self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+
+
+def get_sweep_job(job_id):
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+
+def _update_job(job_id, **values):
+    with _lock:
+        if job_id in _jobs:
+            _jobs[job_id].update(values)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def cleanup_sweep_exports(folder, ttl_seconds):
+    """
+    終了してから ttl_seconds 以上経ったジョブと、その出力ファイルを削除する。
+    再起動前のジョブなど、追跡していない古い出力ファイルも更新時刻で判定して削除する。
+    """
+    now = time.time()
+    with _lock:
+        expired = [job_id for job_id, job in _jobs.items()
+                   if job['state'] != 'running' and now - job.get('finished_at', now) >= ttl_seconds]
+        paths = [_jobs.pop(job_id)['path'] for job_id in expired]
+        active_paths = {job['path'] for job in _jobs.values()}
+
+    for path in paths:
+        _remove_file(path)
+    for entry in os.scandir(folder):
+        if (entry.is_file() and entry.name.startswith('sweep_')
+                and entry.path.removesuffix('.part') not in active_paths
+                and now - entry.stat().st_mtime >= ttl_seconds):
+            _remove_file(entry.path)
+
+
+def _run_sweep(app, job_id, evaluate, axes, output_names, output_path, output_format, chunk_size):
+    with app.app_context():
+        columns = [name for name, _ in axes] + list(output_names)
+        total = sweep_size(axes)
+        tmp_path = f"{output_path}.part"
+        writer_class = _ParquetWriter if output_format == 'parquet' else _NpyWriter
+        started = time.monotonic()
+
+        try:
+            writer = writer_class(tmp_path, total, columns)
+            try:
+                for start, stop, axis_columns in iter_sweep_chunks(axes, chunk_size):
+                    with app.resource_manager.workload('batch', timeout=None):
+                        outputs = evaluate(axis_columns)
+                    block = np.empty((stop - start, len(columns)), dtype=np.float64)
+                    for i, (name, _) in enumerate(axes):
+                        block[:, i] = axis_columns[name]
+                    block[:, len(axes):] = outputs
+                    writer.write(start, stop, block)
+                    _update_job(job_id, points_done=stop, elapsed_seconds=time.monotonic() - started)
+            finally:
+                writer.close()
+
+            os.replace(tmp_path, output_path)
+            _update_job(job_id, state='done', elapsed_seconds=time.monotonic() - started, finished_at=time.time())
+            app.logger.info(f"Sweep export {job_id} finished: {total} points in {time.monotonic() - started:.1f}s.")
+
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            _update_job(job_id, state='failed', error=str(e), finished_at=time.time())
+            app.logger.error(f"Sweep export {job_id} failed: {e}", exc_info=True)
+
+
+def start_sweep_export(app, evaluate, axes, output_names, output_format, chunk_size):
+    """
+    N次元スイープをバックグラウンドで評価し、チャンクごとに .npy / .parquet ファイルへ書き出す。
+    出力は (軸の列 + 出力の列) の float64 の表で、行はインデックス順に並ぶ。
+    戻り値のジョブIDで進捗の確認とダウンロードを行う。
+    出力先の空き容量が足りない場合は、ジョブを始めずに InsufficientDiskSpaceError を送出する。
+    """
+    if output_format not in SWEEP_FORMATS:
+        raise ValueError(f"Unsupported sweep format: {output_format}. Available: {list(SWEEP_FORMATS)}")
+
+    cleanup_sweep_exports(app.config['SWEEP_EXPORT_FOLDER'], app.config['SWEEP_EXPORT_TTL_SECONDS'])
+    estimated_bytes = estimate_output_bytes(sweep_size(axes), len(axes) + len(output_names))
+    check_disk_space(app.config['SWEEP_EXPORT_FOLDER'], estimated_bytes, app.config['SWEEP_MIN_FREE_BYTES'])
+
+    job_id = secrets.token_hex(8)
+    output_path = os.path.join(app.config['SWEEP_EXPORT_FOLDER'], f"sweep_{job_id}.{output_format}")
+
+    evicted = []
+    with _lock:
+        _jobs[job_id] = {
+            'job_id': job_id,
+            'state': 'running',
+            'format': output_format,
+            'columns': [name for name, _ in axes] + list(output_names),
+            'shape': [values.size for _, values in axes],
+            'points_total': sweep_size(axes),
+            'points_done': 0,
+            'estimated_bytes': estimated_bytes,
+            'elapsed_seconds': 0.0,
+            'path': output_path,
+        }
+        while len(_jobs) > _MAX_TRACKED_JOBS:
+            oldest = next((k for k, v in _jobs.items() if v['state'] != 'running'), None)
+            if oldest is None:
+                break
+            # 追跡しなくなったジョブの出力はダウンロードできないため、ファイルも削除する
+            evicted.append(_jobs.pop(oldest)['path'])
+    for path in evicted:
+        _remove_file(path)
+
+    thread = threading.Thread(
+        target=_run_sweep,
+        args=(app, job_id, evaluate, axes, output_names, output_path, output_format, chunk_size),
+        name=f'sweep-export-{job_id}',
+        daemon=True
+    )
+    thread.start()
+    return job_id
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from .model_evaluator import calculate_targets, generate_equation_string
+from .cache_utils import touch
+
+
+def training_set_key(model_config, feature_vars, target_vars, coords):
+    """
+    法則モデルの数式・特徴量のサンプリング点・列構成から学習データのハッシュを計算する。
+    モデル名やタイムスタンプは含まないため、数式と範囲が同じ設定は同じキーになる。
+    """
+    functions_map = {func['name']: func for func in model_config.get('functions', [])}
+    fitting_method = model_config.get('fitting_method', '線形結合')
+    equations = {
+        target: generate_equation_string(target, model_config.get('fitting_config', {}), functions_map, fitting_method)
+        for target in target_vars
+    }
+    payload = {
+        'equations': equations,
+        'feature_vars': list(feature_vars),
+        'target_vars': list(target_vars),
+        'coords': {var: [float(values[0]), float(values[-1]), len(values)] for var, values in coords.items()},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def generate_training_set(model_config, feature_vars, target_vars, coords):
+    """
+    特徴量の全組み合わせのグリッド上で法則モデルを一括評価し、
+    (特徴量 + ターゲット) 列の float64 行列を返す。
+    """
+    meshes = np.meshgrid(*[np.asarray(coords[var], dtype=np.float64) for var in feature_vars], indexing='ij')
+    feature_columns = [mesh.ravel() for mesh in meshes]
+    n_rows = feature_columns[0].size if feature_columns else 0
+
+    calculated = calculate_targets(model_config, dict(zip(feature_vars, feature_columns)), target_names=target_vars)
+    missing = [t for t in target_vars if t not in calculated]
+    if missing:
+        raise ValueError(f"No law-model expression defined for targets: {missing}")
+
+    matrix = np.empty((n_rows, len(feature_vars) + len(target_vars)), dtype=np.float64)
+    for i, values in enumerate(feature_columns):
+        matrix[:, i] = values
+    for j, target in enumerate(target_vars):
+        matrix[:, len(feature_vars) + j] = np.broadcast_to(np.asarray(calculated[target], dtype=np.float64), (n_rows,))
+    return matrix
+
+
+def load_or_generate_training_set(model_config, feature_vars, target_vars, coords, cache_folder):
+    """
+    学習データをハッシュをキーとしたキャッシュから読み込む。なければ生成して .npy 形式で保存する。
+    キャッシュはメモリマップで開くため、読み込み時にファイル全体をコピーしない。
+
+    Returns:
+        tuple: (DataFrame, キャッシュを使ったかどうか)
+    """
+    key = training_set_key(model_config, feature_vars, target_vars, coords)
+    data_path = os.path.join(cache_folder, f"{key}.npy")
+    columns = list(feature_vars) + list(target_vars)
+
+    if os.path.exists(data_path):
+        matrix = np.load(data_path, mmap_mode='r')
+        if matrix.ndim == 2 and matrix.shape[1] == len(columns):
+            touch(data_path)
+            return pd.DataFrame(matrix, columns=columns, copy=False), True
+
+    matrix = generate_training_set(model_config, feature_vars, target_vars, coords)
+
+    os.makedirs(cache_folder, exist_ok=True)
+    tmp_path = f"{data_path}.{threading.get_ident()}.tmp.npy"
+    np.save(tmp_path, matrix)
+    os.replace(tmp_path, data_path)
+    with open(os.path.join(cache_folder, f"{key}.json"), 'w', encoding='utf-8') as f:
+        json.dump({'columns': columns, 'rows': int(matrix.shape[0])}, f, ensure_ascii=False)
+
+    return pd.DataFrame(matrix, columns=columns), False
@@ -0,0 +1,109 @@
+import itertools
+import threading
+import time
+import numpy as np
+from . import plot_utils
+from . import surrogate_model
+from .data_utils import load_and_merge_csvs, convert_columns_to_numeric
+
+_lock = threading.Lock()
+_generation = 0
+_status = {'state': 'idle'}
+
+
+def get_warmup_status():
+    with _lock:
+        return dict(_status)
+
+
+def _update_status(generation, **values):
+    with _lock:
+        if generation == _generation:
+            _status.update(values)
+
+
+def _is_current(generation):
+    with _lock:
+        return generation == _generation
+
+
+def _common_constant_combinations(df, constant_cols, limit):
+    """
+    定数として扱う列の値の組み合わせを、データ中の出現回数が多い順に最大 limit 件返す。
+    """
+    if not constant_cols:
+        return [{}]
+    counts = df.dropna(subset=constant_cols).groupby(constant_cols).size().sort_values(ascending=False)
+    combos = []
+    for values in counts.index[:limit]:
+        values = values if isinstance(values, tuple) else (values,)
+        combos.append({col: float(v) for col, v in zip(constant_cols, values)})
+    return combos
+
+
+def _run_warmup(app, generation, model, scaler, model_identity, feature_filepath, target_filepath):
+    with app.app_context():
+        config = app.config
+        deadline = time.monotonic() + config['WARMUP_TIME_BUDGET_SECONDS']
+        memory_budget = config['WARMUP_MEMORY_BUDGET_BYTES']
+        resolution = config['OVERLAP_RESOLUTION']
+        feature_names = list(scaler.feature_names_in_)
+
+        try:
+            # TensorFlowのグラフトレースを先に済ませるため、オーバーラップと同じ形状で1回推論する
+            with app.resource_manager.workload('batch', timeout=None):
+                surrogate_model.predict_batch(model, scaler, np.tile(scaler.data_min_, (resolution * resolution, 1)))
+            _update_status(generation, traced=True)
+
+            df = load_and_merge_csvs(feature_filepath, target_filepath, columns=feature_names)
+            df = convert_columns_to_numeric(df, feature_names)
+
+            grids_done, bytes_used = 0, 0
+            for x_col, y_col in itertools.permutations(feature_names, 2):
+                if not _is_current(generation) or time.monotonic() > deadline:
+                    break
+
+                constant_cols = [f for f in feature_names if f not in (x_col, y_col)]
+                combos = _common_constant_combinations(df, constant_cols, config['WARMUP_MAX_COMBINATIONS'])
+
+                with app.resource_manager.workload('batch', timeout=None):
+                    x_points, y_points, z = plot_utils.predict_overlap_grids(model, scaler, x_col, y_col, combos, resolution)
+                if bytes_used + z.nbytes > memory_budget:
+                    break
+
+                for constants, z_by_target in zip(combos, z):
+                    plot_utils.store_overlap_grids(model_identity, x_col, y_col, constants, resolution,
+                                                   x_points, y_points, z_by_target)
+                grids_done += len(combos)
+                bytes_used += z.nbytes
+                _update_status(generation, grids=grids_done, bytes=bytes_used)
+
+            _update_status(generation, state='done')
+            app.logger.info(f"Overlap warm-up finished: {grids_done} grids, {bytes_used} bytes.")
+
+        except Exception as e:
+            _update_status(generation, state='failed', error=str(e))
+            app.logger.error(f"Overlap warm-up failed: {e}", exc_info=True)
+
+
+def start_overlap_warmup(app, model, scaler, model_identity, feature_filepath, target_filepath):
+    """
+    ロードされたモデルについて、全てのx/y特徴量ペアとデータ中の主な定数の組み合わせの
+    オーバーラップ用グリッドをバックグラウンドで事前計算する。
+    新しいウォームアップを開始すると、実行中の古いウォームアップは次のペアで打ち切られる。
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+        generation = _generation
+        _status.clear()
+        _status.update({'state': 'running', 'model_identity': model_identity, 'grids': 0, 'bytes': 0, 'traced': False})
+
+    thread = threading.Thread(
+        target=_run_warmup,
+        args=(app, generation, model, scaler, model_identity, feature_filepath, target_filepath),
+        name='overlap-warmup',
+        daemon=True
+    )
+    thread.start()
+    return generation
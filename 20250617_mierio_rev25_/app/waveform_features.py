@@ -0,0 +1,187 @@
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from .cache_utils import LRUCache, touch
+
+WAVEFORM_FOLDER_NAME = 'Waveform'
+WAVEFORM_FEATURE_COLUMNS = ['WF_peak_intensity', 'WF_pulse_energy', 'WF_rise_time', 'WF_dominant_frequency']
+
+_WAVEFORM_FILE_PATTERN = re.compile(r'^id_(.+)\.csv$', re.IGNORECASE)
+_feature_cache = LRUCache(maxsize=8, name='waveform_features')
+_build_lock = threading.Lock()
+# 特徴量抽出用のスレッドプール（最初に並列処理が必要になった時に作り、プロセス内で使い回す）
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_waveform_folder(feature_filepath):
+    """
+    Feature.csv と同じ階層にある Waveform フォルダのパスを返す（存在しなければ None）。
+    """
+    folder = os.path.join(os.path.dirname(os.path.abspath(feature_filepath)), WAVEFORM_FOLDER_NAME)
+    return folder if os.path.isdir(folder) else None
+
+
+def list_waveform_files(folder):
+    """
+    id_<main_id>.csv 形式の波形ファイルを (main_id, パス) のリストで返す。
+    main_id はファイル名の文字列のまま返し、結合時に結合先の main_id の型に合わせる。
+    """
+    files = []
+    for entry in os.scandir(folder):
+        match = _WAVEFORM_FILE_PATTERN.match(entry.name)
+        if match and entry.is_file():
+            files.append((match.group(1), entry.path))
+    return sorted(files, key=lambda item: str(item[1]))
+
+
+def folder_identity(folder):
+    """
+    波形フォルダの識別子（パスとフォルダの更新時刻）。ファイルの追加・削除・名前の変更で変わる。
+    波形フォルダは内容のハッシュで決まるアセットの中に一度だけ書き出され、その後は変更されないため、
+    リクエストごとに全ての波形ファイルを stat しなくてよい。
+    """
+    stat = os.stat(folder)
+    return hashlib.sha1(f"{os.path.abspath(folder)}|{stat.st_mtime_ns}".encode('utf-8')).hexdigest()
+
+
+def align_main_ids(main_ids, dtype):
+    """
+    ファイル名から得た main_id（文字列）を結合先の main_id の型 dtype に変換する。
+    数値の列に変換できない main_id（整数の列では整数でない値・範囲外の値も）は結合対象外にする。
+    戻り値は (変換後の main_id, 結合に使える行のマスク)。
+    """
+    main_ids = pd.Series(main_ids, dtype=object)
+    if not pd.api.types.is_numeric_dtype(dtype):
+        return main_ids.astype(str).to_numpy(), np.ones(len(main_ids), dtype=bool)
+
+    numeric = pd.to_numeric(main_ids, errors='coerce')
+    valid = numeric.notna().to_numpy()
+    if pd.api.types.is_integer_dtype(dtype):
+        valid &= (numeric.fillna(0) % 1 == 0).to_numpy()
+        info = np.iinfo(dtype)
+        valid &= ((numeric >= info.min) & (numeric <= info.max)).fillna(False).to_numpy()
+    return numeric[valid].astype(dtype).to_numpy(), valid
+
+
+def batch_waveform_features(times, intensities):
+    """
+    同じサンプル数の波形を (波形数, サンプル数) の配列としてまとめて特徴量を計算する。
+    ピーク強度・パルスエネルギー（台形積分の累積和）・立ち上がり時間（ピークの10%→90%）・
+    主周波数（FFTの振幅が最大となる直流以外の周波数）を返す。
+    """
+    n_waves, n_samples = intensities.shape
+    rows = np.arange(n_waves)
+
+    peak = intensities.max(axis=1)
+
+    if n_samples > 1:
+        segments = 0.5 * (intensities[:, 1:] + intensities[:, :-1]) * np.diff(times, axis=1)
+        energy = np.cumsum(segments, axis=1)[:, -1]
+    else:
+        energy = np.zeros(n_waves)
+
+    i10 = np.argmax(intensities >= 0.1 * peak[:, None], axis=1)
+    i90 = np.argmax(intensities >= 0.9 * peak[:, None], axis=1)
+    rise_time = np.where(peak > 0, times[rows, i90] - times[rows, i10], np.nan)
+
+    if n_samples > 2:
+        dt = (times[:, -1] - times[:, 0]) / (n_samples - 1)
+        spectrum = np.abs(np.fft.rfft(intensities - intensities.mean(axis=1, keepdims=True), axis=1))
+        spectrum[:, 0] = 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dominant_frequency = np.where(dt > 0, np.argmax(spectrum, axis=1) / (n_samples * dt), np.nan)
+    else:
+        dominant_frequency = np.full(n_waves, np.nan)
+
+    return np.column_stack([peak, energy, rise_time, dominant_frequency])
+
+
+def extract_features_from_files(paths):
+    """
+    波形ファイル群を読み込み、サンプル数ごとにまとめてベクトル化した特徴量計算を行う。
+    スレッドプールのワーカーからも呼ばれる（CSVの読み込みとNumPyの計算はGILを解放する）。
+    """
+    waves = []
+    for path in paths:
+        data = pd.read_csv(path).to_numpy(dtype=np.float64)
+        waves.append(data[:, :2])
+
+    features = np.full((len(paths), len(WAVEFORM_FEATURE_COLUMNS)), np.nan)
+    by_length = {}
+    for i, wave in enumerate(waves):
+        by_length.setdefault(len(wave), []).append(i)
+
+    for length, indices in by_length.items():
+        if length == 0:
+            continue
+        stacked = np.stack([waves[i] for i in indices])
+        features[indices] = batch_waveform_features(stacked[:, :, 0], stacked[:, :, 1])
+    return features
+
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='waveform-features')
+        return _executor
+
+
+def _compute_features(files, workers, min_parallel_files):
+    paths = [path for _, path in files]
+    if workers <= 1 or len(paths) < min_parallel_files:
+        return extract_features_from_files(paths)
+
+    n_chunks = workers * 4
+    chunks = [paths[i::n_chunks] for i in range(n_chunks)]
+    chunks = [c for c in chunks if c]
+    results = list(_get_executor(workers).map(extract_features_from_files, chunks))
+
+    # paths[i::n_chunks] で分割したので、元の順序に戻す
+    features = np.empty((len(paths), len(WAVEFORM_FEATURE_COLUMNS)))
+    for k, result in enumerate(results):
+        features[k::len(chunks)] = result
+    return features
+
+
+def get_waveform_features(folder, cache_folder, workers=1, min_parallel_files=64):
+    """
+    波形フォルダから抽出した特徴量を main_id（ファイル名の文字列）付きのDataFrameで返す。
+    結果は波形フォルダの識別子（folder_identity）ごとにメモリとディスクにキャッシュされる。
+    """
+    identity = folder_identity(folder)
+    cached = _feature_cache.get(identity)
+    if cached is not None:
+        return cached
+
+    with _build_lock:
+        cached = _feature_cache.get(identity)
+        if cached is not None:
+            return cached
+
+        files = list_waveform_files(folder)
+        if not files:
+            return None
+
+        cache_path = os.path.join(cache_folder, f"{identity}.npz")
+        main_ids = np.array([main_id for main_id, _ in files], dtype=object)
+        if os.path.exists(cache_path):
+            with np.load(cache_path, allow_pickle=False) as data:
+                features = data['features']
+            touch(cache_path)
+        else:
+            features = _compute_features(files, workers, min_parallel_files)
+            os.makedirs(cache_folder, exist_ok=True)
+            tmp_path = f"{cache_path}.{threading.get_ident()}.tmp.npz"
+            np.savez(tmp_path, features=features)
+            os.replace(tmp_path, cache_path)
+
+        df = pd.DataFrame(features, columns=WAVEFORM_FEATURE_COLUMNS)
+        df.insert(0, 'main_id', main_ids)
+        _feature_cache.set(identity, df)
+        return df
@@ -11,6 +11,83 @@ class Config:
     # ▼▼▼ここから追加▼▼▼
     TUNED_MODELS_FOLDER = os.path.join(basedir, 'user_data', 'settings', 'tuned_models')
     # ▲▲▲ここまで追加▲▲▲
+    # main_id の結合用索引などの派生データの保存先
+    CACHE_FOLDER = os.path.join(basedir, 'user_data', 'cache')
+    INDEX_FOLDER = os.path.join(CACHE_FOLDER, 'index')
+    TRAINING_SETS_FOLDER = os.path.join(CACHE_FOLDER, 'training_sets')
+    WAVEFORM_FEATURES_FOLDER = os.path.join(CACHE_FOLDER, 'waveform_features')
+    # キャッシュフォルダ（索引・学習データ・波形特徴量）ごとのディスク使用量の上限と、
+    # 使われなくなったファイルを削除するまでの秒数（新しいファイルを書き出した時に古い順に削除する）
+    CACHE_FOLDER_MAX_BYTES = 2 * 1024 * 1024 * 1024
+    CACHE_MAX_AGE_SECONDS = 30 * 24 * 3600
+    # /model/sweep で書き出したスイープ結果の保存先
+    SWEEP_EXPORT_FOLDER = os.path.join(basedir, 'user_data', 'exports')
+
+    # セッションの保存先: 'sqlite'（ローカルファイル）, 'memory'（プロセス内）, 'cookie'（Flask標準）
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND') or 'sqlite'
+    SESSION_DB_PATH = os.path.join(basedir, 'user_data', 'sessions.sqlite3')
+    SESSION_TTL_SECONDS = 7 * 24 * 3600
+
+    # ワークロードごとのCPUスレッド数。None の場合はコア数から自動で決める
+    # （指定しなかったワークロードは自動の値を使う）。例: {'training': 4, 'interactive': 4, 'evaluation': 2, 'batch': 2}
+    THREAD_BUDGETS = None
+    # ワークロードごとに同時に実行できる処理の数
+    # （batch はスイープ・ウォームアップ・Sobol解析・逆設計などの長時間の処理で、評価とは別の枠で実行する）
+    WORKLOAD_CONCURRENCY = {'training': 1, 'interactive': 4, 'evaluation': 2, 'batch': 1}
+    # ワークロードの実行枠が空くまで待つ秒数。超えた場合は 503 を返す
+    WORKLOAD_ACQUIRE_TIMEOUT_SECONDS = 30
+
+    # /model/predict で入力を分割して処理する行数
+    PREDICT_CHUNK_SIZE = 4096
+    # /model/inverse_design で同時に最適化する初期点数の上限
+    INVERSE_DESIGN_MAX_STARTS = 20000
+    # /model/inverse_design の最適化ステップ数の上限
+    INVERSE_DESIGN_MAX_STEPS = 2000
+    # /get_calculated_contour_slices で一度に計算できるスライス数の上限
+    CONTOUR_MAX_SLICES = 200
+    # /get_calculated_contour で指定できるグリッド解像度の上限
+    CONTOUR_MAX_RESOLUTION = 1000
+    # /get_calculated_contour で isolines: true を指定したときの等値線のレベル数
+    CONTOUR_ISOLINE_LEVELS = 10
+    # /get_calculated_contour で指定できる等値線のレベル数（リストの場合はその長さ）の上限
+    CONTOUR_MAX_ISOLINE_LEVELS = 50
+    # サロゲートモデルの学習エポック数（高速モードでは上限）と、高速モード（早期終了・大きなバッチ・ログなし）で学習するか
+    # （リクエストの 'epochs' / 'fast_training' / 'patience' / 'time_budget_seconds' で個別に指定することもできる）
+    TRAINING_EPOCHS = 50
+    TRAINING_FAST_MODE = False
+    TRAINING_PATIENCE = 5
+    TRAINING_TIME_BUDGET_SECONDS = 120
+    # コンターグリッドを推論するタイルの点数と、タイルを並列に処理するスレッド数
+    GRID_TILE_SIZE = 65536
+    GRID_TILE_WORKERS = 2
+    # /model/compare で一度に比較できるモデル数の上限と、モデルを並列に評価するスレッド数
+    COMPARE_MAX_MODELS = 8
+    COMPARE_WORKERS = 4
+
+    # モデル設定のロード時にオーバーラップ用グリッドをバックグラウンドで事前計算するか
+    # （リクエストの 'warmup' で個別に指定することもできる）
+    WARMUP_ON_MODEL_LOAD = False
+    WARMUP_TIME_BUDGET_SECONDS = 30
+    WARMUP_MEMORY_BUDGET_BYTES = 64 * 1024 * 1024
+    WARMUP_MAX_COMBINATIONS = 20
+    # /get_plot_data で計算するオーバーラップ用グリッドの解像度
+    OVERLAP_RESOLUTION = 10
+
+    # /model/sweep で1回に評価する点数と、1つのスイープで評価できる点数の上限
+    # （出力は1点あたり (軸数 + 出力数) × 8 バイト。5列なら上限で約 2 GB）
+    SWEEP_CHUNK_SIZE = 65536
+    SWEEP_MAX_POINTS = 50_000_000
+    # スイープの出力を書き出した後にも残しておくディスクの空き容量（足りない場合は開始せずに 507 を返す）
+    SWEEP_MIN_FREE_BYTES = 1024 * 1024 * 1024
+    # 終了したスイープのジョブと出力ファイルを保持する秒数（次のスイープ開始時に古いものを削除する）
+    SWEEP_EXPORT_TTL_SECONDS = 24 * 3600
+    # /model/sensitivity のSaltelli標本の基本サンプル数の上限（評価点数は n * (特徴量数 + 2)）
+    SOBOL_MAX_BASE_SAMPLES = 65536
+
+    # /admin 以下（リソース割り当て・メモリ使用量・tracemalloc）を有効にするか。
+    # 有効にしても、ADMIN_ALLOW_REMOTE が False の間はローカルホストからのリクエストだけを受け付ける
+    ADMIN_ENDPOINTS_ENABLED = False
+    ADMIN_ALLOW_REMOTE = False
 
     @staticmethod
     def init_app(app):
@@ -20,3 +97,7 @@ class Config:
         # ▼▼▼ここから追加▼▼▼
         os.makedirs(app.config['TUNED_MODELS_FOLDER'], exist_ok=True)
         # ▲▲▲ここまで追加▲▲▲
+        os.makedirs(app.config['INDEX_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['TRAINING_SETS_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['WAVEFORM_FEATURES_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['SWEEP_EXPORT_FOLDER'], exist_ok=True)
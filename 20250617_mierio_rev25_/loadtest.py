@@ -0,0 +1,351 @@
+"""
+ローカルで起動した create_app() に対して、主要なエンドポイントへの同時リクエストを再生する負荷試験ツール。
+合成した Feature.csv / Target.csv と法則モデル（およびそのサロゲートモデル）を一時フォルダに作成するため、
+ネットワークや既存の user_data には一切触れない。
+
+使用例:
+    python loadtest.py --concurrency 8 --duration 60
+    python loadtest.py --concurrency 16 --requests 2000 --mix plot=10,contour=5,overlap=10,upload=1,save=0
+"""
+import argparse
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from config import Config
+
+DEFAULT_MIX = 'upload=1,plot=10,contour=4,overlap=10,save=0.2'
+ENDPOINT_PATHS = {
+    'upload': '/upload_asset_folder',
+    'plot': '/get_plot_data',
+    'contour': '/get_calculated_contour',
+    'overlap': '/get_overlap_data',
+    'save': '/model/save_model_config',
+}
+
+LAW_FUNCTIONS = [
+    {'name': 'Linear', 'equation': 'm * x + b', 'parameters': 'm=0.8, b=0.1'},
+    {'name': 'Power_Law', 'equation': 'alpha * x**beta', 'parameters': 'alpha=1.2, beta=0.7'},
+]
+
+
+def make_config(root):
+    """
+    保存先をすべて root 以下に向けた設定クラスを返す。
+    """
+    user_data = os.path.join(root, 'user_data')
+    cache = os.path.join(user_data, 'cache')
+
+    class LoadTestConfig(Config):
+        UPLOAD_FOLDER = os.path.join(user_data, 'uploads')
+        JSON_FOLDER = os.path.join(user_data, 'settings', 'json')
+        MODELS_FOLDER = os.path.join(user_data, 'settings', 'models')
+        TUNED_MODELS_FOLDER = os.path.join(user_data, 'settings', 'tuned_models')
+        CACHE_FOLDER = cache
+        INDEX_FOLDER = os.path.join(cache, 'index')
+        TRAINING_SETS_FOLDER = os.path.join(cache, 'training_sets')
+        WAVEFORM_FEATURES_FOLDER = os.path.join(cache, 'waveform_features')
+        SWEEP_EXPORT_FOLDER = os.path.join(user_data, 'exports')
+        SESSION_DB_PATH = os.path.join(user_data, 'sessions.sqlite3')
+        WARMUP_ON_MODEL_LOAD = False
+
+    os.makedirs(user_data, exist_ok=True)
+    return LoadTestConfig
+
+
+def make_synthetic_assets(n_rows, n_features, n_targets, levels, seed):
+    """
+    実験データに似せた Feature.csv / Target.csv の内容（CSV文字列）を作る。
+    特徴量は levels 段階の離散的な設定値をとり、ターゲットは特徴量の非線形な組み合わせにノイズを加えたもの。
+    """
+    rng = np.random.default_rng(seed)
+    feature_names = [f'F{i + 1}' for i in range(n_features)]
+    target_names = [f'T{j + 1}' for j in range(n_targets)]
+    settings = np.linspace(1.0, 10.0, levels)
+
+    df_feature = pd.DataFrame({'main_id': np.arange(1, n_rows + 1)})
+    for name in feature_names:
+        df_feature[name] = rng.choice(settings, size=n_rows)
+
+    X = df_feature[feature_names].to_numpy()
+    weights = rng.uniform(0.5, 2.0, size=(n_features, n_targets))
+    df_target = pd.DataFrame({'main_id': df_feature['main_id']})
+    for j, name in enumerate(target_names):
+        signal = (X ** 0.7) @ weights[:, j]
+        df_target[name] = signal + rng.normal(scale=0.05 * signal.std() + 1e-9, size=n_rows)
+
+    return df_feature.to_csv(index=False), df_target.to_csv(index=False), feature_names, target_names, settings
+
+
+class Recorder:
+    """
+    エンドポイントごとのレイテンシとステータスを記録する。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(list)
+        self._errors = defaultdict(int)
+        self._statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, seconds, status):
+        with self._lock:
+            self._latencies[endpoint].append(seconds)
+            self._statuses[endpoint][status] += 1
+            if status == 'exception' or status >= 400:
+                self._errors[endpoint] += 1
+
+    def summary(self, elapsed):
+        rows = []
+        with self._lock:
+            for endpoint in sorted(self._latencies):
+                latencies = np.asarray(self._latencies[endpoint]) * 1000.0
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                rows.append({
+                    'endpoint': ENDPOINT_PATHS.get(endpoint, endpoint),
+                    'requests': len(latencies),
+                    'throughput_rps': len(latencies) / elapsed if elapsed > 0 else 0.0,
+                    'error_rate': self._errors[endpoint] / len(latencies),
+                    'p50_ms': float(p50),
+                    'p95_ms': float(p95),
+                    'p99_ms': float(p99),
+                    'max_ms': float(latencies.max()),
+                    'statuses': {str(k): v for k, v in self._statuses[endpoint].items()},
+                })
+        return rows
+
+
+class Scenario:
+    """
+    1人の利用者のセッション（テストクライアント）として、重み付きの操作をランダムに繰り返す。
+    ブラウザと同じように、受け取ったETagを次の同じリクエストに If-None-Match として付ける。
+    """
+    def __init__(self, app, assets, model_filename, mix, recorder, seed, use_etags=True, train_epochs=1):
+        self.client = app.test_client()
+        self.feature_csv, self.target_csv, self.feature_names, self.target_names, self.settings = assets
+        self.model_filename = model_filename
+        self.endpoints = list(mix)
+        self.weights = [mix[e] for e in self.endpoints]
+        self.recorder = recorder
+        self.rng = random.Random(seed)
+        self.use_etags = use_etags
+        self.train_epochs = train_epochs
+        self._etags = {}
+
+    def _timed(self, endpoint, func):
+        started = time.perf_counter()
+        try:
+            response = func()
+            status = response.status_code
+            etag = response.headers.get('ETag')
+            response.close()
+        except Exception:
+            status, etag = 'exception', None
+        self.recorder.record(endpoint, time.perf_counter() - started, status)
+        return status, etag
+
+    def _post_json(self, endpoint, body):
+        key = (endpoint, json.dumps(body, sort_keys=True))
+        headers = {}
+        if self.use_etags and key in self._etags:
+            headers['If-None-Match'] = self._etags[key]
+        status, etag = self._timed(endpoint, lambda: self.client.post(ENDPOINT_PATHS[endpoint], json=body, headers=headers))
+        if etag:
+            self._etags[key] = etag
+        return status
+
+    def _feature_params(self):
+        x_col, y_col = self.rng.sample(self.feature_names, 2)
+        params = [{'name': x_col, 'type': 'X_axis'}, {'name': y_col, 'type': 'Y_axis'}]
+        for name in self.feature_names:
+            if name not in (x_col, y_col):
+                params.append({'name': name, 'type': 'Constant', 'value': float(self.rng.choice(self.settings))})
+        return params
+
+    def upload(self):
+        data = {'files[]': [
+            (io.BytesIO(self.feature_csv.encode('utf-8')), 'Feature.csv'),
+            (io.BytesIO(self.target_csv.encode('utf-8')), 'Target.csv'),
+        ]}
+        return self._timed('upload', lambda: self.client.post(
+            ENDPOINT_PATHS['upload'], data=data, content_type='multipart/form-data'))[0]
+
+    def plot(self):
+        return self._post_json('plot', {
+            'featureParams': self._feature_params(),
+            'targetParam': self.rng.choice(self.target_names),
+        })
+
+    def contour(self):
+        return self._post_json('contour', {
+            'json_filename': self.model_filename,
+            'featureParams': self._feature_params(),
+            'targetParam': self.rng.choice(self.target_names),
+            'mode': self.rng.choice(['surrogate', 'exact']),
+            'resolution': 50,
+        })
+
+    def overlap(self):
+        headers = {}
+        if self.use_etags and 'overlap' in self._etags:
+            headers['If-None-Match'] = self._etags['overlap']
+        status, etag = self._timed('overlap', lambda: self.client.get(ENDPOINT_PATHS['overlap'], headers=headers))
+        if etag:
+            self._etags['overlap'] = etag
+        return status
+
+    def save(self):
+        return self._post_json('save', save_model_body(self.feature_names, self.target_names, self.train_epochs))
+
+    def run(self, deadline, remaining):
+        self.upload()
+        while time.monotonic() < deadline and remaining.take():
+            endpoint = self.rng.choices(self.endpoints, weights=self.weights)[0]
+            getattr(self, endpoint)()
+
+
+class RequestBudget:
+    """
+    全ワーカーで共有するリクエスト数の上限（None なら無制限）。
+    """
+    def __init__(self, total):
+        self._remaining = total
+        self._lock = threading.Lock()
+
+    def take(self):
+        if self._remaining is None:
+            return True
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+
+def save_model_body(feature_names, target_names, epochs):
+    fitting_config = {
+        feature: {target: LAW_FUNCTIONS[(i + j) % len(LAW_FUNCTIONS)]['name'] for j, target in enumerate(target_names)}
+        for i, feature in enumerate(feature_names)
+    }
+    return {
+        'modelName': 'loadtest',
+        'fittingConfig': fitting_config,
+        'fittingMethod': '線形結合',
+        'functions': LAW_FUNCTIONS,
+        'epochs': epochs,
+    }
+
+
+def prepare_model(app, assets, epochs):
+    """
+    合成データで法則モデルを保存してサロゲートモデルを学習し、全ワーカーが使うモデルとして読み込む。
+    """
+    feature_csv, target_csv, feature_names, target_names, _ = assets
+    client = app.test_client()
+    response = client.post(ENDPOINT_PATHS['upload'], content_type='multipart/form-data', data={'files[]': [
+        (io.BytesIO(feature_csv.encode('utf-8')), 'Feature.csv'),
+        (io.BytesIO(target_csv.encode('utf-8')), 'Target.csv'),
+    ]})
+    if response.status_code != 200:
+        raise RuntimeError(f"Synthetic upload failed: {response.get_json()}")
+
+    response = client.post(ENDPOINT_PATHS['save'], json=save_model_body(feature_names, target_names, epochs))
+    if response.status_code != 200:
+        raise RuntimeError(f"Synthetic model training failed: {response.get_json()}")
+    model_filename = os.path.basename(response.get_json()['filepath'])
+
+    response = client.post('/model/load_model_config', json={'filename': model_filename})
+    if response.status_code != 200:
+        raise RuntimeError(f"Loading the synthetic model failed: {response.get_json()}")
+    return model_filename
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINT_PATHS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}'. Choose from {list(ENDPOINT_PATHS)}.")
+        mix[name] = float(weight or 1.0)
+    if not any(w > 0 for w in mix.values()):
+        raise argparse.ArgumentTypeError('At least one endpoint needs a positive weight.')
+    return {name: w for name, w in mix.items() if w > 0}
+
+
+def print_report(rows, elapsed, concurrency):
+    total = sum(r['requests'] for r in rows)
+    print(f"\n{total} requests in {elapsed:.1f}s with {concurrency} concurrent sessions "
+          f"({total / elapsed if elapsed > 0 else 0:.1f} req/s)\n")
+    header = f"{'endpoint':<28}{'reqs':>7}{'req/s':>9}{'err%':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print('-' * len(header))
+    for r in rows:
+        print(f"{r['endpoint']:<28}{r['requests']:>7}{r['throughput_rps']:>9.1f}{r['error_rate'] * 100:>7.1f}%"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}")
+    print()
+    for r in rows:
+        print(f"{r['endpoint']}: status counts {r['statuses']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline concurrent load test for the Flask endpoints.')
+    parser.add_argument('--concurrency', type=int, default=8, help='number of concurrent client sessions')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run (ignored once --requests is reached)')
+    parser.add_argument('--requests', type=int, default=None, help='total number of requests across all sessions')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'endpoint weights, e.g. "{DEFAULT_MIX}"')
+    parser.add_argument('--rows', type=int, default=20000, help='rows in the synthetic Feature/Target CSVs')
+    parser.add_argument('--features', type=int, default=3, help='number of synthetic feature columns (>= 2)')
+    parser.add_argument('--targets', type=int, default=2, help='number of synthetic target columns')
+    parser.add_argument('--levels', type=int, default=8, help='distinct setting values per feature')
+    parser.add_argument('--epochs', type=int, default=1, help='surrogate training epochs for model saves')
+    parser.add_argument('--no-etags', action='store_true', help='do not send If-None-Match headers')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path', help='also write the report to this JSON file')
+    args = parser.parse_args(argv)
+
+    if args.features < 2:
+        parser.error('--features must be at least 2.')
+
+    with tempfile.TemporaryDirectory(prefix='loadtest-') as root:
+        from app import create_app
+        app = create_app(make_config(root))
+        app.logger.setLevel('WARNING')
+
+        assets = make_synthetic_assets(args.rows, args.features, args.targets, args.levels, args.seed)
+        print(f"Preparing synthetic assets ({args.rows} rows) and surrogate model in {root} ...")
+        model_filename = prepare_model(app, assets, args.epochs)
+
+        recorder = Recorder()
+        budget = RequestBudget(args.requests)
+        deadline = time.monotonic() + args.duration
+        scenarios = [
+            Scenario(app, assets, model_filename, args.mix, recorder, seed=args.seed + i + 1,
+                     use_etags=not args.no_etags, train_epochs=args.epochs)
+            for i in range(args.concurrency)
+        ]
+        threads = [threading.Thread(target=s.run, args=(deadline, budget), name=f'loadtest-{i}')
+                   for i, s in enumerate(scenarios)]
+
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        rows = recorder.summary(elapsed)
+        print_report(rows, elapsed, args.concurrency)
+        if args.json_path:
+            with open(args.json_path, 'w', encoding='utf-8') as f:
+                json.dump({'elapsed_seconds': elapsed, 'concurrency': args.concurrency, 'endpoints': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
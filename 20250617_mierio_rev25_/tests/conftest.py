@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tests/ の外にある app パッケージと config を import できるようにする
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,88 @@
+import hashlib
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from app import ingest
+
+
+class _Upload:
+    def __init__(self, content):
+        self.stream = io.BytesIO(content)
+
+
+def test_downcast_lossless_integers():
+    assert ingest._downcast_lossless(pd.Series([1, -2, 3], dtype=np.int64)).dtype == np.int32
+    assert ingest._downcast_lossless(pd.Series([], dtype=np.int64)).dtype == np.int32
+    # int32 の範囲外の値があれば縮小しない
+    assert ingest._downcast_lossless(pd.Series([0, 2 ** 40], dtype=np.int64)).dtype == np.int64
+
+
+def test_downcast_lossless_floats():
+    series = pd.Series([0.5, np.nan, 0.25])
+    downcast = ingest._downcast_lossless(series)
+    assert downcast.dtype == np.float32
+    np.testing.assert_array_equal(downcast.to_numpy(dtype=np.float64), series.to_numpy())
+    # float32 で表せない値（0.1）があれば縮小しない
+    assert ingest._downcast_lossless(pd.Series([0.5, 0.1])).dtype == np.float64
+
+
+def test_downcast_lossless_leaves_other_columns():
+    series = pd.Series(['a', 'b'])
+    assert ingest._downcast_lossless(series) is series
+    small = pd.Series([1, 2], dtype=np.int32)
+    assert ingest._downcast_lossless(small) is small
+
+
+def test_parse_csv_chunked_keeps_values_across_chunks(tmp_path):
+    path = tmp_path / 'Feature.csv'
+    path.write_text(
+        ' main_id , a , b\n'
+        '1,1,0.5\n'
+        '2,2,0.25\n'
+        '3,3,0.1\n'
+        '4,4,0.75\n'
+        '5,1099511627776,1.5\n'
+    )
+
+    df = ingest.parse_csv_chunked(str(path), chunk_rows=2)
+    expected = pd.read_csv(path)
+    expected.columns = expected.columns.str.strip()
+
+    assert list(df.columns) == ['main_id', 'a', 'b']
+    # チャンクごとに縮小した型は、結合時に値を失わない共通の型に揃う
+    assert df['main_id'].dtype == np.int32
+    assert df['a'].dtype == np.int64
+    assert df['b'].dtype == np.float64
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+
+def test_parse_csv_chunked_usecols_matches_stripped_names(tmp_path):
+    path = tmp_path / 'Target.csv'
+    path.write_text(' main_id , b\n1,0.5\n2,0.25\n')
+    df = ingest.parse_csv_chunked(str(path), usecols=['b'])
+    assert list(df.columns) == ['b']
+    np.testing.assert_array_equal(df['b'].to_numpy(), [0.5, 0.25])
+
+
+def test_save_upload_stream_reads_header_split_across_blocks(tmp_path):
+    content = b' main_id , value \r\n1,2\r\n3,4\r\n'
+    path = tmp_path / 'Feature.csv'
+    hasher = hashlib.sha256()
+
+    header = ingest.save_upload_stream(_Upload(content), str(path), block_size=3, hasher=hasher)
+
+    assert header == ['main_id', 'value']
+    assert path.read_bytes() == content
+    assert hasher.hexdigest() == hashlib.sha256(content).hexdigest()
+
+
+def test_save_upload_stream_without_trailing_newline(tmp_path):
+    path = tmp_path / 'Feature.csv'
+    assert ingest.save_upload_stream(_Upload(b'a,b'), str(path)) == ['a', 'b']
+
+
+def test_save_upload_stream_rejects_empty_files(tmp_path):
+    with pytest.raises(ValueError):
+        ingest.save_upload_stream(_Upload(b''), str(tmp_path / 'Feature.csv'))
+    assert list(tmp_path.iterdir()) == []
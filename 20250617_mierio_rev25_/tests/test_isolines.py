@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from app import isolines
+
+
+def _signed_area(points):
+    x, y = points[:, 0], points[:, 1]
+    return 0.5 * np.sum(x[:-1] * y[1:] - x[1:] * y[:-1])
+
+
+def _bowl(n=41):
+    x = np.linspace(-1.0, 1.0, n)
+    y = np.linspace(-1.0, 1.0, n)
+    x_mesh, y_mesh = np.meshgrid(x, y)
+    return x, y, x_mesh ** 2 + y_mesh ** 2
+
+
+def test_circle_isoline_is_closed_and_on_the_level():
+    x, y, z = _bowl()
+    paths = isolines.trace_isolines(z, x, y, 0.25)
+
+    assert len(paths) == 1
+    path = paths[0]
+    np.testing.assert_allclose(path[0], path[-1])
+    np.testing.assert_allclose(np.hypot(path[:, 0], path[:, 1]), 0.5, atol=0.01)
+
+
+def test_high_side_is_on_the_left():
+    # 外側（z >= level）が左側になるため、円は時計回り（符号付き面積が負）になる
+    x, y, z = _bowl()
+    path = isolines.trace_isolines(z, x, y, 0.25)[0]
+    assert _signed_area(path) == pytest.approx(-np.pi * 0.25, rel=0.02)
+
+
+def test_filled_region_is_a_counterclockwise_ring():
+    x, y, z = _bowl()
+    rings = isolines.trace_filled_regions(-z, x, y, -0.25)
+
+    assert len(rings) == 1
+    ring = rings[0]
+    np.testing.assert_allclose(ring[0], ring[-1])
+    assert _signed_area(ring) == pytest.approx(np.pi * 0.25, rel=0.02)
+
+
+def test_filled_region_covering_the_grid_follows_the_border():
+    x = np.linspace(0.0, 2.0, 5)
+    y = np.linspace(0.0, 1.0, 3)
+    rings = isolines.trace_filled_regions(np.ones((3, 5)), x, y, 0.5)
+
+    assert len(rings) == 1
+    ring = rings[0]
+    assert ring[:, 0].min() == pytest.approx(0.0)
+    assert ring[:, 0].max() == pytest.approx(2.0)
+    assert ring[:, 1].min() == pytest.approx(0.0)
+    assert ring[:, 1].max() == pytest.approx(1.0)
+
+
+def test_no_isolines_outside_the_range_or_in_nan_cells():
+    x, y, z = _bowl(11)
+    assert isolines.trace_isolines(z, x, y, 5.0) == []
+    assert isolines.trace_isolines(np.full_like(z, np.nan), x, y, 0.25) == []
+    assert isolines.trace_isolines(z[:1], x, y[:1], 0.25) == []
+
+
+def test_simplify_polyline_drops_collinear_points():
+    points = np.column_stack([np.linspace(0.0, 1.0, 11), np.linspace(0.0, 2.0, 11)])
+    np.testing.assert_allclose(isolines.simplify_polyline(points, 1e-9), points[[0, -1]])
+    assert isolines.simplify_polyline(points, 0.0) is points
+
+
+def test_simplify_polyline_keeps_corners():
+    points = np.array([[0.0, 0.0], [0.5, 0.0], [1.0, 0.0], [1.0, 0.5], [1.0, 1.0]])
+    np.testing.assert_allclose(isolines.simplify_polyline(points, 0.01), points[[0, 2, 4]])
+
+
+def test_resolve_levels():
+    z = np.array([[0.0, 4.0], [np.nan, 2.0]])
+    np.testing.assert_allclose(isolines.resolve_levels(z, 3), [1.0, 2.0, 3.0])
+    np.testing.assert_allclose(isolines.resolve_levels(z, [3.0, 1.0, 1.0, np.inf]), [1.0, 3.0])
+    np.testing.assert_allclose(isolines.resolve_levels(np.full((2, 2), 7.0), 5), [7.0])
+    with pytest.raises(ValueError):
+        isolines.resolve_levels(z, 0)
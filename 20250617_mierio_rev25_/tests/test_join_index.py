@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from app import join_index
+
+
+def _write_assets(tmp_path):
+    feature = tmp_path / 'Feature.csv'
+    target = tmp_path / 'Target.csv'
+    feature.write_text('main_id,x,note\n3,30,f3\n1,10,f1\n2,20,f2\n5,50,f5\n')
+    target.write_text('main_id,y,note\n2,200,t2a\n1,100,t1\n2,201,t2b\n4,400,t4\n')
+    return str(feature), str(target)
+
+
+def test_indexed_join_matches_pandas_merge(tmp_path):
+    feature, target = _write_assets(tmp_path)
+    index_folder = str(tmp_path / 'index')
+
+    result = join_index.indexed_join(feature, target, index_folder)
+    expected = pd.merge(pd.read_csv(feature), pd.read_csv(target), on='main_id', how='inner')
+
+    assert list(result.columns) == ['main_id', 'x', 'note_x', 'y', 'note_y']
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_indexed_join_materializes_only_requested_columns(tmp_path):
+    feature, target = _write_assets(tmp_path)
+    result = join_index.indexed_join(feature, target, str(tmp_path / 'index'), columns=['y'])
+
+    assert list(result.columns) == ['main_id', 'y']
+    np.testing.assert_array_equal(result['main_id'].to_numpy(), [1, 2, 2])
+    np.testing.assert_array_equal(result['y'].to_numpy(), [100, 200, 201])
+
+
+def test_key_index_is_persisted(tmp_path):
+    feature, _ = _write_assets(tmp_path)
+    index_folder = tmp_path / 'index'
+
+    index = join_index.get_key_index(feature, str(index_folder))
+    np.testing.assert_array_equal(index.sorted_keys, [1, 2, 3, 5])
+    np.testing.assert_array_equal(index.positions, [1, 2, 0, 3])
+    assert len(list(index_folder.glob('*.npz'))) == 1
+
+    # メモリのキャッシュを消しても、保存済みの索引から同じ内容が読み込まれる
+    join_index._indexes.clear()
+    reloaded = join_index.get_key_index(feature, str(index_folder))
+    np.testing.assert_array_equal(reloaded.sorted_keys, index.sorted_keys)
+    np.testing.assert_array_equal(reloaded.positions, index.positions)
+
+
+def test_join_positions_with_string_keys():
+    left = join_index.KeyIndex(np.array(['a', 'b', 'c']), np.array([2, 0, 1]))
+    right = join_index.KeyIndex(np.array(['b', 'c', 'c']), np.array([1, 0, 2]))
+
+    left_positions, right_positions = join_index.join_positions(left, right, chunk_rows=2)
+
+    np.testing.assert_array_equal(left_positions, [0, 1, 1])
+    np.testing.assert_array_equal(right_positions, [1, 0, 2])
@@ -0,0 +1,148 @@
+import threading
+import time
+import pytest
+from app.request_coalescing import CancelToken, RequestCancelled, SingleFlight, SupersedeRegistry, raise_if_cancelled
+
+
+def _wait_for_waiters(single_flight, key, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with single_flight._lock:
+            call = single_flight._calls.get(key)
+            if call is not None and len(call.tokens) >= count:
+                return
+        time.sleep(0.01)
+    raise AssertionError('waiters did not join the call in time')
+
+
+def _start(target):
+    results = {}
+
+    def run():
+        try:
+            results['value'] = target()
+        except Exception as e:
+            results['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, results
+
+
+def test_concurrent_calls_share_one_execution():
+    single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn(cancel_token):
+        calls.append(cancel_token)
+        started.set()
+        release.wait(5)
+        return 42
+
+    leader, leader_results = _start(lambda: single_flight.do('key', fn, poll_interval=0.01))
+    assert started.wait(5)
+    follower, follower_results = _start(lambda: single_flight.do('key', fn, poll_interval=0.01))
+    _wait_for_waiters(single_flight, 'key', 2)
+
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert leader_results['value'] == (42, True)
+    assert follower_results['value'] == (42, False)
+    assert single_flight._calls == {}
+
+
+def test_cancelled_follower_stops_waiting():
+    single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fn(cancel_token):
+        started.set()
+        release.wait(5)
+        return 'done'
+
+    leader, leader_results = _start(lambda: single_flight.do('key', fn, CancelToken(), poll_interval=0.01))
+    assert started.wait(5)
+    follower_token = CancelToken()
+    follower, follower_results = _start(lambda: single_flight.do('key', fn, follower_token, poll_interval=0.01))
+    _wait_for_waiters(single_flight, 'key', 2)
+
+    follower_token.cancelled = True
+    follower.join(5)
+    assert isinstance(follower_results.get('error'), RequestCancelled)
+
+    release.set()
+    leader.join(5)
+    assert leader_results['value'] == ('done', True)
+
+
+def test_shared_token_is_cancelled_only_when_every_waiter_cancels():
+    single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    shared = {}
+
+    def fn(cancel_token):
+        shared['token'] = cancel_token
+        started.set()
+        release.wait(5)
+        raise_if_cancelled(cancel_token)
+        return 'done'
+
+    leader_token, follower_token = CancelToken(), CancelToken()
+    leader, leader_results = _start(lambda: single_flight.do('key', fn, leader_token, poll_interval=0.01))
+    assert started.wait(5)
+    follower, follower_results = _start(lambda: single_flight.do('key', fn, follower_token, poll_interval=0.01))
+    _wait_for_waiters(single_flight, 'key', 2)
+
+    leader_token.cancelled = True
+    assert not shared['token'].cancelled
+    follower_token.cancelled = True
+    assert shared['token'].cancelled
+
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert isinstance(leader_results.get('error'), RequestCancelled)
+    assert isinstance(follower_results.get('error'), RequestCancelled)
+
+
+def test_shared_token_is_never_cancelled_with_an_uncancellable_waiter():
+    single_flight = SingleFlight()
+    leader_token = CancelToken()
+
+    def fn(cancel_token):
+        leader_token.cancelled = True
+        # 取り消しできない（token が None の）リクエストは結果を待ち続けるため、打ち切らない
+        return cancel_token.cancelled
+
+    assert single_flight.do('key', fn, None) == (False, True)
+
+
+def test_errors_propagate_to_the_caller():
+    single_flight = SingleFlight()
+
+    def fn(cancel_token):
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError, match='boom'):
+        single_flight.do('key', fn)
+    assert single_flight._calls == {}
+
+
+def test_supersede_registry_cancels_previous_request():
+    registry = SupersedeRegistry()
+    first = registry.begin('scope')
+    second = registry.begin('scope')
+
+    assert first.cancelled
+    assert not second.cancelled
+
+    # 古いリクエストの終了は新しいリクエストの登録を消さない
+    registry.end('scope', first)
+    third = registry.begin('scope')
+    assert second.cancelled
+    registry.end('scope', third)
+    assert registry._tokens == {}
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from app import sobol
+
+FEATURES = ['x0', 'x1', 'x2']
+BOUNDS = [(0.0, 1.0), (0.0, 1.0), (0.0, 1.0)]
+
+
+def _linear(columns):
+    # 分散は 2*x0 が 4/12、x1 が 1/12 で、x2 は出力に影響しない
+    return np.column_stack([2.0 * columns['x0'] + columns['x1']])
+
+
+def test_saltelli_matrices_layout():
+    n, d = 8, 3
+    samples = sobol.saltelli_matrices([(0.0, 1.0), (10.0, 20.0), (-1.0, 1.0)], n, seed=0)
+
+    assert samples.shape == (n * (d + 2), d)
+    assert np.all(samples[:, 1] >= 10.0) and np.all(samples[:, 1] <= 20.0)
+    A, B = samples[:n], samples[n:2 * n]
+    for i in range(d):
+        AB = samples[(2 + i) * n:(3 + i) * n]
+        np.testing.assert_array_equal(AB[:, i], B[:, i])
+        np.testing.assert_array_equal(np.delete(AB, i, axis=1), np.delete(A, i, axis=1))
+
+
+def test_evaluate_in_batches_matches_a_single_call():
+    samples = sobol.saltelli_matrices(BOUNDS, 16, seed=1)
+    expected = _linear({name: samples[:, i] for i, name in enumerate(FEATURES)})
+    np.testing.assert_allclose(sobol.evaluate_in_batches(_linear, samples, FEATURES, batch_size=7), expected)
+
+
+def test_indices_of_an_additive_model():
+    result = sobol.analyze(_linear, FEATURES, BOUNDS, ['y'], n=4096, n_bootstrap=20, seed=0)
+    indices = result['indices']['y']
+
+    assert indices['x0']['S1'] == pytest.approx(0.8, abs=0.05)
+    assert indices['x1']['S1'] == pytest.approx(0.2, abs=0.05)
+    assert indices['x0']['ST'] == pytest.approx(0.8, abs=0.05)
+    assert indices['x1']['ST'] == pytest.approx(0.2, abs=0.05)
+    # 影響しない特徴量では A と AB の出力が一致するため、総合指数はちょうど0になる
+    assert indices['x2']['ST'] == pytest.approx(0.0, abs=1e-12)
+    assert result['ranking']['y'] == ['x0', 'x1', 'x2']
+    assert result['evaluations'] == 4096 * (len(FEATURES) + 2)
+
+    low, high = indices['x0']['S1_ci']
+    assert low < high
+    assert low == pytest.approx(0.8, abs=0.1) and high == pytest.approx(0.8, abs=0.1)
+
+
+def test_analyze_uses_the_cache_key():
+    calls = []
+
+    def evaluate(columns):
+        calls.append(len(columns['x0']))
+        return _linear(columns)
+
+    key = ('test', 'linear')
+    first = sobol.analyze(evaluate, FEATURES, BOUNDS, ['y'], n=64, n_bootstrap=5, cache_key=key)
+    n_calls = len(calls)
+    second = sobol.analyze(evaluate, FEATURES, BOUNDS, ['y'], n=64, n_bootstrap=5, cache_key=key)
+
+    assert first['cached'] is False
+    assert second['cached'] is True
+    assert len(calls) == n_calls
+    assert second['indices'] == first['indices']